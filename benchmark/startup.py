@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+
+# Startup benchmark for the turtlebot4_setup tool.
+#
+# Measures the time from interpreter start to the first render of the main menu, and
+# the import time of the heaviest modules, over several cold starts.
+#
+# usage: python3 benchmark/startup.py [-n RUNS] [--json results.json]
+# Run on the robot from a terminal, with the ROS workspace sourced.
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+DEFAULT_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                              '..', 'turtlebot4_setup', 'turtlebot4_setup')
+
+# Executed in a fresh interpreter for every run
+BOOTSTRAP = """
+import importlib.util, json, sys, time
+from importlib.machinery import SourceFileLoader
+
+t0 = time.perf_counter()
+loader = SourceFileLoader('turtlebot4_setup_main', sys.argv[1])
+spec = importlib.util.spec_from_loader(loader.name, loader)
+main = importlib.util.module_from_spec(spec)
+loader.exec_module(main)
+t_import = time.perf_counter()
+
+from simple_term_menu_vendor.simple_term_menu import TerminalMenu
+
+timings = {}
+
+def show(self):
+    # Paint the menu once, then leave as if the user had quit
+    try:
+        self._init_term()
+        self._paint_menu()
+        self._reset_term()
+    except OSError:
+        pass
+    timings['render'] = time.perf_counter()
+    return None
+
+TerminalMenu.show = show
+
+setup = main.Turtlebot4Setup()
+t_init = time.perf_counter()
+setup.menu.show()
+
+print(json.dumps({
+    'import': t_import - t0,
+    'init': t_init - t_import,
+    'first_render': timings['render'] - t0,
+}))
+"""
+
+
+def parse_importtime(stderr, top):
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = [field.strip() for field in line[len('import time:'):].split('|')]
+        # Only report top level imports, nested ones are included in their parent
+        if not line.split('|')[2].startswith('  '):
+            modules[name] = int(cumulative) / 1e6
+    return sorted(modules.items(), key=lambda m: m[1], reverse=True)[:top]
+
+
+def run_once(script):
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', BOOTSTRAP, script],
+                            capture_output=True, universal_newlines=True)
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        sys.exit(result.stderr)
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    timings['wall'] = wall
+    return timings, result.stderr
+
+
+def main():
+    parser = argparse.ArgumentParser(description='turtlebot4_setup startup benchmark')
+    parser.add_argument('-n', '--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help='Number of imports to report')
+    parser.add_argument('--script', default=DEFAULT_SCRIPT)
+    parser.add_argument('--json', help='Write results to this file')
+    args = parser.parse_args()
+
+    runs = []
+    imports = {}
+    for _ in range(args.runs):
+        timings, stderr = run_once(args.script)
+        runs.append(timings)
+        for name, t in parse_importtime(stderr, args.top):
+            imports.setdefault(name, []).append(t)
+
+    results = {
+        'runs': args.runs,
+        'median': {k: statistics.median(r[k] for r in runs) for k in runs[0]},
+        'imports': dict(sorted(((name, statistics.median(t)) for name, t in imports.items()),
+                               key=lambda m: m[1], reverse=True)[:args.top]),
+    }
+
+    print('Startup ({0} runs, median)'.format(args.runs))
+    for k, v in results['median'].items():
+        print('  {0:<16}{1:8.1f} ms'.format(k, v * 1000))
+    print('Imports (cumulative, median)')
+    for name, t in results['imports'].items():
+        print('  {0:<40}{1:8.1f} ms'.format(name, t * 1000))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
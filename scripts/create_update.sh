@@ -1,30 +1,16 @@
 #!/usr/bin/env bash
 
-# Flags:
-# -h Help
+# Create 3 update script for robots running H.1.0 or higher
+#
+# usage: bash create_update.sh /path/to/image.swu [--host HOST[:PORT] ...] [-h]
+# Run with -h for all options.
 
-Help()
-{
-   echo "Create 3 update script for robots running H.1.0 or higher"
-   echo
-   echo "usage: bash create_update.sh /path/to/image.swu [-h]"
-   echo "options:"
-   echo " -h     Print this help statement"
-   echo
-}
+SCRIPT_DIR=$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)
+. "$SCRIPT_DIR/turtlebot4_setup_path.sh"
 
-while getopts "h" flag
-do
-    case "${flag}" in
-        h)
-            Help
-            exit;;
-        \?)
-            echo "Error: Invalid flag"
-            exit;;
-    esac
-done
+if ! PACKAGE_PATH=$(turtlebot4_setup_path "$SCRIPT_DIR"); then
+    echo "Error: The turtlebot4_setup package was not found. Install ros-humble-turtlebot4-setup." >&2
+    exit 1
+fi
 
-echo "Image path: $1";
-
-curl -X POST --data-binary @$1 http://192.168.186.2/api/firmware-update
+PYTHONPATH="$PACKAGE_PATH${PYTHONPATH:+:$PYTHONPATH}" exec python3 -m turtlebot4_setup.create3_update "$@"
@@ -1,40 +1,25 @@
 #!/usr/bin/env bash
 
-# Flags:
-# -h Help
-
-Help()
-{
-   echo "RPI4 SD card flash script. Supports flashing multiple cards simultaneously."
-   echo
-   echo "usage: sudo bash sd_flash.sh /path/to/image.img [-h]"
-   echo "options:"
-   echo " -h     Print this help statement"
-   echo
-}
-
-while getopts "h" flag
-do
-    case "${flag}" in
-        h)
-            Help
-            exit;;
-        \?)
-            echo "Error: Invalid flag"
-            exit;;
-    esac
-done
-
-echo "Image path: $1";
-
-read -p "Enter each SD card device name separated with a space (i.e. sda sdb sdc): " device_names
-
-read -p "The SD card(s) will be unmounted and flashed. Press enter to continue."
-
-for device in $device_names
-do
-    of="$of of=/dev/$device"
-    sudo umount /dev/$device*
-done
-
-sudo dcfldd if=$1 sizeprobe=if bs=1M$of
+# RPI4 SD card flash script. Supports flashing multiple cards simultaneously.
+#
+# Runs the flasher from the turtlebot4_setup package. On a PC without the package, copy
+# turtlebot4_setup/sd_flash.py next to this script, it only needs python3.
+#
+# usage: sudo bash sd_flash.sh /path/to/image.img [sda sdb ...] [-h]
+# Run with -h for all options.
+
+SCRIPT_DIR=$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)
+
+if [ -f "$SCRIPT_DIR/turtlebot4_setup_path.sh" ]; then
+    . "$SCRIPT_DIR/turtlebot4_setup_path.sh"
+    if PACKAGE_PATH=$(turtlebot4_setup_path "$SCRIPT_DIR"); then
+        PYTHONPATH="$PACKAGE_PATH${PYTHONPATH:+:$PYTHONPATH}" exec python3 -m turtlebot4_setup.sd_flash "$@"
+    fi
+fi
+
+if [ -f "$SCRIPT_DIR/sd_flash.py" ]; then
+    exec python3 "$SCRIPT_DIR/sd_flash.py" "$@"
+fi
+
+echo "Error: The flasher was not found. Install ros-humble-turtlebot4-setup, or copy sd_flash.py from the turtlebot4_setup package next to this script." >&2
+exit 1
@@ -0,0 +1,22 @@
+#!/usr/bin/env bash
+
+# Sourced by the scripts that run a turtlebot4_setup module.
+#
+# turtlebot4_setup_path SCRIPT_DIR prints the directory to add to PYTHONPATH: the source tree when
+# run from a checkout, or the ROS install once installed to /usr/bin. The install is found by path
+# since sudo drops the PYTHONPATH and ROS_DISTRO that sourcing ROS sets. Fails if neither is found.
+
+turtlebot4_setup_path()
+{
+    if [ -f "$1/../turtlebot4_setup/__init__.py" ]; then
+        echo "$1/.."
+        return 0
+    fi
+    for dir in /opt/ros/${ROS_DISTRO:-*}/lib/python3*/site-packages /opt/ros/${ROS_DISTRO:-*}/local/lib/python3*/dist-packages; do
+        if [ -f "$dir/turtlebot4_setup/__init__.py" ]; then
+            echo "$dir"
+            return 0
+        fi
+    done
+    return 1
+}
@@ -0,0 +1,48 @@
+import functools
+import os
+import shutil
+import sys
+import types
+
+from importlib.machinery import SourceFileLoader
+
+import pytest
+
+# Run against the source tree, not an installed copy
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+from create3_stub import StubCreate3  # noqa: E402
+
+
+@pytest.fixture
+def root(tmp_path):
+    # A copy of the package's /etc, so that Conf can read and write settings under tmp_path
+    shutil.copytree(os.path.join(REPO, 'etc'), tmp_path / 'etc')
+    (tmp_path / 'etc' / 'hostname').write_text('turtlebot4\n')
+    return tmp_path
+
+
+@pytest.fixture
+def create3():
+    stub = StubCreate3()
+    yield stub
+    stub.stop()
+
+
+@pytest.fixture
+def setup_script():
+    # The setup tool is a script without a .py extension, so it is loaded by path
+    pytest.importorskip('simple_term_menu_vendor')
+    loader = SourceFileLoader('turtlebot4_setup_script', os.path.join(REPO, 'turtlebot4_setup', 'turtlebot4_setup'))
+    module = types.ModuleType(loader.name)
+    loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def setup(setup_script, root, monkeypatch):
+    # The setup tool, reading and writing its settings under root
+    from turtlebot4_setup.conf import Conf
+    monkeypatch.setattr(setup_script, 'Conf', functools.partial(Conf, str(root)))
+    return setup_script.Turtlebot4Setup()
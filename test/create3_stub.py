@@ -0,0 +1,79 @@
+import http.server
+import threading
+import time
+
+from collections import namedtuple
+
+Request = namedtuple('Request', ['method', 'path', 'body', 'headers'])
+
+# A status that closes the connection after reading the request, without responding
+DROP = 'drop'
+
+
+class Create3Handler(http.server.BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        self.respond(b'')
+
+    def do_POST(self):
+        self.respond(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+
+    def respond(self, body):
+        stub = self.server.stub
+        stub.requests.append(Request(self.command, self.path, body, dict(self.headers)))
+        status = stub.statuses.pop(0) if stub.statuses else 200
+        if status == DROP:
+            return
+        page = stub.pages.get(self.path, '').encode('utf-8') if self.command == 'GET' else b''
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(page)))
+        self.end_headers()
+        self.wfile.write(page)
+        if self.command == 'POST' and stub.on_post is not None:
+            threading.Thread(target=stub.on_post, args=(self.path,), daemon=True).start()
+
+    def log_message(self, *args):
+        pass
+
+
+class StubCreate3():
+    # A web server that can be taken down and brought back on the same port, like a rebooting Create 3.
+    # Pages are served by path, and statuses are returned in order before falling back to 200.
+
+    def __init__(self) -> None:
+        self.requests = []
+        self.pages = {}
+        self.statuses = []
+        self.on_post = None
+        self.server = None
+        self.port = 0
+        self.start()
+
+    def start(self):
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', self.port), Create3Handler)
+        self.server.stub = self
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def posts(self, path=None):
+        return [r for r in self.requests if r.method == 'POST' and path in [None, r.path]]
+
+    def reboot(self, down):
+        self.stop()
+        time.sleep(down)
+        self.start()
+
+    def reboot_after_post(self, path, up, down):
+        # Keeps serving for up seconds after path is posted, then goes down for down seconds
+        def on_post(posted):
+            if posted == path:
+                self.on_post = None
+                time.sleep(up)
+                self.reboot(down)
+        self.on_post = on_post
@@ -0,0 +1,194 @@
+# Times the setup tool's hot paths against a copy of the etc tree in a temporary root, so it
+# can run on a robot without touching its settings. Only runs when TURTLEBOT4_SETUP_BENCHMARK
+# names the JSON file to write the results to, so that runs on different machines and
+# revisions can be compared.
+#
+# usage: TURTLEBOT4_SETUP_BENCHMARK=results.json python3 -m pytest test/test_benchmark.py [-k FILTER]
+
+import copy
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import pytest
+
+from turtlebot4_setup.conf import Conf, BashOptions, DiscoveryOptions, DiscoveryServers
+from turtlebot4_setup.transaction import WriteTransaction, commit_files
+
+OUTPUT = os.environ.get('TURTLEBOT4_SETUP_BENCHMARK')
+REPEAT = int(os.environ.get('TURTLEBOT4_SETUP_BENCHMARK_REPEAT', 50))
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+pytestmark = pytest.mark.skipif(not OUTPUT, reason='Set TURTLEBOT4_SETUP_BENCHMARK to the results file')
+
+
+class Benchmark():
+
+    def __init__(self, repeat) -> None:
+        self.repeat = repeat
+        self.results = {}
+
+    def run(self, name, function, setup=None, repeat=None):
+        samples = []
+        for _ in range(repeat or self.repeat):
+            arg = setup() if setup is not None else None
+            start = time.perf_counter()
+            function(arg) if setup is not None else function()
+            samples.append(time.perf_counter() - start)
+        self.results[name] = {
+            'repeat': len(samples),
+            'min_us': min(samples) * 1e6,
+            'median_us': statistics.median(samples) * 1e6,
+            'mean_us': statistics.mean(samples) * 1e6,
+            'max_us': max(samples) * 1e6,
+        }
+        print('{0:<40} {1:>12.1f} us (median of {2})'.format(name, self.results[name]['median_us'], len(samples)),
+              file=sys.stderr)
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PACKAGE_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+@pytest.fixture(scope='module')
+def b():
+    benchmark = Benchmark(REPEAT)
+    yield benchmark
+    report = {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'revision': git_revision(),
+        'host': platform.node(),
+        'machine': platform.machine(),
+        'python': platform.python_version(),
+        'results': benchmark.results,
+    }
+    with open(OUTPUT, 'w') as f:
+        json.dump(report, f, indent=2)
+        f.write('\n')
+
+
+@pytest.fixture(autouse=True)
+def no_sudo(monkeypatch):
+    # Commits never leave the temporary root, and sudo is not part of the timings
+    monkeypatch.setattr(WriteTransaction, 'commit_privileged', lambda self, entries: commit_files(entries))
+
+
+def servers(count):
+    return DiscoveryServers({i: ('192.168.{0}.{1}'.format(i // 250, i % 250 + 1), 11811) for i in range(1, count + 1)})
+
+
+def test_conf(b, root):
+    conf = Conf(str(root))
+
+    def cold_read():
+        conf.parse_cache.clear()
+        conf.read()
+    b.run('conf.read.cold', cold_read)
+    b.run('conf.read.cached', conf.read)
+    b.run('conf.init', lambda: Conf(str(root)))
+
+    namespaces = ['/robot1', '/robot2']
+
+    def write_round_trip():
+        conf.set(BashOptions.NAMESPACE, namespaces[0])
+        namespaces.reverse()
+        conf.write()
+        conf.read()
+    b.run('conf.write_read.bash', write_round_trip)
+
+    def write_all():
+        for group in [conf.system_conf, conf.wifi_conf, conf.bash_conf, conf.discovery_conf,
+                      conf.fastdds_conf, conf.cyclonedds_conf]:
+            for option in group:
+                conf.dirty.add(type(option))
+        conf.write()
+    b.run('conf.write.all_groups', write_all)
+    b.run('conf.write.unchanged', conf.write)
+
+    def changed_conf():
+        c = copy.copy(conf)
+        c.journal = {}
+        c.bash_conf = dict(conf.bash_conf)
+        c.discovery_conf = dict(conf.discovery_conf)
+        return c
+
+    def many_changes(c):
+        c.set(BashOptions.DOMAIN_ID, 7)
+        c.set(BashOptions.NAMESPACE, '/benchmark')
+        c.set(DiscoveryOptions.ENABLED, True)
+        c.set(DiscoveryOptions.OFFBOARD_SERVERS, servers(8))
+        c.changes()
+    b.run('conf.set.journal', many_changes, setup=changed_conf)
+
+
+def test_diff(b, setup):
+    b.run('diff.no_changes', setup.settings_diff)
+
+    setup.conf.set(BashOptions.DOMAIN_ID, 12)
+    setup.conf.set(BashOptions.NAMESPACE, '/benchmark')
+    setup.conf.set(DiscoveryOptions.ENABLED, True)
+    setup.conf.set(DiscoveryOptions.OFFBOARD_SERVERS, servers(32))
+    b.run('diff.changes', setup.settings_diff)
+
+
+@pytest.mark.parametrize('count', [1, 16, 255])
+def test_discovery(b, root, count):
+    conf = Conf(str(root))
+    offboard = servers(count)
+    text = str(offboard)
+    conf.set(DiscoveryOptions.ENABLED, True)
+    conf.set(DiscoveryOptions.OFFBOARD_SERVERS, offboard.remove(count))
+    conf.set(DiscoveryOptions.SERVER_ID, count)
+    b.run('discovery.parse.{0}'.format(count), lambda: DiscoveryServers.parse(text))
+    b.run('discovery.str.{0}'.format(count), lambda: str(offboard))
+    b.run('discovery.get_discovery_str.{0}'.format(count), conf.get_discovery_str)
+    b.run('discovery.get_create3_server_str.{0}'.format(count), conf.get_create3_server_str)
+    b.run('discovery.free_id.{0}'.format(count), lambda: offboard.free_id(used=[0]))
+
+
+@pytest.fixture
+def terminal():
+    # TerminalMenu draws on the controlling terminal
+    try:
+        with open('/dev/tty'):
+            pass
+    except OSError:
+        pytest.skip('no terminal')
+    pytest.importorskip('simple_term_menu_vendor')
+
+
+@pytest.mark.parametrize('count', [10, 100])
+def test_menu_create(b, terminal, count):
+    from turtlebot4_setup.menu import Menu, MenuEntry
+
+    menu = Menu('Benchmark', [MenuEntry('Entry {0}'.format(i), None) for i in range(count)])
+    menu.update_title()
+    entries = [e.name for e in menu.menu_entries]
+    b.run('menu.create_term_menu.{0}'.format(count), lambda: menu.create_term_menu(entries))
+
+
+def test_menu_refresh(b, terminal):
+    from turtlebot4_setup.menu import Menu, MenuEntry
+
+    counter = [0]
+    menu = Menu(lambda: 'Benchmark {0}'.format(counter[0]),
+                [MenuEntry(lambda i=i: 'Entry {0} [{1}]'.format(i, counter[0]), None) for i in range(20)])
+    menu.refresh_term_menu()
+
+    def refresh():
+        counter[0] += 1
+        menu.refresh_term_menu()
+    b.run('menu.refresh.in_place', refresh)
+
+    def rebuild():
+        menu.menu = None
+        menu.refresh_term_menu()
+    b.run('menu.refresh.rebuild', rebuild)
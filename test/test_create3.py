@@ -0,0 +1,145 @@
+import threading
+import time
+from urllib.parse import parse_qsl
+
+import pytest
+
+from create3_stub import DROP
+from turtlebot4_setup.create3 import Create3Client, Create3Error, encode_form
+
+
+def client(create3, **kwargs):
+    kwargs.setdefault('backoff', 0.01)
+    kwargs.setdefault('timeout', 2.0)
+    return Create3Client('127.0.0.1', create3.port, **kwargs)
+
+
+def start_later(create3, seconds):
+    create3.stop()
+    threading.Timer(seconds, create3.start).start()
+
+
+def test_retries_until_the_server_accepts_connections(create3):
+    create3.pages['/ros-config'] = 'ready'
+    start_later(create3, 0.3)
+
+    with client(create3, backoff=0.1) as c:
+        assert c.get('/ros-config') == b'ready'
+
+    record = c.history[-1]
+    assert record.status == 200
+    assert record.attempts > 1
+    assert record.latency >= 0.3
+
+
+def test_gives_up_after_the_retries(create3):
+    create3.stop()
+
+    with client(create3, retries=2) as c:
+        with pytest.raises(Create3Error, match='GET /ros-config failed'):
+            c.get('/ros-config')
+
+    assert [(r.method, r.path, r.status, r.attempts) for r in c.history] == [('GET', '/ros-config', None, 3)]
+
+
+def test_backoff_doubles_up_to_the_limit(monkeypatch):
+    delays = []
+    monkeypatch.setattr(time, 'sleep', delays.append)
+    c = Create3Client(backoff=0.5, max_backoff=8.0)
+    for attempt in range(1, 7):
+        c.wait(attempt)
+    assert delays == [0.5, 1.0, 2.0, 4.0, 8.0, 8.0]
+
+
+def test_retries_server_errors(create3):
+    create3.statuses = [503, 500]
+
+    with client(create3) as c:
+        c.get('/ros-config')
+
+    assert len(create3.requests) == 3
+    assert c.history[-1].status == 200
+    assert c.history[-1].attempts == 3
+
+
+def test_reports_persistent_server_errors(create3):
+    create3.statuses = [503] * 5
+
+    with client(create3, retries=2) as c:
+        with pytest.raises(Create3Error, match='returned 503'):
+            c.get('/ros-config')
+
+    assert len(create3.requests) == 3
+
+
+def test_does_not_retry_client_errors(create3):
+    create3.statuses = [404]
+
+    with client(create3) as c:
+        with pytest.raises(Create3Error, match='returned 404'):
+            c.get('/missing')
+
+    assert len(create3.requests) == 1
+
+
+@pytest.mark.parametrize('status', [503, DROP])
+def test_does_not_repeat_the_reboot(create3, status):
+    create3.statuses = [status]
+
+    with client(create3) as c:
+        with pytest.raises(Create3Error):
+            c.reboot()
+
+    assert len(create3.posts('/api/reboot')) == 1
+
+
+def test_reboot_waits_for_a_connection(create3):
+    # Nothing has been sent until the connection is made, so connecting can be retried
+    start_later(create3, 0.2)
+
+    with client(create3, backoff=0.1) as c:
+        c.reboot()
+
+    assert len(create3.posts('/api/reboot')) == 1
+
+
+def test_encodes_forms():
+    assert encode_form({'checked': True, 'unchecked': False, 'value': 'a;b:c&d=e f'}) == \
+        'checked&value=a%3Bb%3Ac%26d%3De+f'
+
+
+def test_posts_forms(create3):
+    fields = Create3Client.ros_config(domain_id=0, namespace='/robot 1', rmw='rmw_fastrtps_cpp',
+                                      discovery_server=';;192.168.186.3:11811',
+                                      discovery_server_enabled=True)
+
+    with client(create3) as c:
+        c.save_form('ros_config', fields)
+        fields['fast_discovery_server_enabled'] = False
+        c.save_form('ros_config', fields)
+
+    enabled, disabled = create3.posts('/ros-config-save-main')
+    assert enabled.headers['Content-Type'] == 'application/x-www-form-urlencoded'
+    assert parse_qsl(enabled.body.decode(), keep_blank_values=True) == [
+        ('ros_domain_id', '0'),
+        ('ros_namespace', '/robot 1'),
+        ('rmw_implementation', 'rmw_fastrtps_cpp'),
+        ('fast_discovery_server_value', ';;192.168.186.3:11811'),
+        ('fast_discovery_server_enabled', ''),
+    ]
+    assert b'fast_discovery_server_value=%3B%3B192.168.186.3%3A11811' in enabled.body
+    assert b'fast_discovery_server_enabled' not in disabled.body
+
+
+def test_records_every_request(create3):
+    create3.statuses = [200, 502]
+
+    with client(create3) as c:
+        c.get('/ros-config')
+        c.post_form('/ros-config-save-main', {'ros_domain_id': 1})
+
+    assert [(r.method, r.path, r.status, r.attempts) for r in c.history] == [
+        ('GET', '/ros-config', 200, 1),
+        ('POST', '/ros-config-save-main', 200, 2),
+    ]
+    assert all(r.latency > 0 for r in c.history)
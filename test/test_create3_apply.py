@@ -0,0 +1,141 @@
+import functools
+import html
+
+import pytest
+
+from turtlebot4_setup.create3 import Create3Client, RebootWatcher
+from turtlebot4_setup.pipeline import TaskError
+
+
+def ros_config_page(domain_id, namespace, rmw, discovery_server, discovery_server_enabled):
+    options = ''.join('<option value="{0}"{1}>{0}</option>'.format(r, ' selected' if r == rmw else '')
+                      for r in ['rmw_cyclonedds_cpp', 'rmw_fastrtps_cpp'])
+    return ('<form action="/ros-config-save-main" method="post">'
+            '<input type="text" name="ros_domain_id" value="{0}">'
+            '<input type="text" name="ros_namespace" value="{1}">'
+            '<select name="rmw_implementation">{2}</select>'
+            '<input type="checkbox" name="fast_discovery_server_enabled"{3}>'
+            '<input type="text" name="fast_discovery_server_value" value="{4}">'
+            '<input type="submit" value="Save">'
+            '</form>').format(domain_id, html.escape(namespace), options,
+                              ' checked' if discovery_server_enabled else '', html.escape(discovery_server))
+
+
+def textarea_page(action, config):
+    # The Create 3 sends line endings back as CRLF
+    return '<form action="{0}" method="post"><textarea name="config">\n{1}\r\n</textarea></form>'.format(
+        action, html.escape(config).replace('\n', '\r\n'))
+
+
+@pytest.fixture
+def create3_apply(setup, setup_script, create3, monkeypatch):
+    class StubClient(Create3Client):
+        def __init__(self) -> None:
+            super().__init__('127.0.0.1', create3.port, timeout=2.0, retries=1, backoff=0.01)
+    monkeypatch.setattr(setup_script, 'Create3Client', StubClient)
+
+    monkeypatch.setenv('ROBOT_NAMESPACE', '/robot1')
+    monkeypatch.setenv('ROS_DOMAIN_ID', '3')
+    monkeypatch.setenv('RMW_IMPLEMENTATION', 'rmw_fastrtps_cpp')
+
+    # The Create 3 already has the settings being applied
+    create3.pages.update({
+        '/ros-config': ros_config_page('3', '/robot1', 'rmw_fastrtps_cpp',
+                                       setup.conf.get_create3_server_str(), False),
+        '/rmw-profile-override': textarea_page('/rmw-profile-override-save', ''),
+        '/beta-ntp-conf': textarea_page('/beta-ntp-conf-save', setup.conf.get_create3_ntp_config()),
+    })
+    return setup
+
+
+def stop(watcher):
+    if watcher is not None:
+        watcher.stop()
+
+
+def test_unchanged_settings_are_not_pushed(create3_apply, create3):
+    assert create3_apply.update_create3() is None
+    assert create3.posts() == []
+
+
+def test_only_the_changed_form_is_pushed(create3_apply, create3):
+    create3.pages['/ros-config'] = create3.pages['/ros-config'].replace('value="3"', 'value="0"')
+
+    stop(create3_apply.update_create3())
+
+    assert [r.path for r in create3.posts()] == ['/ros-config-save-main', '/api/reboot']
+    assert b'ros_domain_id=3' in create3.posts()[0].body
+
+
+def test_a_changed_checkbox_is_pushed(create3_apply, create3):
+    create3.pages['/ros-config'] = create3.pages['/ros-config'].replace(
+        'name="fast_discovery_server_enabled"', 'name="fast_discovery_server_enabled" checked')
+
+    stop(create3_apply.update_create3())
+
+    assert [r.path for r in create3.posts()] == ['/ros-config-save-main', '/api/reboot']
+
+
+@pytest.mark.parametrize('page', ['', 'Internal error', '<html><body><p>Loading</body>', '<form><input'])
+def test_unreadable_forms_are_pushed(create3_apply, create3, page):
+    for path in create3.pages:
+        create3.pages[path] = page
+
+    stop(create3_apply.update_create3())
+
+    assert [r.path for r in create3.posts()] == ['/ros-config-save-main', '/rmw-profile-override-save',
+                                                 '/beta-ntp-conf-save', '/api/reboot']
+
+
+def test_forms_that_fail_to_load_are_pushed(create3_apply, create3):
+    create3.pages['/beta-ntp-conf'] = 'Not Found'
+    create3.statuses = [200, 200, 404]
+
+    stop(create3_apply.update_create3())
+
+    assert [r.path for r in create3.posts()] == ['/beta-ntp-conf-save', '/api/reboot']
+
+
+@pytest.fixture
+def fast_polling(setup_script, monkeypatch):
+    monkeypatch.setattr(setup_script, 'RebootWatcher',
+                        functools.partial(RebootWatcher, poll_interval=0.05, probe_timeout=0.5))
+
+
+def test_waits_for_the_create3_to_reboot(create3_apply, create3, fast_polling):
+    create3.pages['/ros-config'] = ''
+    create3.reboot_after_post('/api/reboot', up=0.1, down=0.5)
+
+    watcher = create3_apply.update_create3()
+    duration = create3_apply.wait_for_create3(watcher)
+
+    assert watcher.went_down
+    assert duration == watcher.duration
+    assert 0.5 <= duration < 5.0
+
+
+def test_times_out_if_the_create3_does_not_come_back(create3_apply, create3, fast_polling):
+    create3.pages['/ros-config'] = ''
+    create3.reboot_after_post('/api/reboot', up=0.1, down=30.0)
+    create3_apply.create3_ready_timeout = 1.0
+
+    watcher = create3_apply.update_create3()
+    with pytest.raises(TaskError, match='did not come back within 1 seconds'):
+        create3_apply.wait_for_create3(watcher)
+
+    assert watcher.went_down
+    assert watcher.duration is None
+    assert watcher.stopped.is_set()
+
+
+def test_does_not_wait_without_a_reboot(create3_apply):
+    assert create3_apply.wait_for_create3(None) is None
+
+
+def test_assumes_a_reboot_it_did_not_see_is_complete(create3):
+    # A Create 3 that reboots between two probes is never seen going down
+    watcher = RebootWatcher('127.0.0.1', create3.port, poll_interval=0.05, probe_timeout=0.5, down_timeout=0.3)
+
+    assert watcher.start().wait(5.0)
+    assert not watcher.went_down
+    assert 0.3 <= watcher.duration < 5.0
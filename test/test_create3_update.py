@@ -0,0 +1,47 @@
+import functools
+
+import pytest
+
+from turtlebot4_setup import create3_update
+from turtlebot4_setup.create3 import RebootWatcher
+
+
+@pytest.fixture(autouse=True)
+def fast_polling(monkeypatch):
+    monkeypatch.setattr(create3_update, 'RebootWatcher',
+                        functools.partial(RebootWatcher, poll_interval=0.05, probe_timeout=0.5))
+
+
+def test_waits_for_the_reboot_after_installing(create3):
+    # Still serving while the update installs, for longer than RebootWatcher's default down timeout allows
+    create3.reboot_after_post(create3_update.UPDATE_PATH, up=1.0, down=0.5)
+    image = b'\x01' * 3000000
+
+    result = create3_update.update_target(image, '127.0.0.1', create3.port, reboot_timeout=10.0)
+
+    assert result['result'] == 'success'
+    assert [r.body for r in create3.posts()] == [image]
+    assert result['reboot'] >= 1.5
+
+
+def test_fails_if_it_never_reboots(create3):
+    result = create3_update.update_target(b'\x01' * 1000, '127.0.0.1', create3.port, reboot_timeout=1.0)
+
+    assert result['result'] == 'error'
+    assert 'Did not reboot' in result['message']
+
+
+def test_fails_if_it_does_not_come_back(create3):
+    create3.reboot_after_post(create3_update.UPDATE_PATH, up=0.2, down=30.0)
+
+    result = create3_update.update_target(b'\x01' * 1000, '127.0.0.1', create3.port, reboot_timeout=1.0)
+
+    assert result['result'] == 'error'
+    assert 'Did not come back' in result['message']
+
+
+def test_does_not_wait_without_wait(create3):
+    result = create3_update.update_target(b'\x01' * 1000, '127.0.0.1', create3.port, wait=False)
+
+    assert result['result'] == 'success'
+    assert 'reboot' not in result
@@ -0,0 +1,73 @@
+import pytest
+
+from turtlebot4_setup.conf import BashOptions, Conf, DiscoveryOptions, DiscoveryServer, DiscoveryServers
+
+
+@pytest.mark.parametrize('discovery_str', [
+    '',
+    '127.0.0.1:11811;',
+    '10.0.0.1:11811;127.0.0.1:11812;',
+    # A server's position in the list is its ID, so gaps are kept
+    ';;10.0.0.3:11812;',
+    '10.0.0.1:11811;;;;192.168.0.5:15000;',
+])
+def test_round_trip(discovery_str):
+    assert str(DiscoveryServers.parse(discovery_str)) == discovery_str
+
+
+def test_parse_gaps_and_ports():
+    servers = DiscoveryServers.parse('"10.0.0.1;;10.0.0.3:11812;"')
+    assert dict(servers) == {0: DiscoveryServer('10.0.0.1', 11811), 2: DiscoveryServer('10.0.0.3', 11812)}
+    assert str(servers) == '10.0.0.1:11811;;10.0.0.3:11812;'
+    assert servers.free_id() == 1
+
+
+def test_rejects_out_of_range_ids():
+    with pytest.raises(ValueError):
+        DiscoveryServers({256: ('10.0.0.1', 11811)})
+
+
+def test_add_rejects_duplicate_ids():
+    servers = DiscoveryServers({1: ('10.0.0.1', 11811)})
+    with pytest.raises(ValueError, match='already used'):
+        servers.add(1, '10.0.0.2', 11811)
+    assert str(servers.add(0, '10.0.0.2', 11812)) == '10.0.0.2:11812;10.0.0.1:11811;'
+    # Instances are never modified
+    assert len(servers) == 1
+
+
+def test_discovery_str_includes_onboard_server(root):
+    conf = Conf(str(root))
+    conf.set(DiscoveryOptions.SERVER_ID, 1)
+    conf.set(DiscoveryOptions.PORT, 11811)
+    conf.set(DiscoveryOptions.OFFBOARD_SERVERS, DiscoveryServers({0: ('10.0.0.1', 11811), 3: ('10.0.0.3', 11812)}))
+    assert conf.get_discovery_str() == '10.0.0.1:11811;127.0.0.1:11811;;10.0.0.3:11812;'
+
+
+def test_discovery_str_rejects_duplicate_onboard_id(root):
+    conf = Conf(str(root))
+    conf.set(DiscoveryOptions.ENABLED, True)
+    conf.set(DiscoveryOptions.SERVER_ID, 1)
+    conf.set(DiscoveryOptions.OFFBOARD_SERVERS, DiscoveryServers({1: ('10.0.0.1', 11811), 3: ('10.0.0.3', 11812)}))
+    with pytest.raises(ValueError, match='already used'):
+        conf.get_discovery_str()
+    # Nothing is written
+    setup_bash = (root / 'etc' / 'turtlebot4' / 'setup.bash').read_text()
+    with pytest.raises(ValueError):
+        conf.write_discovery()
+    assert (root / 'etc' / 'turtlebot4' / 'setup.bash').read_text() == setup_bash
+
+
+def test_discovery_settings_read_back(root):
+    conf = Conf(str(root))
+    conf.set(DiscoveryOptions.ENABLED, True)
+    conf.set(DiscoveryOptions.SERVER_ID, 2)
+    conf.set(DiscoveryOptions.PORT, 11812)
+    conf.set(DiscoveryOptions.OFFBOARD_SERVERS, DiscoveryServers({0: ('10.0.0.1', 11811)}))
+    conf.write_discovery()
+
+    conf = Conf(str(root))
+    assert conf.get(BashOptions.DISCOVERY_SERVER) == '10.0.0.1:11811;;127.0.0.1:11812;'
+    assert conf.get(DiscoveryOptions.SERVER_ID) == 2
+    assert conf.get(DiscoveryOptions.PORT) == 11812
+    assert dict(conf.get(DiscoveryOptions.OFFBOARD_SERVERS)) == {0: DiscoveryServer('10.0.0.1', 11811)}
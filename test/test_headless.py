@@ -0,0 +1,205 @@
+import functools
+import json
+import sys
+
+import pytest
+
+from turtlebot4_setup import headless
+from turtlebot4_setup.conf import BashOptions, Conf, CycloneDDSOptions, DiscoveryOptions, DiscoveryServers
+from turtlebot4_setup.conf import FastDDSOptions, SystemOptions, TimeSyncOptions, WifiOptions
+from turtlebot4_setup.conf import clamp_domain_id, clamp_port
+from turtlebot4_setup.headless import ConfigError
+
+
+@pytest.mark.parametrize('option, value, expected', [
+    (BashOptions.DOMAIN_ID, 0, 0),
+    (BashOptions.DOMAIN_ID, '101', 101),
+    (BashOptions.DOMAIN_ID, 232, 232),
+    (BashOptions.DOMAIN_ID, 3.0, 3),
+    (BashOptions.NAMESPACE, 'robot1', '/robot1'),
+    (BashOptions.NAMESPACE, '', None),
+    (BashOptions.DIAGNOSTICS, 'enabled', '1'),
+    (BashOptions.RMW, 'rmw_cyclonedds_cpp', 'rmw_cyclonedds_cpp'),
+    (DiscoveryOptions.PORT, 11811, 11811),
+    (DiscoveryOptions.SERVER_ID, 255, 255),
+    (DiscoveryOptions.ENABLED, 'yes', True),
+    (WifiOptions.DHCP, False, False),
+    (FastDDSOptions.MAX_MESSAGE_SIZE, 65500, 65500),
+    (CycloneDDSOptions.INTERFACES, ['wlan0', 'usb0'], 'wlan0,usb0'),
+    (CycloneDDSOptions.FRAGMENT_SIZE, 0, 0),
+    (TimeSyncOptions.SERVERS, ['192.168.0.10', 'base.local'], '192.168.0.10,base.local'),
+])
+def test_accepts_valid_values(option, value, expected):
+    assert headless.validate(option, value) == expected
+
+
+@pytest.mark.parametrize('option, value', [
+    (BashOptions.DOMAIN_ID, -1),
+    (BashOptions.DOMAIN_ID, 102),
+    (BashOptions.DOMAIN_ID, 233),
+    (BashOptions.DOMAIN_ID, 3.7),
+    (BashOptions.DOMAIN_ID, '3.7'),
+    (BashOptions.DOMAIN_ID, True),
+    (BashOptions.DOMAIN_ID, 'one'),
+    (BashOptions.RMW, 'rmw_zenoh_cpp'),
+    (DiscoveryOptions.PORT, 9999),
+    (DiscoveryOptions.PORT, 65536),
+    (DiscoveryOptions.SERVER_ID, 256),
+    (DiscoveryOptions.ENABLED, 'maybe'),
+    (SystemOptions.MODEL, 'pro'),
+    (SystemOptions.HOSTNAME, ''),
+    (FastDDSOptions.SOCKET_BUFFER_SIZE, 2 ** 31),
+    (FastDDSOptions.MAX_MESSAGE_SIZE, 65501),
+    (CycloneDDSOptions.INTERFACES, []),
+    (CycloneDDSOptions.FRAGMENT_SIZE, 10),
+    (TimeSyncOptions.PRESET, 'fast'),
+    (TimeSyncOptions.SERVERS, 'pool ntp.ubuntu.com'),
+])
+def test_rejects_invalid_values(option, value):
+    with pytest.raises(ValueError):
+        headless.validate(option, value)
+
+
+def test_parse_clamped_rejects_values_the_prompts_would_clamp():
+    assert headless.parse_clamped('215', clamp_domain_id, '0-101 or 215-232') == 215
+    with pytest.raises(ValueError, match='Expected 10000-65535'):
+        headless.parse_clamped(70000, clamp_port, '10000-65535')
+
+
+def test_parses_offboard_servers():
+    servers = headless.validate(DiscoveryOptions.OFFBOARD_SERVERS,
+                                [{'id': 1, 'ip': '192.168.0.10'}, {'id': 3, 'ip': '192.168.0.11', 'port': 11812}])
+    assert str(servers) == ';192.168.0.10:11811;;192.168.0.11:11812;'
+    assert headless.validate(DiscoveryOptions.OFFBOARD_SERVERS, str(servers)) == servers
+
+
+@pytest.mark.parametrize('value', [
+    [{'id': 1, 'ip': '192.168.0.10'}, {'id': 1, 'ip': '192.168.0.11'}],
+    [{'id': 256, 'ip': '192.168.0.10'}],
+    [{'id': 1, 'ip': '192.168.0.10', 'port': 80}],
+    [{'id': 1}],
+    ['192.168.0.10'],
+    {'id': 1, 'ip': '192.168.0.10'},
+])
+def test_rejects_invalid_offboard_servers(value):
+    with pytest.raises(ValueError):
+        headless.validate(DiscoveryOptions.OFFBOARD_SERVERS, value)
+
+
+def test_loads_settings_by_name_or_value():
+    settings = headless.load_settings({
+        'bash': {'ROBOT_NAMESPACE': '/robot1', 'DOMAIN_ID': 3},
+        'fastdds': {'MAX_MESSAGE_SIZE': 32768, 'PRESET': 'high_throughput'},
+    })
+    assert (BashOptions.NAMESPACE, '/robot1') in settings
+    assert (BashOptions.DOMAIN_ID, 3) in settings
+    # The preset comes first so that the settings in the file override it
+    assert settings[0] == (FastDDSOptions.PRESET, 'high_throughput')
+
+
+def test_reports_every_error():
+    with pytest.raises(ConfigError) as e:
+        headless.load_settings({
+            'bash': {'ROS_DOMAIN_ID': 500, 'COLOR': 'blue'},
+            'robot': {'MODEL': 'lite'},
+            'wifi': 'Warehouse',
+        })
+    assert e.value.errors == [
+        'bash.ROS_DOMAIN_ID: Invalid value "500". Expected 0-101 or 215-232',
+        'bash: Unknown setting "COLOR"',
+        'Unknown section "robot"',
+        'Section "wifi" must be a mapping',
+    ]
+
+
+@pytest.mark.parametrize('doc', [None, [], 'system'])
+def test_rejects_files_that_are_not_mappings(doc):
+    with pytest.raises(ConfigError, match='Expected a mapping of sections'):
+        headless.load_settings(doc)
+
+
+def test_load_file_reports_yaml_errors(tmp_path):
+    path = tmp_path / 'robot.yaml'
+    path.write_text('bash: [unclosed\n')
+    with pytest.raises(ConfigError):
+        headless.load_file(str(path))
+    with pytest.raises(ConfigError):
+        headless.load_file(str(tmp_path / 'missing.yaml'))
+
+
+def test_check_discovery_ids(root):
+    conf = Conf(str(root))
+    conf.set(DiscoveryOptions.SERVER_ID, 1)
+    conf.set(DiscoveryOptions.OFFBOARD_SERVERS, DiscoveryServers({0: ('192.168.0.10', 11811)}))
+    headless.check_discovery_ids(conf)
+
+    # The ID may come from the robot's current settings rather than the file
+    conf.set(DiscoveryOptions.OFFBOARD_SERVERS, DiscoveryServers({1: ('192.168.0.10', 11811)}))
+    with pytest.raises(ConfigError, match='SERVER_ID 1 is also used'):
+        headless.check_discovery_ids(conf)
+
+
+@pytest.fixture
+def apply_file(setup_script, root, monkeypatch, tmp_path):
+    # Runs apply on a config file, returning the exit code and the results written to stdout
+    monkeypatch.setattr(setup_script, 'Conf', functools.partial(Conf, str(root)))
+
+    def run(text):
+        path = tmp_path / 'robot.yaml'
+        path.write_text(text)
+        # apply_file moves everything but the results off stdout at the file descriptor level
+        with open(tmp_path / 'stdout', 'w') as stdout, open(tmp_path / 'stderr', 'w') as stderr:
+            streams = sys.stdout, sys.stderr
+            sys.stdout, sys.stderr = stdout, stderr
+            try:
+                code = setup_script.apply_file(str(path), create3_ready_timeout=1.0)
+            finally:
+                sys.stdout, sys.stderr = streams
+        out = (tmp_path / 'stdout').read_text()
+        return code, [json.loads(line) for line in out.splitlines()]
+    return run
+
+
+def test_apply_reports_invalid_files(apply_file):
+    code, results = apply_file('bash:\n  ROS_DOMAIN_ID: 500\n')
+
+    assert code == 2
+    assert [r['result'] for r in results] == ['invalid']
+    assert results[0]['errors'] == ['bash.ROS_DOMAIN_ID: Invalid value "500". Expected 0-101 or 215-232']
+
+
+def test_apply_reports_apply_errors(apply_file, setup_script, monkeypatch):
+    monkeypatch.setattr(setup_script.Turtlebot4Setup, 'apply', lambda self: (1, 'Error writing settings'))
+    monkeypatch.setattr(setup_script.Turtlebot4Setup, 'discard_unapplied', lambda self: None)
+
+    code, results = apply_file('bash:\n  ROS_DOMAIN_ID: 5\n')
+
+    assert code == 1
+    assert [r['result'] for r in results] == ['error']
+    assert results[0]['errors'] == ['Error writing settings']
+    assert results[0]['changes']['ROS_DOMAIN_ID'][1] == 5
+
+
+def test_apply_reports_unexpected_exceptions(apply_file, setup_script, monkeypatch):
+    def apply(self):
+        raise OSError(30, 'Read-only file system')
+    monkeypatch.setattr(setup_script.Turtlebot4Setup, 'apply', apply)
+
+    code, results = apply_file('bash:\n  ROS_DOMAIN_ID: 5\n')
+
+    assert code == 1
+    assert [r['result'] for r in results] == ['error']
+    assert results[0]['errors'] == ['OSError: [Errno 30] Read-only file system']
+    assert 'ROS_DOMAIN_ID' in results[0]['changes']
+
+
+def test_apply_reports_unreadable_settings(apply_file, setup_script, monkeypatch):
+    def conf():
+        raise ValueError('Malformed /etc/turtlebot4/system')
+    monkeypatch.setattr(setup_script, 'Conf', conf)
+
+    code, results = apply_file('bash:\n  ROS_DOMAIN_ID: 5\n')
+
+    assert code == 1
+    assert results == [{'result': 'error', 'changes': {}, 'errors': ['ValueError: Malformed /etc/turtlebot4/system'],
+                        'message': ''}]
@@ -0,0 +1,123 @@
+import io
+import json
+import os
+
+import pytest
+
+from turtlebot4_setup.logs import ESC, LogFollower, parse_journal_line
+
+
+def journal_line(message, unit='turtlebot4.service', priority=6, timestamp=1700000000000000):
+    return json.dumps({'MESSAGE': message, '_SYSTEMD_UNIT': unit, 'PRIORITY': str(priority),
+                       '__REALTIME_TIMESTAMP': str(timestamp)}) + '\n'
+
+
+class FakeJournal():
+    # Stands in for journalctl -f -o json
+
+    def __init__(self, lines) -> None:
+        self.lines = lines
+        self.closed = False
+
+    def __iter__(self):
+        return iter(self.lines)
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def follower():
+    journal = FakeJournal([
+        journal_line('Starting robot'),
+        journal_line('Battery low', priority=4),
+        'not json\n',
+        journal_line('Create 3 not found', priority=3),
+        journal_line('Discovery server started', unit='discovery.service'),
+    ])
+    follower = LogFollower(source=journal, max_lines=10)
+    follower.follow()
+    return follower
+
+
+def messages(lines):
+    return [line.message for line in lines]
+
+
+def test_parses_journal_json():
+    line = parse_journal_line(journal_line('hello', priority=3))
+    assert line.message == 'hello'
+    assert line.unit == 'turtlebot4.service'
+    assert line.priority == 3
+    assert line.time == 1700000000.0
+
+
+def test_parses_messages_that_are_not_utf8():
+    line = parse_journal_line(json.dumps({'MESSAGE': [104, 105, 255]}))
+    assert line.message == 'hi�'
+
+
+def test_skips_lines_that_are_not_json(follower):
+    assert len(follower.lines) == 4
+
+
+def test_filters_by_priority(follower):
+    follower.handle_key('4', None, None)
+    assert messages(follower.visible(10)) == ['Battery low', 'Create 3 not found']
+
+
+def test_filters_by_pattern(follower):
+    follower.set_pattern('Create|Discovery')
+    assert messages(follower.visible(10)) == ['Create 3 not found', 'Discovery server started']
+    follower.handle_key('c', None, None)
+    assert len(follower.visible(10)) == 4
+
+
+def test_keeps_the_most_recent_lines():
+    follower = LogFollower(source=FakeJournal([journal_line(str(i)) for i in range(20)]), max_lines=5)
+    follower.follow()
+    assert messages(follower.visible(3)) == ['17', '18', '19']
+
+
+def test_renders_visible_lines(follower):
+    stream = io.StringIO()
+    follower.render(stream)
+    assert 'Starting robot' in stream.getvalue()
+    assert '\033[31m' in stream.getvalue()
+
+
+def test_quits_on_q_or_escape(follower):
+    assert not follower.handle_key('q', None, None)
+    assert not follower.handle_key(ESC, None, None)
+
+
+def test_arrow_keys_do_not_quit(follower):
+    for key in [ESC + '[A', ESC + '[B', ESC + 'OA']:
+        assert follower.handle_key(key, None, None)
+
+
+@pytest.mark.parametrize('sent', [ESC, ESC + '[A', ESC + 'OB', 'q'])
+def test_reads_whole_escape_sequences(sent):
+    read_fd, write_fd = os.pipe()
+    try:
+        os.write(write_fd, sent.encode())
+        assert LogFollower.read_key(read_fd) == sent
+    finally:
+        os.close(read_fd)
+        os.close(write_fd)
+
+
+def test_reads_one_key_at_a_time():
+    read_fd, write_fd = os.pipe()
+    try:
+        os.write(write_fd, b'4q')
+        assert LogFollower.read_key(read_fd) == '4'
+        assert LogFollower.read_key(read_fd) == 'q'
+    finally:
+        os.close(read_fd)
+        os.close(write_fd)
+
+
+def test_stop_closes_the_source(follower):
+    follower.stop()
+    assert follower.source.closed
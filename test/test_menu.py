@@ -0,0 +1,121 @@
+import types
+
+import pytest
+
+pytest.importorskip('simple_term_menu_vendor')
+
+from turtlebot4_setup import menu  # noqa: E402
+from turtlebot4_setup.menu import CLEAR, Menu, MenuEntry  # noqa: E402
+
+
+class FakeTerminalMenu():
+    # Has the TerminalMenu attributes that an in-place update swaps, and returns the
+    # selections it is given instead of reading the terminal
+    selections = []
+    created = []
+
+    def __init__(self, menu_entries, title, cursor_index=0, **kwargs) -> None:
+        self._menu_entries = list(menu_entries)
+        self._title_lines = tuple(title.split('\n'))
+        self._view = types.SimpleNamespace(_menu_entries=list(menu_entries), active_menu_index=cursor_index)
+        self.painted = []
+        FakeTerminalMenu.created.append(self)
+
+    def show(self):
+        self.painted.append(list(self._view._menu_entries))
+        return FakeTerminalMenu.selections.pop(0)
+
+
+@pytest.fixture
+def term_menu(monkeypatch):
+    FakeTerminalMenu.selections = []
+    FakeTerminalMenu.created = []
+    monkeypatch.setattr(menu, 'TerminalMenu', FakeTerminalMenu)
+    monkeypatch.setattr(menu.simple_term_menu, '__version_info__', menu.IN_PLACE_UPDATE_VERSION + (0,))
+    monkeypatch.setattr(menu.shutil, 'get_terminal_size', lambda: types.SimpleNamespace(columns=80, lines=40))
+    return FakeTerminalMenu
+
+
+def counter_menu():
+    # Selecting the first entry counts up, and the count is shown in its label
+    count = [0]
+
+    def increment():
+        count[0] += 1
+    return Menu('Counter', [MenuEntry(lambda: 'Count [{0}]'.format(count[0]), increment),
+                            MenuEntry('Other', lambda: None)])
+
+
+def test_updates_in_place_without_clearing_the_screen(term_menu, capsys):
+    term_menu.selections = [0, 0, None]
+
+    counter_menu().show()
+
+    assert len(term_menu.created) == 1
+    assert term_menu.created[0].painted == [['Count [0]', 'Other'], ['Count [1]', 'Other'], ['Count [2]', 'Other']]
+    # The screen is cleared for the first paint and on exit, and only below the menu in between
+    out = capsys.readouterr().out
+    assert out.count(CLEAR) == 2
+    assert out.count(menu.CLEAR_BELOW.format(5)) == 2
+
+
+def test_rebuilds_when_it_cannot_update_in_place(term_menu, capsys, monkeypatch):
+    monkeypatch.setattr(Menu, 'can_update_in_place', lambda self, menu_entries, title_lines: False)
+    term_menu.selections = [0, 0, None]
+
+    counter_menu().show()
+
+    assert [m.painted for m in term_menu.created] == [[['Count [0]', 'Other']], [['Count [1]', 'Other']],
+                                                      [['Count [2]', 'Other']]]
+    assert [m._view.active_menu_index for m in term_menu.created] == [0, 0, 0]
+    # Each rebuilt menu is painted on a cleared screen
+    assert capsys.readouterr().out == 4 * CLEAR
+
+
+def test_menus_that_fill_the_terminal_are_cleared(term_menu, capsys, monkeypatch):
+    monkeypatch.setattr(menu.shutil, 'get_terminal_size', lambda: types.SimpleNamespace(columns=80, lines=5))
+    term_menu.selections = [0, None]
+
+    counter_menu().show()
+
+    assert len(term_menu.created) == 1
+    assert capsys.readouterr().out.count(CLEAR) == 3
+
+
+@pytest.mark.parametrize('version', [(1, 5, 3), (1, 7, 0), ()])
+def test_other_releases_rebuild(term_menu, monkeypatch, version):
+    m = counter_menu()
+    m.refresh_term_menu()
+    monkeypatch.setattr(menu.simple_term_menu, '__version_info__', version)
+
+    assert not m.can_update_in_place(['Count [1]', 'Other'], term_menu.created[0]._title_lines)
+    assert m.refresh_term_menu()
+    assert len(term_menu.created) == 2
+
+
+@pytest.mark.parametrize('entries', [
+    ['Count [1]'],
+    ['Count [1]', 'Other', 'More'],
+    ['Count [1]', ''],
+    ['Count [1]', 'Other|preview'],
+    ['[o] Count [1]', 'Other'],
+])
+def test_layout_changes_rebuild(term_menu, entries):
+    m = counter_menu()
+    m.refresh_term_menu()
+
+    assert not m.can_update_in_place(entries, term_menu.created[0]._title_lines)
+
+
+def test_the_outermost_menu_clears_on_exit(term_menu, capsys):
+    inner = counter_menu()
+    outer = Menu('Outer', [MenuEntry('Inner', inner.show)])
+    term_menu.selections = [0, None, None]
+
+    outer.show()
+
+    # Outer first paint, inner first paint and the outer menu's exit
+    out = capsys.readouterr().out
+    assert out.count(CLEAR) == 3
+    # Whatever the inner menu left below the outer one is erased
+    assert out.endswith(menu.CLEAR_BELOW.format(4) + CLEAR)
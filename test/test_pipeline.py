@@ -0,0 +1,157 @@
+import io
+import threading
+import time
+
+import pytest
+
+from turtlebot4_setup.conf import SysctlOptions, SystemOptions, TimeSyncOptions
+from turtlebot4_setup.pipeline import DONE, FAILED, SKIPPED, Pipeline, TaskError
+
+
+def pipeline():
+    return Pipeline(stream=io.StringIO(), refresh_interval=0.05)
+
+
+def fail(message):
+    def function():
+        raise TaskError(message)
+    return function
+
+
+class Concurrency():
+    # Counts how many of the tasks it wraps are running at once
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.running = 0
+        self.most = 0
+
+    def task(self, seconds=0.1):
+        def function():
+            with self.lock:
+                self.running += 1
+                self.most = max(self.most, self.running)
+            time.sleep(seconds)
+            with self.lock:
+                self.running -= 1
+        return function
+
+
+def test_runs_tasks_after_their_dependencies():
+    order = []
+    p = pipeline()
+    p.add('a', lambda: order.append('a') or 1)
+    p.add('b', lambda: order.append('b') or p.result('a') + 1, after=['a'])
+    p.add('c', lambda: order.append('c'), after=['b'])
+
+    assert p.run()
+    assert order == ['a', 'b', 'c']
+    assert p.result('b') == 2
+    assert all(t.status == DONE for t in p.tasks.values())
+
+
+def test_skips_dependents_of_a_failed_task():
+    ran = []
+    p = pipeline()
+    p.add('a', fail('Could not apply\n\ndetails'))
+    p.add('b', lambda: ran.append('b'), after=['a'])
+    p.add('c', lambda: ran.append('c'), after=['b'])
+    p.add('independent', lambda: ran.append('independent'))
+
+    assert not p.run()
+    assert ran == ['independent']
+    assert [t.name for t in p.failed] == ['a']
+    assert [t.name for t in p.skipped] == ['b', 'c']
+    assert p.tasks['a'].error == 'Could not apply\n\ndetails'
+    assert p.tasks['independent'].status == DONE
+
+    output = p.stream.getvalue()
+    assert '[ failed  ] a' in output and ': Could not apply\n' in output
+    assert '[ skipped ] c' in output
+
+
+def test_reports_unexpected_exceptions():
+    p = pipeline()
+    p.add('a', lambda: {}['missing'])
+
+    assert not p.run()
+    assert p.tasks['a'].status == FAILED
+    assert p.tasks['a'].error == "KeyError: 'missing'"
+
+
+def test_rejects_unknown_dependencies():
+    with pytest.raises(ValueError):
+        pipeline().add('a', lambda: None, after=['b'])
+
+
+def test_runs_independent_tasks_concurrently():
+    # Each task waits for the other, so they only finish if they run at the same time
+    barrier = threading.Barrier(2, timeout=5.0)
+    p = pipeline()
+    p.add('a', barrier.wait)
+    p.add('b', barrier.wait)
+
+    assert p.run()
+    assert not barrier.broken
+
+
+def test_tasks_with_the_same_lock_take_turns():
+    locked, unlocked = Concurrency(), Concurrency()
+    p = pipeline()
+    for name in ['a', 'b', 'c']:
+        p.add(name, locked.task(), lock='sudo')
+    p.add('d', unlocked.task(0.3))
+
+    start = time.monotonic()
+    assert p.run()
+
+    assert locked.most == 1
+    # The task without the lock ran alongside them
+    assert time.monotonic() - start < 0.55
+
+
+@pytest.fixture
+def apply_tasks(setup, monkeypatch):
+    # Replaces each apply step, and records how many steps that run sudo overlap
+    sudo = Concurrency()
+    calls = []
+
+    def step(name, function=None):
+        def run():
+            calls.append(name)
+            if function is not None:
+                return function()
+        return run
+    monkeypatch.setattr(setup, 'apply_sysctl_settings', step('sysctl', sudo.task()))
+    monkeypatch.setattr(setup, 'restart_chrony', step('chrony', sudo.task()))
+    monkeypatch.setattr(setup, 'update_create3', step('create3'))
+    monkeypatch.setattr(setup.ros.robot_upstart_menu, 'install', step('install', sudo.task()))
+    monkeypatch.setattr(setup.ros.robot_upstart_menu, 'restart', step('restart', sudo.task()))
+
+    setup.conf.set(SystemOptions.MODEL, 'standard' if setup.conf.get(SystemOptions.MODEL) == 'lite' else 'lite')
+    setup.conf.set(SysctlOptions.RMEM_MAX, 8388608)
+    setup.conf.set(TimeSyncOptions.PRESET, 'offline')
+    return setup, sudo, calls
+
+
+def test_apply_runs_sudo_steps_one_at_a_time(apply_tasks):
+    setup, sudo, calls = apply_tasks
+
+    error, msg = setup.apply_ros_settings()
+
+    assert error == 0, msg
+    assert sorted(calls) == ['chrony', 'create3', 'install', 'restart', 'sysctl']
+    assert calls[-1] == 'restart'
+    assert sudo.most == 1
+
+
+def test_apply_failure_skips_the_restart(apply_tasks, monkeypatch):
+    setup, _, calls = apply_tasks
+    monkeypatch.setattr(setup.ros.robot_upstart_menu, 'install', fail('robot_upstart failed'))
+
+    error, msg = setup.apply_ros_settings()
+
+    assert error == 1
+    assert 'robot_upstart failed' in msg
+    assert 'Skipped: Restart turtlebot4.service' in msg
+    assert 'restart' not in calls
@@ -0,0 +1,79 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from turtlebot4_setup import profiling
+
+
+@pytest.fixture
+def tracer(monkeypatch, tmp_path):
+    # Enabling the tracer patches subprocess for the rest of the process, so the patches are undone
+    for name in ['__init__', 'wait', 'poll']:
+        monkeypatch.setattr(subprocess.Popen, name, getattr(subprocess.Popen, name))
+    monkeypatch.setattr(os, 'system', os.system)
+    monkeypatch.setattr(profiling, 'tracer', None)
+    return profiling.enable(str(tmp_path / 'trace.json'))
+
+
+def commands(tracer):
+    return {e['name']: e for e in tracer.spans() if e['cat'] == 'subprocess'}
+
+
+def test_traces_every_way_of_running_a_command(tracer):
+    subprocess.run(['true'])
+    subprocess.call(['sh', '-c', 'exit 3'])
+    subprocess.check_call(['true', 'check_call'])
+    assert subprocess.check_output(['echo', 'check_output']) == b'check_output\n'
+    os.system('true system')
+
+    spans = commands(tracer)
+    assert sorted(spans) == ['echo check_output', "sh -c 'exit 3'", 'true', 'true check_call', 'true system']
+    assert spans["sh -c 'exit 3'"]['args'] == {'returncode': '3'}
+    assert spans['true system']['args'] == {'status': '0'}
+
+
+def test_times_a_process_until_it_exits(tracer):
+    process = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(0.2)'])
+    while process.poll() is None:
+        pass
+    process.wait()
+
+    spans = tracer.spans()
+    assert len(spans) == 1
+    assert spans[0]['dur'] >= 0.2e6
+    assert spans[0]['args'] == {'returncode': '0'}
+
+
+def test_traces_processes_waited_for_on_another_thread(tracer):
+    # Like the journal reader, which is started by the log view and stopped from the menu
+    process = subprocess.Popen(['sleep', '10'])
+    thread = threading.Thread(target=lambda: (process.terminate(), process.wait()))
+    thread.start()
+    thread.join()
+
+    spans = commands(tracer)
+    assert spans['sleep 10']['args'] == {'returncode': '-15'}
+    # The span is drawn on the thread that started the process
+    assert spans['sleep 10']['tid'] == threading.get_ident()
+
+
+def test_traces_commands_that_fail_to_start(tracer):
+    with pytest.raises(FileNotFoundError):
+        subprocess.run(['turtlebot4-missing-command'])
+
+    assert 'FileNotFoundError' in commands(tracer)['turtlebot4-missing-command']['args']['error']
+
+
+def test_writes_a_chrome_trace(tracer):
+    with profiling.span('apply'):
+        subprocess.run(['true'])
+    tracer.write()
+
+    with open(tracer.path) as f:
+        events = json.load(f)['traceEvents']
+    assert sorted(e['name'] for e in events if e['ph'] == 'X') == ['apply', 'true']
+    assert [row[:2] for row in tracer.summary()] == [('setup', 'apply'), ('subprocess', 'true')]
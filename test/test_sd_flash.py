@@ -0,0 +1,138 @@
+import os
+import time
+
+import pytest
+
+from turtlebot4_setup import sd_flash
+from turtlebot4_setup.sd_flash import FlashError, Flasher, Target
+
+BLOCK_SIZE = 64 << 10
+
+
+@pytest.fixture
+def image(tmp_path):
+    # A data block, two zero blocks and a short data block at the end
+    data = os.urandom(BLOCK_SIZE) + bytes(2 * BLOCK_SIZE) + os.urandom(BLOCK_SIZE // 2)
+    path = tmp_path / 'image.img'
+    path.write_bytes(data)
+    return path, data
+
+
+def flash(image_path, targets, **kwargs):
+    flasher = Flasher(str(image_path), [str(t) for t in targets], block_size=BLOCK_SIZE, pool_size=4)
+    return flasher, flasher.flash(**kwargs)
+
+
+def test_flashes_every_target(tmp_path, image):
+    image_path, data = image
+    targets = [tmp_path / 'card{0}.img'.format(i) for i in range(3)]
+    # An old, larger image on a card is replaced, not overlaid
+    targets[0].write_bytes(b'\xff' * (len(data) * 2))
+
+    flasher, ok = flash(image_path, targets)
+
+    assert ok
+    for target in targets:
+        assert target.read_bytes() == data
+    results = flasher.results()
+    assert [r['result'] for r in results] == ['success'] * 3
+    assert all(r['verified'] for r in results)
+
+
+def test_skips_zero_blocks(tmp_path, image, monkeypatch):
+    image_path, data = image
+    written = []
+    pwrite = os.pwrite
+
+    def record(fd, view, offset):
+        written.append(offset)
+        return pwrite(fd, view, offset)
+    monkeypatch.setattr(os, 'pwrite', record)
+
+    target = tmp_path / 'card.img'
+    _, ok = flash(image_path, [target])
+
+    assert ok
+    assert sorted(set(written)) == [0, 3 * BLOCK_SIZE]
+    assert target.read_bytes() == data
+
+
+def test_verify_mismatch_fails_only_that_target(tmp_path, image, monkeypatch):
+    image_path, _ = image
+    good, bad = tmp_path / 'good.img', tmp_path / 'bad.img'
+    finish = Target.finish
+
+    def corrupt(self, size):
+        finish(self, size)
+        if self.path == str(bad):
+            with open(self.path, 'r+b') as f:
+                f.write(b'\x00')
+    monkeypatch.setattr(Target, 'finish', corrupt)
+
+    flasher, ok = flash(image_path, [good, bad])
+
+    assert not ok
+    results = {r['device']: r for r in flasher.results()}
+    assert results[str(good)]['result'] == 'success'
+    assert results[str(bad)]['result'] == 'error'
+    assert results[str(bad)]['verified'] is False
+    assert 'Verification failed' in results[str(bad)]['message']
+
+
+def test_no_verify_skips_read_back(tmp_path, image):
+    image_path, _ = image
+    flasher, ok = flash(image_path, [tmp_path / 'card.img'], verify=False)
+    assert ok
+    assert flasher.results()[0]['verified'] is None
+
+
+def test_flags_slow_target(tmp_path, image, monkeypatch):
+    image_path, _ = image
+    targets = [tmp_path / 'card{0}.img'.format(i) for i in range(3)]
+    write = Target.write
+
+    def slow_write(self, block):
+        if self.path == str(targets[1]):
+            time.sleep(0.1)
+        write(self, block)
+    monkeypatch.setattr(Target, 'write', slow_write)
+
+    flasher, ok = flash(image_path, targets, verify=False)
+
+    assert ok
+    assert [r['slow'] for r in flasher.results()] == [False, True, False]
+
+
+def test_rejects_missing_device(tmp_path, image):
+    image_path, data = image
+    missing = sd_flash.device_path('sdz-turtlebot4-test')
+    good = tmp_path / 'card.img'
+
+    flasher, ok = flash(image_path, [missing, good])
+
+    assert not ok
+    assert not os.path.exists(missing)
+    results = flasher.results()
+    assert results[0]['result'] == 'error'
+    assert 'does not exist' in results[0]['message']
+    assert good.read_bytes() == data
+
+
+def test_rejects_devices_that_are_not_block_devices():
+    with pytest.raises(FlashError, match='not a block device'):
+        Target('/dev/null').open()
+
+
+@pytest.mark.parametrize('device, path, matches', [
+    ('/dev/sda', '/dev/sda', True),
+    ('/dev/sda1', '/dev/sda', True),
+    ('/dev/sda12', '/dev/sda', True),
+    ('/dev/sdaa', '/dev/sda', False),
+    ('/dev/sdaa1', '/dev/sda', False),
+    ('/dev/mmcblk0p1', '/dev/mmcblk0', True),
+    ('/dev/mmcblk01', '/dev/mmcblk0', False),
+    ('/dev/mmcblk0p1', '/dev/mmcblk0p1', True),
+    ('/dev/mmcblk0p10', '/dev/mmcblk0p1', False),
+])
+def test_unmounts_only_the_device_and_its_partitions(device, path, matches):
+    assert sd_flash.is_device_or_partition(device, path) == matches
@@ -0,0 +1,109 @@
+import os
+
+import pytest
+
+from turtlebot4_setup import timesync
+
+# Captured from `chronyc -c -n` on a robot
+TRACKING = ('A29FC87B,162.159.200.123,4,1700000000.250000000,-0.000012345,0.000001234,0.000045678,'
+            '-7.123,0.001,0.045,0.012345678,0.000456789,64.4,Normal\n')
+TRACKING_UNSYNCED = '7F7F0101,,10,0.000000000,0.000000000,0.000000000,0.000000000,0.000,0.000,0.000,0.000000000,0.000000000,0.0,Not synchronised\n'
+SOURCES = ('^,*,162.159.200.123,3,6,377,26,-0.000184236,-0.000195014,0.014823174\n'
+           '^,+,91.189.91.157,2,6,377,27,0.000312001,0.000301245,0.031005001\n'
+           '^,?,10.0.0.1,0,6,0,4294967295,0.000000000,0.000000000,0.000000000\n')
+CLIENTS = ('192.168.186.2,58,0,6,-,22,0,0,-,-\n'
+           '127.0.0.1,0,0,-,-,-,3,0,-,12\n')
+
+LEGACY_CREATE3_NTP_CONFIG = 'server 192.168.186.3 prefer iburst minpoll 4 maxpoll 6  # Use RPi4 server'
+
+
+def test_parses_tracking():
+    tracking = timesync.parse_tracking(TRACKING)
+    assert tracking.ref_name == '162.159.200.123'
+    assert tracking.stratum == 4
+    assert tracking.ref_time == 1700000000.25
+    assert tracking.system_offset == pytest.approx(-0.000012345)
+    assert tracking.rms_offset == pytest.approx(0.000045678)
+    assert tracking.update_interval == pytest.approx(64.4)
+    assert tracking.leap_status == 'Normal'
+
+
+def test_parses_empty_tracking():
+    assert timesync.parse_tracking('') is None
+    assert timesync.parse_tracking('506 Cannot talk to daemon\n') is None
+
+
+def test_parses_sources():
+    sources = timesync.parse_sources(SOURCES)
+    assert [s.name for s in sources] == ['162.159.200.123', '91.189.91.157', '10.0.0.1']
+    assert [s.state for s in sources] == ['*', '+', '?']
+    assert sources[0].reach == 0o377
+    assert sources[0].last_rx == 26
+    assert sources[0].offset == pytest.approx(-0.000184236)
+    assert sources[2].reach == 0
+
+
+def test_parses_clients():
+    clients = timesync.parse_clients(CLIENTS)
+    assert clients[0] == timesync.Client('192.168.186.2', 58, 0, 6, 22)
+    # Clients that only used the command port have no NTP interval or last request
+    assert clients[1].ntp_interval is None
+    assert clients[1].ntp_last is None
+
+
+def test_status_report():
+    report = timesync.status_report(TRACKING, SOURCES, CLIENTS, create3_offset=(0.0021, 0.0004),
+                                    now=1700000100.25)
+    assert 'offset -12.3 us, jitter 45.7 us, stratum 4, last sync 100 s ago' in report
+    assert '162.159.200.123' in report and 'synced' in report
+    assert 'Create 3: last synced 22 s ago, 58 requests' in report
+    assert 'offset +2.10 ms from the RPi4' in report
+
+
+def test_status_report_without_chrony():
+    report = timesync.status_report('', '', '')
+    assert 'chrony is not running' in report
+    assert 'Create 3: has not synced with the RPi4' in report
+
+
+def test_status_report_never_synced():
+    assert 'last sync never' in timesync.status_report(TRACKING_UNSYNCED, '', '')
+
+
+@pytest.mark.parametrize('preset', list(timesync.TIMESYNC_PRESETS))
+def test_chrony_conf_round_trip(preset):
+    for servers in [None, '192.168.0.10,base.local']:
+        text = timesync.chrony_conf(preset, servers)
+        assert timesync.parse_chrony_conf(text) == {timesync.PRESET: preset, timesync.SERVERS: servers}
+        assert 'allow 192.168.186.0/24' in text
+
+
+def test_offline_preset_has_no_pools():
+    assert 'pool ' not in timesync.chrony_conf('offline')
+    assert 'pool ntp.ubuntu.com' in timesync.chrony_conf('default')
+
+
+def test_stock_chrony_conf_reads_as_default():
+    with open(os.path.join(os.path.dirname(__file__), '..', 'etc', 'turtlebot4', 'chrony.conf')) as f:
+        assert timesync.parse_chrony_conf(f.read()) == {timesync.PRESET: 'default', timesync.SERVERS: None}
+
+
+def test_default_create3_ntp_config_is_unchanged():
+    assert timesync.create3_ntp_config('default') == LEGACY_CREATE3_NTP_CONFIG
+
+
+def test_conf_writes_the_package_and_chrony_copies(root):
+    from turtlebot4_setup.conf import Conf, TimeSyncOptions
+
+    (root / 'etc' / 'chrony').mkdir()
+
+    conf = Conf(str(root))
+    assert conf.get(TimeSyncOptions.PRESET) == 'default'
+    conf.set(TimeSyncOptions.PRESET, 'offline')
+    conf.set(TimeSyncOptions.SERVERS, '192.168.0.10')
+    conf.write()
+
+    package_copy = (root / 'etc' / 'turtlebot4' / 'chrony.conf').read_text()
+    assert package_copy == (root / 'etc' / 'chrony' / 'chrony.conf').read_text()
+    assert Conf(str(root)).get(TimeSyncOptions.PRESET) == 'offline'
+    assert Conf(str(root)).get_create3_ntp_config() == timesync.create3_ntp_config('offline')
@@ -0,0 +1,227 @@
+import os
+
+import pytest
+
+from turtlebot4_setup.conf import BashOptions, Change, Conf, SystemOptions
+from turtlebot4_setup.transaction import TransactionError, WriteTransaction
+
+
+@pytest.fixture
+def fail_replace(monkeypatch):
+    # Fails the given rename of a staged file over its target, leaving the rollback's renames alone
+    real_replace = os.replace
+    renames = []
+
+    def fail_at(n):
+        def replace(src, dst):
+            if str(src).endswith('.tb4-new'):
+                renames.append(dst)
+                if len(renames) == n:
+                    raise OSError(28, 'No space left on device')
+            return real_replace(src, dst)
+        monkeypatch.setattr(os, 'replace', replace)
+        return renames
+    return fail_at
+
+
+def leftovers(directory):
+    return sorted(f for f in os.listdir(directory) if f.endswith(('.tb4-new', '.tb4-bak')))
+
+
+def test_commit_replaces_every_file(tmp_path):
+    (tmp_path / 'a').write_text('old a')
+    committed = []
+
+    with WriteTransaction() as txn:
+        assert txn.stage(str(tmp_path / 'a'), 'new a')
+        assert txn.stage(str(tmp_path / 'b'), 'new b', mode=0o600)
+        txn.on_commit(lambda: committed.append(True))
+
+    assert (tmp_path / 'a').read_text() == 'new a'
+    assert (tmp_path / 'b').read_text() == 'new b'
+    assert os.stat(tmp_path / 'b').st_mode & 0o777 == 0o600
+    assert committed == [True]
+    assert leftovers(tmp_path) == []
+
+
+def test_unchanged_files_are_not_staged(tmp_path):
+    (tmp_path / 'a').write_text('same')
+    txn = WriteTransaction()
+
+    assert not txn.stage(str(tmp_path / 'a'), 'same')
+    assert txn.staged == {}
+    assert txn.staging_dir is None
+
+
+def test_failed_commit_rolls_back_renamed_files(tmp_path, fail_replace):
+    for name in ['a', 'b', 'c']:
+        (tmp_path / name).write_text('old ' + name)
+    committed = []
+    renames = fail_replace(3)
+
+    txn = WriteTransaction()
+    for name in ['a', 'b', 'c', 'd']:
+        txn.stage(str(tmp_path / name), 'new ' + name)
+    staging_dir = txn.staging_dir
+    txn.on_commit(lambda: committed.append(True))
+    with pytest.raises(TransactionError, match='No space left on device'):
+        txn.commit()
+
+    # a and b had already been replaced when c failed
+    assert len(renames) == 3
+    for name in ['a', 'b', 'c']:
+        assert (tmp_path / name).read_text() == 'old ' + name
+    assert not (tmp_path / 'd').exists()
+    assert leftovers(tmp_path) == []
+    assert not os.path.exists(staging_dir)
+    assert committed == []
+
+
+def test_failed_commit_removes_created_files(tmp_path, fail_replace):
+    (tmp_path / 'b').write_text('old b')
+    fail_replace(2)
+
+    with pytest.raises(TransactionError):
+        with WriteTransaction() as txn:
+            txn.stage(str(tmp_path / 'a'), 'new a')
+            txn.stage(str(tmp_path / 'b'), 'new b')
+
+    assert sorted(os.listdir(tmp_path)) == ['b']
+    assert (tmp_path / 'b').read_text() == 'old b'
+
+
+def test_exceptions_abort_the_transaction(tmp_path):
+    (tmp_path / 'a').write_text('old a')
+
+    with pytest.raises(ValueError):
+        with WriteTransaction() as txn:
+            txn.stage(str(tmp_path / 'a'), 'new a')
+            staging_dir = txn.staging_dir
+            raise ValueError('Invalid setting')
+
+    assert (tmp_path / 'a').read_text() == 'old a'
+    assert not os.path.exists(staging_dir)
+
+
+def test_failed_write_rolls_back_every_group(root, fail_replace):
+    conf = Conf(str(root))
+    files = [conf.system_file, conf.hostname_file, conf.setup_bash_file]
+    before = {path: open(path).read() for path in files}
+    conf.set(SystemOptions.MODEL, 'lite')
+    conf.set(SystemOptions.HOSTNAME, 'turtlebot4-01')
+    conf.set(BashOptions.DOMAIN_ID, 7)
+    fail_replace(3)
+
+    with pytest.raises(TransactionError):
+        conf.write()
+
+    assert {path: open(path).read() for path in files} == before
+    assert leftovers(conf.setup_dir) == [] and leftovers(os.path.dirname(conf.hostname_file)) == []
+    # Nothing was written, so the settings still need writing
+    assert {SystemOptions, BashOptions} <= conf.dirty
+
+    conf.write()
+    assert Conf(str(root)).get(BashOptions.DOMAIN_ID) == '7'
+    assert conf.dirty == set()
+
+
+def test_journal_records_the_applied_values(root):
+    conf = Conf(str(root))
+    assert conf.journal == {}
+
+    conf.set(BashOptions.DOMAIN_ID, 7)
+    conf.set(BashOptions.DOMAIN_ID, 8)
+    conf.set(BashOptions.NAMESPACE, '/robot1')
+    conf.set(SystemOptions.MODEL, 'lite')
+
+    # Repeated changes keep the value that was first replaced
+    assert conf.journal[BashOptions.DOMAIN_ID] == Change(BashOptions, '0', 8)
+    assert conf.journal[BashOptions.NAMESPACE] == Change(BashOptions, None, '/robot1')
+    assert conf.changes(BashOptions) == [BashOptions.DOMAIN_ID, BashOptions.NAMESPACE]
+    assert conf.changes() == [BashOptions.DOMAIN_ID, BashOptions.NAMESPACE, SystemOptions.MODEL]
+
+    # Changing a setting back is not a change, even as a different type
+    conf.set(BashOptions.DOMAIN_ID, 0)
+    assert BashOptions.DOMAIN_ID not in conf.journal
+
+    conf.revert()
+    assert conf.journal == {}
+    assert Conf.equivalent(conf.get(BashOptions.DOMAIN_ID), '0')
+    assert conf.get(BashOptions.NAMESPACE) is None
+    assert conf.get(SystemOptions.MODEL) == 'standard'
+
+
+def test_revert_after_write_restores_the_files(root):
+    conf = Conf(str(root))
+    conf.set(BashOptions.NAMESPACE, '/robot1')
+    conf.write()
+    assert Conf(str(root)).get(BashOptions.NAMESPACE) == '/robot1'
+
+    conf.revert()
+    conf.write()
+    assert Conf(str(root)).get(BashOptions.NAMESPACE) is None
+
+
+def file_stats(root):
+    stats = {}
+    for directory, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(directory, name)
+            st = os.stat(path)
+            stats[path] = (st.st_ino, st.st_mtime_ns)
+    return stats
+
+
+def test_only_changed_groups_are_rewritten(root):
+    conf = Conf(str(root))
+    # Backdate every file so that a rewrite always shows up in its mtime
+    for path in file_stats(root):
+        os.utime(path, ns=(0, 0))
+    before = file_stats(root)
+
+    conf.set(BashOptions.DOMAIN_ID, 7)
+    conf.write()
+
+    after = file_stats(root)
+    assert sorted(path for path in after if after[path] != before.get(path)) == [conf.setup_bash_file]
+
+    # Nothing is rewritten once the files are up to date
+    conf.write()
+    assert file_stats(root) == after
+
+
+def test_cache_reparses_files_edited_outside_the_tool(root):
+    conf = Conf(str(root))
+    hits = conf.cache_stats['hits']
+    misses = conf.cache_stats['misses']
+
+    conf.read()
+    assert conf.cache_stats['misses'] == misses
+    assert conf.cache_stats['hits'] > hits
+
+    parsed = []
+    conf.cache_hook = lambda path, hit: parsed.append(path) if not hit else None
+    with open(conf.setup_bash_file) as f:
+        bash = f.read()
+    with open(conf.setup_bash_file, 'w') as f:
+        f.write(bash.replace('ROS_DOMAIN_ID=0', 'ROS_DOMAIN_ID=42'))
+
+    conf.read()
+    assert parsed == [conf.setup_bash_file]
+    assert conf.get(BashOptions.DOMAIN_ID) == '42'
+
+
+def test_cache_reparses_edits_that_keep_the_size_and_mtime(root):
+    # An editor that saves by renaming a new file over the old one changes the inode
+    conf = Conf(str(root))
+    st = os.stat(conf.setup_bash_file)
+    with open(conf.setup_bash_file) as f:
+        bash = f.read()
+    edited = conf.setup_bash_file + '.swp'
+    with open(edited, 'w') as f:
+        f.write(bash.replace('ROS_DOMAIN_ID=0', 'ROS_DOMAIN_ID=5'))
+    os.utime(edited, ns=(st.st_atime_ns, st.st_mtime_ns))
+    os.rename(edited, conf.setup_bash_file)
+
+    conf.read()
+    assert conf.get(BashOptions.DOMAIN_ID) == '5'
@@ -1,11 +1,14 @@
 import copy
 import os
 import yaml
-import subprocess
-import shlex
 
+from collections import namedtuple
+from collections.abc import Mapping
 from enum import Enum
 
+from turtlebot4_setup import dds_profiles, profiling, system_info, timesync
+from turtlebot4_setup.transaction import TransactionError, WriteTransaction
+
 
 class SystemOptions(str, Enum):
     MODEL = 'MODEL'
@@ -41,9 +44,145 @@ class DiscoveryOptions(str, Enum):
     ENABLED = 'ENABLED'
     PORT = 'PORT'
     SERVER_ID = 'SERVER_ID'
-    OFFBOARD_IP = 'OFFBOARD_IP'
-    OFFBOARD_PORT = 'OFFBOARD_PORT'
-    OFFBOARD_ID = 'OFFBOARD_ID'
+    OFFBOARD_SERVERS = 'OFFBOARD_SERVERS'
+
+
+class FastDDSOptions(str, Enum):
+    PRESET = dds_profiles.PRESET
+    SHARED_MEMORY = dds_profiles.SHARED_MEMORY
+    SOCKET_BUFFER_SIZE = dds_profiles.SOCKET_BUFFER_SIZE
+    MAX_MESSAGE_SIZE = dds_profiles.MAX_MESSAGE_SIZE
+    HISTORY_MEMORY_POLICY = dds_profiles.HISTORY_MEMORY_POLICY
+
+
+class CycloneDDSOptions(str, Enum):
+    INTERFACES = dds_profiles.INTERFACES
+    WIFI_MULTICAST = dds_profiles.WIFI_MULTICAST
+    PEERS = dds_profiles.PEERS
+    SOCKET_RECEIVE_BUFFER_SIZE = dds_profiles.SOCKET_RECEIVE_BUFFER_SIZE
+    FRAGMENT_SIZE = dds_profiles.FRAGMENT_SIZE
+
+
+# Derived from the RMW and DDS settings, never set directly
+class SysctlOptions(str, Enum):
+    RMEM_MAX = dds_profiles.RMEM_MAX
+    WMEM_MAX = dds_profiles.WMEM_MAX
+    IPFRAG_HIGH_THRESH = dds_profiles.IPFRAG_HIGH_THRESH
+    IPFRAG_TIME = dds_profiles.IPFRAG_TIME
+
+
+class TimeSyncOptions(str, Enum):
+    PRESET = timesync.PRESET
+    SERVERS = timesync.SERVERS
+
+
+MODELS = ['standard', 'lite']
+WIFI_MODES = ['Client', 'Access Point']
+WIFI_BANDS = ['5GHz', '2.4GHz', 'Any']
+RMW_IMPLEMENTATIONS = ['rmw_fastrtps_cpp', 'rmw_cyclonedds_cpp']
+FASTDDS_PRESETS = list(dds_profiles.FASTDDS_PRESETS)
+HISTORY_MEMORY_POLICIES = dds_profiles.HISTORY_MEMORY_POLICIES
+CYCLONEDDS_INTERFACES = dds_profiles.CYCLONEDDS_INTERFACES
+TIMESYNC_PRESETS = list(timesync.TIMESYNC_PRESETS)
+# Socket buffer sizes are ints in the kernel
+MAX_BUFFER_SIZE = 2 ** 31 - 1
+
+
+def clamp_domain_id(domain_id):
+    # ROS Domain ID (0-101) or (215-232)
+    domain_id = max(0, min(int(domain_id), 232))
+    if (domain_id > 101 and domain_id < 215):
+        domain_id = 101
+    return domain_id
+
+
+def clamp_port(port):
+    return max(10000, min(int(port), 65535))
+
+
+def clamp_server_id(server_id):
+    return max(0, min(int(server_id), 255))
+
+
+def clamp_buffer_size(size):
+    # 0 leaves the default
+    return max(0, min(int(size), MAX_BUFFER_SIZE))
+
+
+def format_namespace(ns):
+    # Add '/' if needed
+    if ns != None and ns[0] != '/':
+        ns = '/' + ns
+    return ns
+
+
+DiscoveryServer = namedtuple('DiscoveryServer', ['ip', 'port'])
+
+
+class DiscoveryServers(Mapping):
+    # Discovery servers indexed by server ID. Instances are immutable so they can be stored
+    # and journaled like any other setting. str() gives the ROS_DISCOVERY_SERVER format,
+    # in which a server's position in the list is its ID.
+
+    def __init__(self, servers=None) -> None:
+        self._servers = {}
+        for server_id, server in sorted((int(k), v) for k, v in dict(servers or {}).items()):
+            if server_id != clamp_server_id(server_id):
+                raise ValueError('Server ID {0} is not in 0-255'.format(server_id))
+            self._servers[server_id] = DiscoveryServer(str(server[0]), int(server[1]))
+
+    def __getitem__(self, server_id):
+        return self._servers[int(server_id)]
+
+    def __iter__(self):
+        return iter(self._servers)
+
+    def __len__(self):
+        return len(self._servers)
+
+    def __hash__(self):
+        return hash(tuple(self._servers.items()))
+
+    def __repr__(self):
+        return 'DiscoveryServers({0})'.format(self._servers)
+
+    def __str__(self):
+        entries = [''] * (max(self._servers) + 1 if self._servers else 0)
+        for server_id, server in self._servers.items():
+            entries[server_id] = '{0}:{1}'.format(server.ip, server.port)
+        return ''.join(e + ';' for e in entries)
+
+    def add(self, server_id, ip, port):
+        if int(server_id) in self._servers:
+            raise ValueError('Server ID {0} is already used'.format(server_id))
+        servers = dict(self._servers)
+        servers[int(server_id)] = (ip, port)
+        return DiscoveryServers(servers)
+
+    def remove(self, server_id):
+        servers = dict(self._servers)
+        servers.pop(int(server_id), None)
+        return DiscoveryServers(servers)
+
+    def free_id(self, used=()):
+        for server_id in range(256):
+            if server_id not in self._servers and server_id not in used:
+                return server_id
+        return None
+
+    @classmethod
+    def parse(cls, discovery_str, default_port=11811):
+        servers = {}
+        for server_id, entry in enumerate(discovery_str.strip().strip('\'"').split(';')):
+            entry = entry.strip().strip('\'"')
+            if entry:
+                ip, _, port = entry.partition(':')
+                servers[server_id] = (ip, int(port.strip('\'"')) if port else default_port)
+        return cls(servers)
+
+
+# A pending setting change, relative to the last applied settings
+Change = namedtuple('Change', ['group', 'old', 'new'])
 
 
 class Conf():
@@ -83,30 +222,68 @@ class Conf():
         DiscoveryOptions.ENABLED: False,
         DiscoveryOptions.PORT: '11811',
         DiscoveryOptions.SERVER_ID: '0',
-        DiscoveryOptions.OFFBOARD_IP: '',
-        DiscoveryOptions.OFFBOARD_PORT: '11811',
-        DiscoveryOptions.OFFBOARD_ID: '1',
+        DiscoveryOptions.OFFBOARD_SERVERS: DiscoveryServers(),
+    }
+
+    default_fastdds_conf = {FastDDSOptions(k): v for k, v in dds_profiles.preset_settings('default').items()}
+
+    default_cyclonedds_conf = {CycloneDDSOptions(k): v for k, v in dds_profiles.CYCLONEDDS_DEFAULTS.items()}
+
+    default_timesync_conf = {
+        TimeSyncOptions.PRESET: 'default',
+        TimeSyncOptions.SERVERS: None,
     }
 
-    def __init__(self) -> None:
+    def __init__(self, root='/') -> None:
+        # Files can be read and written under an alternate root, such as a mounted image.
+        # Paths stored in the settings themselves are always relative to the robot's root.
+        self.root = root
+        self.setup_dir = self.root_path(Conf.setup_dir)
+        self.netplan_dir = self.root_path(Conf.netplan_dir)
+
         self.system_file = os.path.join(self.setup_dir, 'system')
         self.setup_bash_file = os.path.join(self.setup_dir, 'setup.bash')
         self.netplan_wifis_file = os.path.join(self.netplan_dir, '50-wifis.yaml')
         self.discovery_sh_file = os.path.join(self.setup_dir, 'discovery.sh')
-        self.hostname_file = '/etc/hostname'
+        self.fastdds_rpi_file = os.path.join(self.setup_dir, 'fastdds_rpi.xml')
+        self.fastdds_create3_file = os.path.join(self.setup_dir, 'fastdds_discovery_create3.xml')
+        self.cyclonedds_rpi_file = os.path.join(self.setup_dir, 'cyclonedds_rpi.xml')
+        self.sysctl_file = self.root_path('/etc/sysctl.d/60-turtlebot4-dds.conf')
+        self.hostname_file = self.root_path('/etc/hostname')
+        # The package's copy holds the settings, and the postinst copies it over chrony's own
+        self.chrony_file = os.path.join(self.setup_dir, 'chrony.conf')
+        self.chrony_system_file = self.root_path('/etc/chrony/chrony.conf')
 
         self.system_conf = copy.deepcopy(self.default_system_conf)
         self.wifi_conf = copy.deepcopy(self.default_wifi_conf)
         self.bash_conf = copy.deepcopy(self.default_bash_conf)
         self.discovery_conf = copy.deepcopy(self.default_discovery_conf)
+        self.fastdds_conf = copy.deepcopy(self.default_fastdds_conf)
+        self.cyclonedds_conf = copy.deepcopy(self.default_cyclonedds_conf)
+        self.sysctl_conf = dict.fromkeys(SysctlOptions)
+        self.timesync_conf = copy.deepcopy(self.default_timesync_conf)
+
+        # Parsed file contents keyed by path, validated against (inode, mtime, size)
+        self.parse_cache = {}
+        self.cache_stats = {'hits': 0, 'misses': 0}
+        self.cache_hook = None
 
-        subprocess.run(shlex.split('mkdir -p /tmp' + self.setup_dir))
-        subprocess.run(shlex.split('mkdir -p /tmp' + self.netplan_dir))
+        # Changes since the settings were last applied, keyed by option
+        self.journal = {}
+        # Option groups that differ from the files on disk
+        self.dirty = set()
 
         self.read()
+        self.clear_journal()
+
+    def root_path(self, path):
+        return os.path.join(self.root, path.lstrip('/'))
 
     def get(self, conf):
-        if isinstance(conf, SystemOptions):
+        if conf is SystemOptions.IP:
+            # Interface addresses are only looked up when displayed
+            return system_info.robot_ip_str()
+        elif isinstance(conf, SystemOptions):
             return self.system_conf.get(conf)
         elif isinstance(conf, WifiOptions):
             return self.wifi_conf.get(conf)
@@ -114,55 +291,161 @@ class Conf():
             return self.bash_conf.get(conf)
         elif isinstance(conf, DiscoveryOptions):
             return self.discovery_conf.get(conf)
+        elif isinstance(conf, FastDDSOptions):
+            return self.fastdds_conf.get(conf)
+        elif isinstance(conf, CycloneDDSOptions):
+            return self.cyclonedds_conf.get(conf)
+        elif isinstance(conf, SysctlOptions):
+            return self.sysctl_conf.get(conf)
+        elif isinstance(conf, TimeSyncOptions):
+            return self.timesync_conf.get(conf)
         return None
 
     def set(self, conf, value):
         if isinstance(conf, SystemOptions):
-            self.system_conf[conf] = value
+            confs = self.system_conf
         elif isinstance(conf, WifiOptions):
-            self.wifi_conf[conf] = value
+            confs = self.wifi_conf
         elif isinstance(conf, BashOptions):
-            self.bash_conf[conf] = value
+            confs = self.bash_conf
         elif isinstance(conf, DiscoveryOptions):
-            self.discovery_conf[conf] = value
+            confs = self.discovery_conf
+        elif isinstance(conf, FastDDSOptions):
+            confs = self.fastdds_conf
+        elif isinstance(conf, CycloneDDSOptions):
+            confs = self.cyclonedds_conf
+        elif isinstance(conf, SysctlOptions):
+            confs = self.sysctl_conf
+        elif isinstance(conf, TimeSyncOptions):
+            confs = self.timesync_conf
+        else:
+            return
+
+        old = confs.get(conf)
+        confs[conf] = value
+        if self.equivalent(old, value):
+            return
+
+        self.dirty.add(type(conf))
+        change = self.journal.get(conf)
+        if change is not None:
+            old = change.old
+        if self.equivalent(old, value):
+            del self.journal[conf]
+        else:
+            self.journal[conf] = Change(type(conf), old, value)
+
+    @staticmethod
+    def equivalent(a, b):
+        # None and empty string are equivalent, and settings read from file are strings
+        if a is None or a == '':
+            return b is None or b == ''
+        return str(a) == str(b)
+
+    def changes(self, group=None):
+        return [option for option, change in self.journal.items()
+                if group is None or change.group is group]
+
+    def clear_journal(self):
+        self.journal.clear()
+
+    def revert(self):
+        # Restore the settings that were last applied
+        for option, change in list(self.journal.items()):
+            self.set(option, change.old)
 
     def apply_default(self, conf):
-        if conf == self.system_conf:
-            self.system_conf = copy.deepcopy(self.default_system_conf)
-        elif conf == self.wifi_conf:
-            self.wifi_conf = copy.deepcopy(self.default_wifi_conf)
-        elif conf == self.bash_conf:
-            self.bash_conf = copy.deepcopy(self.default_bash_conf)
-        elif conf == self.discovery_conf:
-            self.discovery_conf = copy.deepcopy(self.default_discovery_conf)
+        if conf is self.system_conf:
+            defaults = self.default_system_conf
+        elif conf is self.wifi_conf:
+            defaults = self.default_wifi_conf
+        elif conf is self.bash_conf:
+            defaults = self.default_bash_conf
+        elif conf is self.discovery_conf:
+            defaults = self.default_discovery_conf
+        elif conf is self.fastdds_conf:
+            defaults = self.default_fastdds_conf
+        elif conf is self.cyclonedds_conf:
+            defaults = self.default_cyclonedds_conf
+        elif conf is self.timesync_conf:
+            defaults = self.default_timesync_conf
+        else:
+            return
+
+        for k, v in defaults.items():
+            self.set(k, copy.deepcopy(v))
+
+    def read_cached(self, path, parser):
+        st = os.stat(path)
+        key = (st.st_ino, st.st_mtime_ns, st.st_size)
+        cached = self.parse_cache.get(path)
+        hit = cached is not None and cached[0] == key
+        if hit:
+            self.cache_stats['hits'] += 1
+        else:
+            self.cache_stats['misses'] += 1
+            cached = (key, parser(path))
+            self.parse_cache[path] = cached
+        if self.cache_hook is not None:
+            self.cache_hook(path, hit)
+        return cached[1]
 
     def read(self):
-        self.read_system()
-        self.read_wifi()
-        self.read_bash()
-        self.read_discovery()  # Must come after read_bash in order to have the discovery server envar
+        with profiling.span('Conf.read', 'file'):
+            self.read_system()
+            self.read_wifi()
+            self.read_bash()
+            self.read_discovery()  # Must come after read_bash in order to have the discovery server envar
+            self.read_fastdds()
+            self.read_cyclonedds()
+            self.read_sysctl()
+            self.read_timesync()
 
     def write(self):
-        self.write_system()
-        self.write_wifi()
-        self.write_discovery()
-        self.write_bash()
-
-    def read_system(self):
-        with open(self.system_file, 'r') as f:
+        # All files are committed together, or not at all. Only groups that changed are rewritten.
+        with profiling.span('Conf.write', 'file'), WriteTransaction() as txn:
+            if SystemOptions in self.dirty:
+                self.write_system(txn)
+            if WifiOptions in self.dirty:
+                self.write_wifi(txn)
+            if BashOptions in self.dirty or DiscoveryOptions in self.dirty:
+                self.write_discovery(txn)  # Also writes setup.bash
+            if FastDDSOptions in self.dirty:
+                self.write_fastdds(txn)
+            if CycloneDDSOptions in self.dirty:
+                self.write_cyclonedds(txn)
+            # Must come after write_discovery, which can change the RMW
+            self.update_sysctl()
+            if SysctlOptions in self.dirty:
+                self.write_sysctl(txn)
+            if TimeSyncOptions in self.dirty:
+                self.write_timesync(txn)
+
+    def parse_system(self, path):
+        system = {}
+        with open(path, 'r') as f:
             for line in f.readlines():
                 for k in [SystemOptions.MODEL, SystemOptions.VERSION, SystemOptions.ROS]:
                     if k in line:
-                        self.system_conf[k] = line.split(':')[1].strip()
+                        system[k] = line.split(':')[1].strip()
+        return system
 
-        self.system_conf[SystemOptions.IP] = subprocess.run(
-            shlex.split('hostname -I'),
-            capture_output=True).stdout.decode('ascii').replace('192.168.186.3', '').strip()
+    def parse_hostname(self, path):
+        with open(path, 'r') as f:
+            return f.readline().strip()
 
-        with open(self.hostname_file, 'r') as f:
-            self.set(SystemOptions.HOSTNAME, f.readline().strip())
+    def read_system(self):
+        for k, v in self.read_cached(self.system_file, self.parse_system).items():
+            self.set(k, v)
+
+        self.set(SystemOptions.HOSTNAME, self.read_cached(self.hostname_file, self.parse_hostname))
+        self.dirty.discard(SystemOptions)
+
+    def write_system(self, txn=None):
+        if txn is None:
+            with WriteTransaction() as txn:
+                return self.write_system(txn)
 
-    def write_system(self):
         system = []
         with open(self.system_file, 'r') as f:
             system = f.readlines()
@@ -170,54 +453,62 @@ class Conf():
                 is_conf = False
                 for k in [SystemOptions.MODEL, SystemOptions.VERSION, SystemOptions.ROS]:
                     if k in line:
-                        system[i] = '{0}:{1}\n'.format(k, self.system_conf[k])
+                        system[i] = '{0}:{1}\n'.format(k.value, self.system_conf[k])
                         is_conf = True
                         break
 
                 if not is_conf:
                     system[i] = line
 
-        with open('/tmp' + self.system_file, 'w') as f:
-            f.writelines(system)
-        subprocess.run(shlex.split('sudo mv /tmp' + self.system_file + ' ' + self.system_file))
+        txn.stage(self.system_file, ''.join(system))
+        txn.stage(self.hostname_file, self.get(SystemOptions.HOSTNAME) + '\n')
+        txn.on_commit(lambda: self.dirty.discard(SystemOptions))
 
-        with open('/tmp' + self.hostname_file, 'w') as f:
-            f.write(self.get(SystemOptions.HOSTNAME))
-        subprocess.run(shlex.split('sudo mv /tmp' + self.hostname_file + ' ' + self.hostname_file))
-
-    def read_wifi(self):
-        netplan = yaml.load(open(self.netplan_wifis_file, 'r'), yaml.SafeLoader)
+    def parse_wifi(self, path):
+        with open(path, 'r') as f:
+            netplan = yaml.load(f, yaml.SafeLoader)
+        wifi = {}
         # wlan0 Config
         wlan0 = netplan['network']['wifis']['wlan0']
 
         # Get SSID
-        self.set(WifiOptions.SSID, list(wlan0['access-points'])[0])
+        wifi[WifiOptions.SSID] = list(wlan0['access-points'])[0]
         # SSID settings
-        ssid_settings = wlan0['access-points'][self.get(WifiOptions.SSID)]
+        ssid_settings = wlan0['access-points'][wifi[WifiOptions.SSID]]
 
-        self.set(WifiOptions.PASSWORD, ssid_settings.get('password'))
+        wifi[WifiOptions.PASSWORD] = ssid_settings.get('password')
 
         if wlan0.get('addresses'):
-            self.set(WifiOptions.IP, wlan0['addresses'][0])
+            wifi[WifiOptions.IP] = wlan0['addresses'][0]
         else:
-            self.set(WifiOptions.IP, None)
+            wifi[WifiOptions.IP] = None
 
         if wlan0.get('dhcp4') is True:
-            self.set(WifiOptions.DHCP, True)
+            wifi[WifiOptions.DHCP] = True
         else:
-            self.set(WifiOptions.DHCP, False)
+            wifi[WifiOptions.DHCP] = False
 
         if ssid_settings.get('mode') == 'ap':
-            self.set(WifiOptions.WIFI_MODE, 'Access Point')
+            wifi[WifiOptions.WIFI_MODE] = 'Access Point'
         else:
-            self.set(WifiOptions.WIFI_MODE, 'Client')
+            wifi[WifiOptions.WIFI_MODE] = 'Client'
 
         if ssid_settings.get('band'):
-            self.set(WifiOptions.BAND, ssid_settings.get('band'))
+            wifi[WifiOptions.BAND] = ssid_settings.get('band')
         else:
-            self.set(WifiOptions.BAND, 'Any')
+            wifi[WifiOptions.BAND] = 'Any'
+        return wifi
+
+    def read_wifi(self):
+        for k, v in self.read_cached(self.netplan_wifis_file, self.parse_wifi).items():
+            self.set(k, v)
+        self.dirty.discard(WifiOptions)
+
+    def write_wifi(self, txn=None):
+        if txn is None:
+            with WriteTransaction() as txn:
+                return self.write_wifi(txn)
 
-    def write_wifi(self):
         ssid = self.get(WifiOptions.SSID)
         password = self.get(WifiOptions.PASSWORD)
         dhcp = self.get(WifiOptions.DHCP)
@@ -254,36 +545,45 @@ class Conf():
             }
         }
 
-        with open('/tmp' + self.netplan_wifis_file, 'w') as f:
-            f.write('# This file was automatically created by the turtlebot4-setup tool and should not be manually modified\n\n')
-
-        yaml.dump(netplan,
-                  stream=open('/tmp' + self.netplan_wifis_file, 'a'),
-                  Dumper=yaml.SafeDumper,
-                  indent=4,
-                  default_flow_style=False,
-                  default_style=None)
-
-        subprocess.run(shlex.split('sudo mv /tmp' + self.netplan_wifis_file + ' ' + self.netplan_wifis_file))
-
-    def read_bash(self):
-        with open(self.setup_bash_file, 'r') as f:
+        txn.stage(self.netplan_wifis_file,
+                  '# This file was automatically created by the turtlebot4-setup tool and should not be manually modified\n\n' +
+                  yaml.dump(netplan,
+                            Dumper=yaml.SafeDumper,
+                            indent=4,
+                            default_flow_style=False,
+                            default_style=None),
+                  mode=0o600)
+        txn.on_commit(lambda: self.dirty.discard(WifiOptions))
+
+    def parse_bash(self, path):
+        bash = {}
+        with open(path, 'r') as f:
             for line in f.readlines():
-                for k in self.bash_conf.keys():
-                    if f'export {k}' in line:
+                for k in BashOptions:
+                    if f'export {k.value}' in line:
                         try:
                             value = line.split('=')[1].strip().strip('\'"')
                             if (k == BashOptions.SUPER_CLIENT):
                                 value = value.split('||')[0].strip().strip('\'"')
                             if value == '':
-                                self.set(k, None)
+                                bash[k] = None
                             else:
-                                self.set(k, value)
+                                bash[k] = value
                         except IndexError:
-                            self.set(k, None)
+                            bash[k] = None
                         break
+        return bash
+
+    def read_bash(self):
+        for k, v in self.read_cached(self.setup_bash_file, self.parse_bash).items():
+            self.set(k, v)
+        self.dirty.discard(BashOptions)
+
+    def write_bash(self, txn=None):
+        if txn is None:
+            with WriteTransaction() as txn:
+                return self.write_bash(txn)
 
-    def write_bash(self):
         bash = []
         with open(self.setup_bash_file, 'r') as f:
             bash = f.readlines()
@@ -294,28 +594,30 @@ class Conf():
                 if v is None:
                     v = ''
                 for i, line in enumerate(bash):
-                    if f'export {k}' in line:
+                    if f'export {k.value}' in line:
                         if (k == BashOptions.SUPER_CLIENT and str(v) == 'True'):
                             # Ensure super client is only applied on user terminals
-                            bash[i] = f'[ -t 0 ] && export {k}={v} || export {k}=False\n'
+                            bash[i] = f'[ -t 0 ] && export {k.value}={v} || export {k.value}=False\n'
                         else:
                             # Quotations required around v to handle multiple servers in discovery server
-                            bash[i] = f'export {k}=\"{v}\"\n'
+                            bash[i] = f'export {k.value}=\"{v}\"\n'
                         found = True
 
                 # If the setting is missing from the setup.bash, add it to the beginning
                 if not found:
                     if (k == BashOptions.SUPER_CLIENT and str(v) == 'True'):
                         # Ensure super client is only applied on user terminals
-                        bash.insert(0,f'[ -t 0 ] && export {k}={v} || export {k}=False\n')
+                        bash.insert(0,f'[ -t 0 ] && export {k.value}={v} || export {k.value}=False\n')
                     else:
                         # Quotations required around v to handle multiple servers in discovery server
-                        bash.insert(0,f'export {k}=\"{v}\"\n')
+                        bash.insert(0,f'export {k.value}=\"{v}\"\n')
 
-        with open('/tmp' + self.setup_bash_file, 'w') as f:
-            f.writelines(bash)
-        subprocess.run(shlex.split('sudo mv /tmp' + self.setup_bash_file + ' ' + self.setup_bash_file))
+        txn.stage(self.setup_bash_file, ''.join(bash))
+        # Only export the new settings once they are on disk
+        txn.on_commit(self.update_environment)
+        txn.on_commit(lambda: self.dirty.discard(BashOptions))
 
+    def update_environment(self):
         for k, v in self.bash_conf.items():
             if v is None:
                 os.environ[k] = ''
@@ -329,70 +631,46 @@ class Conf():
         else:
             self.set(DiscoveryOptions.ENABLED, True)
             try:
-                servers = discovery_server.split(';')
-                for i, s in enumerate(servers):
-                    s = s.strip()
-                    if s:
-                        server = s.split(':')
-                        if (server[0].strip('"') == '127.0.0.1'):
-                            self.set(DiscoveryOptions.SERVER_ID, i)
-                            if len(server) > 1:
-                                self.set(DiscoveryOptions.PORT, int(server[1].strip('\'"')))
-                            else:
-                                self.set(DiscoveryOptions.PORT, 11811)
-                        else:
-                            self.set(DiscoveryOptions.OFFBOARD_ID, i)
-                            self.set(DiscoveryOptions.OFFBOARD_IP, server[0].strip('\'"'))
-                            if len(server) > 1:
-                                self.set(DiscoveryOptions.OFFBOARD_PORT, int(server[1].strip('\'"')))
-                            else:
-                                self.set(DiscoveryOptions.OFFBOARD_PORT, 11811)
-            except:
-                self.discovery_conf = self.default_discovery_conf
+                offboard = {}
+                for server_id, server in DiscoveryServers.parse(discovery_server).items():
+                    if server.ip == '127.0.0.1':
+                        self.set(DiscoveryOptions.SERVER_ID, server_id)
+                        self.set(DiscoveryOptions.PORT, server.port)
+                    else:
+                        offboard[server_id] = server
+                self.set(DiscoveryOptions.OFFBOARD_SERVERS, DiscoveryServers(offboard))
+            except ValueError:
+                self.apply_default(self.discovery_conf)
+        self.dirty.discard(DiscoveryOptions)
+
+    def write_discovery(self, txn=None):
+        if txn is None:
+            with WriteTransaction() as txn:
+                return self.write_discovery(txn)
 
-    def write_discovery(self):
         if self.get(DiscoveryOptions.ENABLED) is True:
             self.set(BashOptions.DISCOVERY_SERVER, self.get_discovery_str())
             self.set(BashOptions.RMW, 'rmw_fastrtps_cpp')
             self.set(BashOptions.SUPER_CLIENT, True)
 
-            with open('/tmp' + self.discovery_sh_file, 'w') as f:
-                f.write('#!/bin/bash\n')
-                f.write('# This file was automatically created by the turtlebot4-setup tool and should not be manually modified\n\n')
-                f.write(f'source {self.get(BashOptions.WORKSPACE)}\n')
-                f.write(f'fastdds discovery -i {self.get(DiscoveryOptions.SERVER_ID)} -p {self.get(DiscoveryOptions.PORT)}')
-            subprocess.run(shlex.split('sudo mv /tmp' + self.discovery_sh_file + ' ' + self.discovery_sh_file))
+            txn.stage(self.discovery_sh_file,
+                      '#!/bin/bash\n' +
+                      '# This file was automatically created by the turtlebot4-setup tool and should not be manually modified\n\n' +
+                      f'source {self.get(BashOptions.WORKSPACE)}\n' +
+                      f'fastdds discovery -i {self.get(DiscoveryOptions.SERVER_ID)} -p {self.get(DiscoveryOptions.PORT)}',
+                      mode=0o755)
         else:
             self.set(BashOptions.DISCOVERY_SERVER, None)
             self.set(BashOptions.SUPER_CLIENT, False)
 
-        self.write_bash()
+        self.write_bash(txn)
+        txn.on_commit(lambda: self.dirty.discard(DiscoveryOptions))
 
     def get_discovery_str(self) -> str:
-        discovery_str = ''
-        servers = [{
-            'id': self.get(DiscoveryOptions.SERVER_ID),
-            'ip': '127.0.0.1',
-            'port': self.get(DiscoveryOptions.PORT),
-            }]
-        offboard_ip = self.get(DiscoveryOptions.OFFBOARD_IP)
-        if offboard_ip:
-            servers.append({
-                'id': self.get(DiscoveryOptions.OFFBOARD_ID),
-                'ip': offboard_ip,
-                'port': self.get(DiscoveryOptions.OFFBOARD_PORT)
-                })
-
-        servers.sort(key=lambda s: int(s['id']))
-
-        i = 0
-        for s in servers:
-            while i < int(s['id']):
-                discovery_str += ';'
-                i += 1
-            discovery_str += f"{s['ip']}:{s['port']};"
-            i += 1
-        return discovery_str
+        # Raises ValueError instead of dropping an offboard server that uses the onboard server's ID
+        servers = self.get(DiscoveryOptions.OFFBOARD_SERVERS).add(
+            self.get(DiscoveryOptions.SERVER_ID), '127.0.0.1', self.get(DiscoveryOptions.PORT))
+        return str(servers)
     
     def get_create3_server_str(self) -> str:
         # Create3 should only point at the local server on the pi
@@ -401,3 +679,126 @@ class Conf():
             discovery_str += ';'
         discovery_str += f'192.168.186.3:{self.get(DiscoveryOptions.PORT)}'
         return discovery_str
+
+    def set_fastdds(self, option, value):
+        # Selecting a preset sets each of its settings, and the preset always reflects the
+        # current settings, becoming 'custom' once they no longer match a preset
+        if option is FastDDSOptions.PRESET:
+            if value in dds_profiles.FASTDDS_PRESETS:
+                for k, v in dds_profiles.FASTDDS_PRESETS[value].items():
+                    self.set(FastDDSOptions(k), v)
+        else:
+            self.set(option, value)
+        self.set(FastDDSOptions.PRESET, dds_profiles.matching_preset(self.fastdds_settings()))
+
+    def fastdds_settings(self):
+        return {k.value: v for k, v in self.fastdds_conf.items()}
+
+    def parse_fastdds(self, path):
+        with open(path, 'r') as f:
+            return dds_profiles.parse_fastdds_profile(f.read())
+
+    def read_fastdds(self):
+        # The profile is optional, FastDDS uses its defaults without it
+        if os.path.exists(self.fastdds_rpi_file):
+            for k, v in self.read_cached(self.fastdds_rpi_file, self.parse_fastdds).items():
+                self.set(FastDDSOptions(k), v)
+        self.dirty.discard(FastDDSOptions)
+
+    def write_fastdds(self, txn=None):
+        if txn is None:
+            with WriteTransaction() as txn:
+                return self.write_fastdds(txn)
+
+        settings = self.fastdds_settings()
+        profiles = {self.fastdds_rpi_file: dds_profiles.fastdds_rpi_profile(settings),
+                    self.fastdds_create3_file: dds_profiles.fastdds_create3_profile(settings)}
+        for path, profile in profiles.items():
+            # Never leave FastDDS with a profile it would fail to load
+            try:
+                dds_profiles.validate_fastdds_profile(profile)
+            except ValueError as e:
+                raise TransactionError('{0}: {1}'.format(os.path.basename(path), e))
+            txn.stage(path, profile)
+        txn.on_commit(lambda: self.dirty.discard(FastDDSOptions))
+
+    def parse_cyclonedds(self, path):
+        with open(path, 'r') as f:
+            return dds_profiles.parse_cyclonedds_profile(f.read())
+
+    def read_cyclonedds(self):
+        if os.path.exists(self.cyclonedds_rpi_file):
+            for k, v in self.read_cached(self.cyclonedds_rpi_file, self.parse_cyclonedds).items():
+                self.set(CycloneDDSOptions(k), v)
+        self.dirty.discard(CycloneDDSOptions)
+
+    def write_cyclonedds(self, txn=None):
+        if txn is None:
+            with WriteTransaction() as txn:
+                return self.write_cyclonedds(txn)
+
+        settings = {k.value: v for k, v in self.cyclonedds_conf.items()}
+        try:
+            dds_profiles.validate_cyclonedds_settings(settings)
+        except ValueError as e:
+            raise TransactionError('{0}: {1}'.format(os.path.basename(self.cyclonedds_rpi_file), e))
+        txn.stage(self.cyclonedds_rpi_file, dds_profiles.cyclonedds_profile(settings))
+        txn.on_commit(lambda: self.dirty.discard(CycloneDDSOptions))
+
+    def update_sysctl(self):
+        # Keeps the kernel settings in step with the buffers the active RMW will request
+        settings = dds_profiles.kernel_settings(self.get(BashOptions.RMW),
+                                                self.fastdds_settings(),
+                                                {k.value: v for k, v in self.cyclonedds_conf.items()})
+        for k, v in settings.items():
+            self.set(SysctlOptions(k), v)
+
+    def parse_sysctl(self, path):
+        with open(path, 'r') as f:
+            return dds_profiles.parse_sysctl_conf(f.read())
+
+    def read_sysctl(self):
+        # Without the drop-in the kernel defaults apply
+        settings = dict.fromkeys(dds_profiles.KERNEL_DEFAULTS)
+        if os.path.exists(self.sysctl_file):
+            settings = self.read_cached(self.sysctl_file, self.parse_sysctl)
+        for k, v in settings.items():
+            self.set(SysctlOptions(k), v)
+        self.dirty.discard(SysctlOptions)
+
+    def write_sysctl(self, txn=None):
+        if txn is None:
+            with WriteTransaction() as txn:
+                return self.write_sysctl(txn)
+
+        settings = {k.value: v for k, v in self.sysctl_conf.items()}
+        if any(v is not None for v in settings.values()) or os.path.exists(self.sysctl_file):
+            txn.stage(self.sysctl_file, dds_profiles.sysctl_conf(settings))
+        txn.on_commit(lambda: self.dirty.discard(SysctlOptions))
+
+    def parse_chrony(self, path):
+        with open(path, 'r') as f:
+            return timesync.parse_chrony_conf(f.read())
+
+    def read_timesync(self):
+        settings = {k.value: v for k, v in self.default_timesync_conf.items()}
+        if os.path.exists(self.chrony_file):
+            settings = self.read_cached(self.chrony_file, self.parse_chrony)
+        for k, v in settings.items():
+            self.set(TimeSyncOptions(k), v)
+        self.dirty.discard(TimeSyncOptions)
+
+    def write_timesync(self, txn=None):
+        if txn is None:
+            with WriteTransaction() as txn:
+                return self.write_timesync(txn)
+
+        chrony_conf = timesync.chrony_conf(self.get(TimeSyncOptions.PRESET), self.get(TimeSyncOptions.SERVERS))
+        txn.stage(self.chrony_file, chrony_conf)
+        # chrony only reads its own copy
+        if os.path.isdir(os.path.dirname(self.chrony_system_file)):
+            txn.stage(self.chrony_system_file, chrony_conf)
+        txn.on_commit(lambda: self.dirty.discard(TimeSyncOptions))
+
+    def get_create3_ntp_config(self) -> str:
+        return timesync.create3_ntp_config(self.get(TimeSyncOptions.PRESET))
@@ -0,0 +1,242 @@
+import http.client
+import threading
+import time
+
+from collections import namedtuple
+from html.parser import HTMLParser
+from urllib.parse import quote_plus
+
+from turtlebot4_setup import profiling
+
+CREATE3_HOST = '192.168.186.2'
+CREATE3_PORT = 80
+
+# Create 3 web server forms: (page showing the current values, save endpoint)
+CREATE3_FORMS = {
+    'ros_config': ('/ros-config', '/ros-config-save-main'),
+    'rmw_profile': ('/rmw-profile-override', '/rmw-profile-override-save'),
+    'ntp_config': ('/beta-ntp-conf', '/beta-ntp-conf-save'),
+}
+
+# One entry per request, including every retry
+RequestRecord = namedtuple('RequestRecord', ['method', 'path', 'status', 'latency', 'attempts'])
+
+
+class Create3Error(Exception):
+    pass
+
+
+def encode_form(fields):
+    # Checkboxes are booleans. Checked boxes are sent as a bare key and unchecked ones are omitted.
+    return '&'.join(quote_plus(k) if v is True else '{0}={1}'.format(quote_plus(k), quote_plus(str(v)))
+                    for k, v in fields.items() if v is not False)
+
+
+def normalize(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).replace('\r\n', '\n').strip()
+
+
+class FormParser(HTMLParser):
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.values = {}
+        self.select = None
+        self.textarea = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        name = attrs.get('name')
+        if tag == 'input' and name:
+            if attrs.get('type') == 'checkbox':
+                self.values[name] = 'checked' in attrs
+            elif attrs.get('type') not in ['submit', 'button']:
+                self.values[name] = attrs.get('value') or ''
+        elif tag == 'select':
+            self.select = name
+        elif tag == 'option' and self.select and 'selected' in attrs:
+            self.values[self.select] = attrs.get('value', '')
+        elif tag == 'textarea' and name:
+            self.textarea = name
+            self.values[name] = ''
+
+    def handle_endtag(self, tag):
+        if tag == 'select':
+            self.select = None
+        elif tag == 'textarea':
+            self.textarea = None
+
+    def handle_data(self, data):
+        if self.textarea:
+            self.values[self.textarea] += data
+
+
+class Create3Client():
+
+    def __init__(self, host=CREATE3_HOST, port=CREATE3_PORT, timeout=10.0,
+                 retries=5, backoff=0.5, max_backoff=8.0) -> None:
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.connection = None
+        self.history = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def connect(self):
+        # The connection is kept alive and reused between requests
+        if self.connection is None:
+            self.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        if self.connection.sock is None:
+            self.connection.connect()
+
+    def request(self, method, path, body=None, headers=None, idempotent=True):
+        if not idempotent:
+            # Never send a request that must not be repeated on a connection that may be stale
+            self.close()
+
+        with profiling.span('{0} {1}'.format(method, path), 'http') as span_args:
+            attempt = 0
+            start = time.monotonic()
+            while True:
+                attempt += 1
+                span_args['attempts'] = attempt
+                sent = False
+                try:
+                    self.connect()
+                    sent = True
+                    self.connection.request(method, path, body=body, headers=headers or {})
+                    response = self.connection.getresponse()
+                    data = response.read()
+                except (OSError, http.client.HTTPException) as e:
+                    self.close()
+                    # Connection failures are expected while the Create 3 is booting
+                    if attempt > self.retries or (sent and not idempotent):
+                        self.history.append(RequestRecord(method, path, None, time.monotonic() - start, attempt))
+                        raise Create3Error('{0} {1} failed: {2}'.format(method, path, e)) from e
+                    self.wait(attempt)
+                    continue
+
+                if response.status >= 500 and attempt <= self.retries and idempotent:
+                    self.wait(attempt)
+                    continue
+
+                self.history.append(RequestRecord(method, path, response.status, time.monotonic() - start, attempt))
+                if response.status >= 400:
+                    raise Create3Error('{0} {1} returned {2} {3}'.format(method, path, response.status, response.reason))
+                return data
+
+    def wait(self, attempt):
+        time.sleep(min(self.backoff * 2 ** (attempt - 1), self.max_backoff))
+
+    def get(self, path):
+        return self.request('GET', path)
+
+    def post_form(self, path, fields, idempotent=True):
+        return self.request('POST', path,
+                            body=encode_form(fields).encode('utf-8'),
+                            headers={'Content-Type': 'application/x-www-form-urlencoded'},
+                            idempotent=idempotent)
+
+    def read_form(self, name):
+        parser = FormParser()
+        parser.feed(self.get(CREATE3_FORMS[name][0]).decode('utf-8', 'replace'))
+        return parser.values
+
+    def changed_forms(self, forms):
+        # Compare the values that would be saved with the values currently on the Create 3.
+        # Forms that cannot be read back are assumed to have changed.
+        changed = []
+        for name, fields in forms.items():
+            try:
+                current = self.read_form(name)
+            except Create3Error:
+                current = {}
+            if any(k not in current or normalize(current[k]) != normalize(v) for k, v in fields.items()):
+                changed.append(name)
+        return changed
+
+    def save_form(self, name, fields):
+        self.post_form(CREATE3_FORMS[name][1], fields)
+
+    @staticmethod
+    def ros_config(domain_id, namespace, rmw, discovery_server, discovery_server_enabled):
+        return {'ros_domain_id': domain_id,
+                'ros_namespace': namespace,
+                'rmw_implementation': rmw,
+                'fast_discovery_server_value': discovery_server,
+                'fast_discovery_server_enabled': bool(discovery_server_enabled)}
+
+    def reboot(self):
+        self.request('POST', '/api/reboot', idempotent=False)
+
+
+class RebootWatcher():
+
+    def __init__(self, host=CREATE3_HOST, port=CREATE3_PORT, poll_interval=1.0,
+                 probe_timeout=2.0, down_timeout=20.0) -> None:
+        self.host = host
+        self.port = port
+        self.poll_interval = poll_interval
+        self.probe_timeout = probe_timeout
+        # If the web server is never seen going down, the reboot is assumed to be complete.
+        # With None the server must be seen going down and coming back.
+        self.down_timeout = down_timeout
+        self.ready = threading.Event()
+        self.stopped = threading.Event()
+        self.start_time = None
+        self.duration = None
+        self.went_down = False
+        self.thread = None
+
+    def start(self):
+        self.start_time = time.monotonic()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+
+    def probe(self):
+        connection = http.client.HTTPConnection(self.host, self.port, timeout=self.probe_timeout)
+        try:
+            connection.request('GET', '/')
+            return connection.getresponse().status < 500
+        except (OSError, http.client.HTTPException):
+            return False
+        finally:
+            connection.close()
+
+    def run(self):
+        while not self.stopped.is_set():
+            up = self.probe()
+            elapsed = time.monotonic() - self.start_time
+            if not self.went_down and not up:
+                self.went_down = True
+            elif up and (self.went_down or self.down_timeout is not None and elapsed > self.down_timeout):
+                self.duration = elapsed
+                self.ready.set()
+                return
+            self.stopped.wait(self.poll_interval)
+
+    def wait(self, timeout=None):
+        ready = self.ready.wait(timeout)
+        if not ready:
+            self.stop()
+        return ready
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+
+# Create 3 firmware updater for robots running H.1.0 or higher.
+#
+# usage: python3 -m turtlebot4_setup.create3_update image.swu [--host HOST[:PORT] ...]
+#                [--sha256 HASH] [-j JOBS] [--reboot-timeout SECONDS] [--no-wait]
+
+import argparse
+import hashlib
+import http.client
+import mmap
+import os
+import sys
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from turtlebot4_setup.create3 import CREATE3_HOST, CREATE3_PORT, RebootWatcher
+
+UPDATE_PATH = '/api/firmware-update'
+CHUNK_SIZE = 1 << 20
+
+
+class UpdateError(Exception):
+    pass
+
+
+def parse_target(target):
+    host, _, port = target.partition(':')
+    return (host, int(port) if port else CREATE3_PORT)
+
+
+def map_image(path):
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise UpdateError('{0} is empty'.format(path))
+        # The mapping stays valid after the file is closed
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def image_sha256(image):
+    sha = hashlib.sha256()
+    view = memoryview(image)
+    for offset in range(0, len(view), CHUNK_SIZE):
+        sha.update(view[offset:offset + CHUNK_SIZE])
+    view.release()
+    return sha.hexdigest()
+
+
+def expected_sha256(path, sha256=None):
+    # An explicit hash takes precedence over an image.swu.sha256 file next to the image
+    if sha256:
+        return sha256.strip().lower()
+    try:
+        with open(path + '.sha256', 'r') as f:
+            return f.read().split()[0].lower()
+    except (OSError, IndexError):
+        return None
+
+
+class Progress():
+
+    def __init__(self, total, targets, stream=sys.stderr, interval=0.5) -> None:
+        self.total = total
+        self.sent = {t: 0 for t in targets}
+        self.stream = stream
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.start = time.monotonic()
+        self.last = 0.0
+
+    def update(self, target, n):
+        with self.lock:
+            self.sent[target] += n
+            now = time.monotonic()
+            if now - self.last >= self.interval or self.sent[target] == self.total:
+                self.last = now
+                self.print(now)
+
+    def print(self, now):
+        rate = sum(self.sent.values()) / max(now - self.start, 1e-6) / 1e6
+        line = '  '.join('{0} {1:3.0f}%'.format(t, 100.0 * s / self.total) for t, s in self.sent.items())
+        self.stream.write('\r{0}  {1:.1f} MB/s'.format(line, rate))
+        self.stream.flush()
+
+
+def upload(image, host, port, progress=None, timeout=60.0):
+    target = '{0}:{1}'.format(host, port)
+    connection = http.client.HTTPConnection(host, port, timeout=timeout)
+    view = memoryview(image)
+    start = time.monotonic()
+    try:
+        connection.putrequest('POST', UPDATE_PATH)
+        # Same headers as curl --data-binary
+        connection.putheader('Content-Type', 'application/x-www-form-urlencoded')
+        connection.putheader('Content-Length', str(len(view)))
+        connection.endheaders()
+        for offset in range(0, len(view), CHUNK_SIZE):
+            chunk = view[offset:offset + CHUNK_SIZE]
+            connection.send(chunk)
+            if progress is not None:
+                progress.update(target, len(chunk))
+        response = connection.getresponse()
+        response.read()
+    except (OSError, http.client.HTTPException) as e:
+        raise UpdateError('Upload failed: {0}'.format(e)) from e
+    finally:
+        view.release()
+        connection.close()
+
+    if response.status >= 400:
+        raise UpdateError('Upload failed: {0} {1}'.format(response.status, response.reason))
+    return time.monotonic() - start
+
+
+def update_target(image, host, port, progress=None, wait=True, reboot_timeout=300.0):
+    result = {'target': '{0}:{1}'.format(host, port), 'result': 'success'}
+    try:
+        seconds = upload(image, host, port, progress)
+        result['upload'] = seconds
+        result['throughput'] = len(image) / max(seconds, 1e-6) / 1e6
+        if wait:
+            # The Create 3 keeps serving while it installs the update, and only reboots once it
+            # is installed, so it must be seen going down before it counts as updated
+            watcher = RebootWatcher(host, port, down_timeout=None).start()
+            if not watcher.wait(reboot_timeout):
+                if not watcher.went_down:
+                    raise UpdateError('Did not reboot within {0:.0f} seconds'.format(reboot_timeout))
+                raise UpdateError('Did not come back within {0:.0f} seconds'.format(reboot_timeout))
+            result['reboot'] = watcher.duration
+    except UpdateError as e:
+        result['result'] = 'error'
+        result['message'] = str(e)
+    return result
+
+
+def update(image, targets, jobs=4, wait=True, reboot_timeout=300.0, stream=sys.stderr):
+    names = ['{0}:{1}'.format(host, port) for host, port in targets]
+    progress = Progress(len(image), names, stream)
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(update_target, image, host, port, progress, wait, reboot_timeout)
+                   for host, port in targets]
+        results = [future.result() for future in futures]
+    stream.write('\n')
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Create 3 update script for robots running H.1.0 or higher')
+    parser.add_argument('image', help='Path to the .swu firmware image')
+    parser.add_argument('--host', action='append', dest='hosts', metavar='HOST[:PORT]',
+                        help='Create 3 to update. Can be repeated. Default: ' + CREATE3_HOST)
+    parser.add_argument('--sha256', help='Expected SHA-256 of the image. Default: read from IMAGE.sha256')
+    parser.add_argument('-j', '--jobs', type=int, default=4, help='Number of Create 3s updated at once')
+    parser.add_argument('--reboot-timeout', type=float, default=300.0,
+                        help='Seconds to wait for each Create 3 to come back')
+    parser.add_argument('--no-wait', action='store_true', help='Do not wait for the Create 3s to reboot')
+    args = parser.parse_args()
+
+    print('Image path: {0}'.format(args.image))
+    try:
+        image = map_image(args.image)
+    except (OSError, UpdateError) as e:
+        print('Error: {0}'.format(e))
+        return 2
+
+    sha256 = image_sha256(image)
+    expected = expected_sha256(args.image, args.sha256)
+    if expected is None:
+        print('Warning: No checksum to verify against. SHA-256: {0}'.format(sha256))
+    elif expected != sha256:
+        print('Error: Checksum mismatch. Expected {0}, got {1}'.format(expected, sha256))
+        return 2
+    else:
+        print('Checksum verified')
+
+    targets = [parse_target(t) for t in (args.hosts or [CREATE3_HOST])]
+    results = update(image, targets, args.jobs, not args.no_wait, args.reboot_timeout)
+    image.close()
+
+    failed = [r for r in results if r['result'] != 'success']
+    for r in results:
+        if r['result'] == 'success':
+            details = 'uploaded in {0:.1f}s ({1:.1f} MB/s)'.format(r['upload'], r['throughput'])
+            if 'reboot' in r:
+                details += ', rebooted in {0:.1f}s'.format(r['reboot'])
+        else:
+            details = r['message']
+        print('{0:<24}{1:<10}{2}'.format(r['target'], r['result'], details))
+    print('{0} of {1} Create 3s updated'.format(len(results) - len(failed), len(results)))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
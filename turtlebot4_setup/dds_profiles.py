@@ -0,0 +1,438 @@
+import re
+
+import xml.etree.ElementTree as ET
+
+FASTDDS_NAMESPACE = 'http://www.eprosima.com/XMLSchemas/fastRTPS_Profiles'
+
+# Setting keys, shared with conf.FastDDSOptions
+PRESET = 'PRESET'
+SHARED_MEMORY = 'SHARED_MEMORY'
+SOCKET_BUFFER_SIZE = 'SOCKET_BUFFER_SIZE'
+MAX_MESSAGE_SIZE = 'MAX_MESSAGE_SIZE'
+HISTORY_MEMORY_POLICY = 'HISTORY_MEMORY_POLICY'
+
+HISTORY_MEMORY_POLICIES = ['PREALLOCATED', 'PREALLOCATED_WITH_REALLOC', 'DYNAMIC', 'DYNAMIC_REUSABLE']
+
+# A socket buffer size of 0 leaves the OS default
+FASTDDS_PRESETS = {
+    # FastDDS defaults, using the builtin UDP and shared memory transports
+    'default': {
+        SHARED_MEMORY: True,
+        SOCKET_BUFFER_SIZE: 0,
+        MAX_MESSAGE_SIZE: 65500,
+        HISTORY_MEMORY_POLICY: 'PREALLOCATED_WITH_REALLOC',
+    },
+    # Small, frequent messages such as teleop and cmd_vel
+    'low_latency': {
+        SHARED_MEMORY: True,
+        SOCKET_BUFFER_SIZE: 524288,
+        MAX_MESSAGE_SIZE: 65500,
+        HISTORY_MEMORY_POLICY: 'PREALLOCATED_WITH_REALLOC',
+    },
+    # Large samples such as point clouds and camera images
+    'high_throughput': {
+        SHARED_MEMORY: True,
+        SOCKET_BUFFER_SIZE: 4194304,
+        MAX_MESSAGE_SIZE: 65500,
+        HISTORY_MEMORY_POLICY: 'DYNAMIC_REUSABLE',
+    },
+    # Minimal preallocation and no shared memory segments
+    'memory_constrained': {
+        SHARED_MEMORY: False,
+        SOCKET_BUFFER_SIZE: 65536,
+        MAX_MESSAGE_SIZE: 8192,
+        HISTORY_MEMORY_POLICY: 'DYNAMIC',
+    },
+}
+
+CUSTOM_PRESET = 'custom'
+
+# Larger values make participant creation fail on the Create 3
+CREATE3_MAX_SOCKET_BUFFER_SIZE = 32768
+CREATE3_MAX_MESSAGE_SIZE = 8192
+
+UDP_MAX_MESSAGE_SIZE = 65500
+# FastDDS default shared memory segment size
+SHM_SEGMENT_SIZE = 524288
+
+MARKER = re.compile(r'<!-- turtlebot4-setup preset: (\S+) -->')
+
+
+def preset_settings(preset):
+    settings = dict(FASTDDS_PRESETS[preset])
+    settings[PRESET] = preset
+    return settings
+
+
+def matching_preset(settings):
+    for name, preset in FASTDDS_PRESETS.items():
+        if all(str(settings.get(k)) == str(v) for k, v in preset.items()):
+            return name
+    return CUSTOM_PRESET
+
+
+def add_text(parent, tag, text):
+    element = ET.SubElement(parent, tag)
+    element.text = str(text)
+    return element
+
+
+def add_history(profiles, history_memory_policy, max_samples=None):
+    for tag, name in [('data_writer', 'default_publisher_profile'),
+                      ('data_reader', 'default_subscriber_profile')]:
+        endpoint = ET.SubElement(profiles, tag, profile_name=name, is_default_profile='true')
+        if max_samples is not None:
+            limits = ET.SubElement(ET.SubElement(endpoint, 'topic'), 'resourceLimitsQos')
+            add_text(limits, 'max_samples', max_samples)
+            add_text(limits, 'allocated_samples', max_samples)
+        if history_memory_policy is not None:
+            add_text(endpoint, 'historyMemoryPolicy', history_memory_policy)
+
+
+def to_xml(root, preset):
+    ET.indent(root, space='    ')
+    return ('<?xml version="1.0" encoding="UTF-8" ?>\n' +
+            '<!-- This file was automatically created by the turtlebot4-setup tool and should not be manually modified -->\n' +
+            '<!-- turtlebot4-setup preset: {0} -->\n'.format(preset) +
+            ET.tostring(root, encoding='unicode') + '\n')
+
+
+def fastdds_rpi_profile(settings):
+    socket_buffer_size = int(settings[SOCKET_BUFFER_SIZE])
+    max_message_size = int(settings[MAX_MESSAGE_SIZE])
+    shared_memory = str(settings[SHARED_MEMORY]) == 'True'
+    default = FASTDDS_PRESETS['default']
+
+    root = ET.Element('dds')
+    profiles = ET.SubElement(root, 'profiles', xmlns=FASTDDS_NAMESPACE)
+    participant = ET.SubElement(profiles, 'participant',
+                                profile_name='turtlebot4_default_profile', is_default_profile='true')
+    rtps = ET.SubElement(participant, 'rtps')
+
+    # The builtin transports are only replaced when the transport settings differ from the defaults
+    if (shared_memory, socket_buffer_size, max_message_size) != \
+       (default[SHARED_MEMORY], default[SOCKET_BUFFER_SIZE], default[MAX_MESSAGE_SIZE]):
+        transports = ET.Element('transport_descriptors')
+        profiles.insert(0, transports)
+
+        udp = ET.SubElement(transports, 'transport_descriptor')
+        add_text(udp, 'transport_id', 'udp_transport')
+        add_text(udp, 'type', 'UDPv4')
+        if socket_buffer_size:
+            add_text(udp, 'sendBufferSize', socket_buffer_size)
+            add_text(udp, 'receiveBufferSize', socket_buffer_size)
+        add_text(udp, 'maxMessageSize', max_message_size)
+
+        user_transports = ET.SubElement(rtps, 'userTransports')
+        if shared_memory:
+            shm = ET.SubElement(transports, 'transport_descriptor')
+            add_text(shm, 'transport_id', 'shm_transport')
+            add_text(shm, 'type', 'SHM')
+            add_text(shm, 'segment_size', max(socket_buffer_size, SHM_SEGMENT_SIZE))
+            # Shared memory is preferred for nodes on the same host
+            add_text(user_transports, 'transport_id', 'shm_transport')
+        add_text(user_transports, 'transport_id', 'udp_transport')
+        add_text(rtps, 'useBuiltinTransports', 'false')
+        if socket_buffer_size:
+            add_text(rtps, 'sendSocketBufferSize', socket_buffer_size)
+            add_text(rtps, 'listenSocketBufferSize', socket_buffer_size)
+
+    if settings[HISTORY_MEMORY_POLICY] != default[HISTORY_MEMORY_POLICY]:
+        add_history(profiles, settings[HISTORY_MEMORY_POLICY])
+    return to_xml(root, settings.get(PRESET, matching_preset(settings)))
+
+
+def fastdds_create3_profile(settings):
+    # The Create 3 has far less memory, so buffers and message sizes are capped
+    socket_buffer_size = int(settings[SOCKET_BUFFER_SIZE]) or CREATE3_MAX_SOCKET_BUFFER_SIZE
+
+    root = ET.Element('dds', xmlns=FASTDDS_NAMESPACE)
+    profiles = ET.SubElement(root, 'profiles')
+
+    transports = ET.SubElement(profiles, 'transport_descriptors')
+    udp = ET.SubElement(transports, 'transport_descriptor')
+    add_text(udp, 'transport_id', 'udp_transport')
+    add_text(udp, 'type', 'UDPv4')
+    add_text(udp, 'sendBufferSize', min(socket_buffer_size, CREATE3_MAX_SOCKET_BUFFER_SIZE))
+    add_text(udp, 'receiveBufferSize', min(socket_buffer_size, CREATE3_MAX_SOCKET_BUFFER_SIZE))
+    add_text(udp, 'maxMessageSize', min(int(settings[MAX_MESSAGE_SIZE]), CREATE3_MAX_MESSAGE_SIZE))
+
+    participant = ET.SubElement(profiles, 'participant',
+                                profile_name='domainparticipant_profile_name', is_default_profile='true')
+    rtps = ET.SubElement(participant, 'rtps')
+    add_text(ET.SubElement(rtps, 'userTransports'), 'transport_id', 'udp_transport')
+    add_text(rtps, 'useBuiltinTransports', 'false')
+
+    # No initial sample allocations
+    add_history(profiles, None, max_samples=0)
+    return to_xml(root, settings.get(PRESET, matching_preset(settings)))
+
+
+def strip_namespace(root):
+    for element in root.iter():
+        if isinstance(element.tag, str) and '}' in element.tag:
+            element.tag = element.tag.split('}', 1)[1]
+    return root
+
+
+def validate_fastdds_profile(xml):
+    # Raises ValueError if the profile is malformed or references undefined transports
+    try:
+        root = strip_namespace(ET.fromstring(xml))
+    except ET.ParseError as e:
+        raise ValueError('Invalid XML: {0}'.format(e))
+    if root.tag != 'dds' or root.find('profiles') is None:
+        raise ValueError('Expected a <dds> element containing <profiles>')
+
+    transports = {}
+    for descriptor in root.iter('transport_descriptor'):
+        transport_id = descriptor.findtext('transport_id')
+        if not transport_id or transport_id in transports:
+            raise ValueError('Transport descriptors need a unique transport_id')
+        transports[transport_id] = descriptor
+        for tag in ['sendBufferSize', 'receiveBufferSize', 'maxMessageSize', 'segment_size']:
+            value = descriptor.findtext(tag)
+            if value is not None and (not value.isdigit() or int(value) <= 0):
+                raise ValueError('{0}: {1} must be a positive integer'.format(transport_id, tag))
+        if descriptor.findtext('type') == 'UDPv4' and \
+           int(descriptor.findtext('maxMessageSize') or 0) > UDP_MAX_MESSAGE_SIZE:
+            raise ValueError('{0}: maxMessageSize cannot exceed {1}'.format(transport_id, UDP_MAX_MESSAGE_SIZE))
+
+    for user_transports in root.iter('userTransports'):
+        for transport_id in user_transports.iter('transport_id'):
+            if transport_id.text not in transports:
+                raise ValueError('Undefined transport "{0}"'.format(transport_id.text))
+
+    for policy in root.iter('historyMemoryPolicy'):
+        if policy.text not in HISTORY_MEMORY_POLICIES:
+            raise ValueError('Invalid historyMemoryPolicy "{0}"'.format(policy.text))
+
+
+def parse_fastdds_profile(xml):
+    # Reads the settings back from a generated profile. Profiles that were not generated,
+    # such as the original minimal profile, read as the FastDDS defaults.
+    settings = preset_settings('default')
+    try:
+        root = strip_namespace(ET.fromstring(xml))
+    except ET.ParseError:
+        return settings
+
+    udp = shm = None
+    for descriptor in root.iter('transport_descriptor'):
+        if descriptor.findtext('type') == 'UDPv4':
+            udp = descriptor
+        elif descriptor.findtext('type') == 'SHM':
+            shm = descriptor
+
+    if udp is not None:
+        settings[SHARED_MEMORY] = shm is not None
+        settings[SOCKET_BUFFER_SIZE] = int(udp.findtext('sendBufferSize') or 0)
+        settings[MAX_MESSAGE_SIZE] = int(udp.findtext('maxMessageSize') or UDP_MAX_MESSAGE_SIZE)
+    policy = root.findtext('.//data_writer/historyMemoryPolicy')
+    if policy in HISTORY_MEMORY_POLICIES:
+        settings[HISTORY_MEMORY_POLICY] = policy
+
+    marker = MARKER.search(xml)
+    if marker and marker.group(1) in FASTDDS_PRESETS and matching_preset(settings) == marker.group(1):
+        settings[PRESET] = marker.group(1)
+    else:
+        settings[PRESET] = matching_preset(settings)
+    return settings
+
+
+# CycloneDDS setting keys, shared with conf.CycloneDDSOptions
+INTERFACES = 'INTERFACES'
+WIFI_MULTICAST = 'WIFI_MULTICAST'
+PEERS = 'PEERS'
+SOCKET_RECEIVE_BUFFER_SIZE = 'SOCKET_RECEIVE_BUFFER_SIZE'
+FRAGMENT_SIZE = 'FRAGMENT_SIZE'
+
+# usb0 is the link to the Create 3
+CYCLONEDDS_INTERFACES = ['wlan0', 'usb0']
+WIFI_INTERFACE = 'wlan0'
+
+# CycloneDDS limits, fragments must fit in its default 14720 byte max message size
+CYCLONE_MIN_FRAGMENT_SIZE = 1024
+CYCLONE_MAX_FRAGMENT_SIZE = 14720
+# Each unicast peer is probed on the ports of this many participants per domain. Bringup
+# runs a participant per process, more than the CycloneDDS default of 9.
+CYCLONE_MAX_AUTO_PARTICIPANT_INDEX = 32
+
+# Sizes of 0 leave the CycloneDDS defaults
+CYCLONEDDS_DEFAULTS = {
+    INTERFACES: 'wlan0',
+    WIFI_MULTICAST: True,
+    PEERS: None,
+    SOCKET_RECEIVE_BUFFER_SIZE: 0,
+    FRAGMENT_SIZE: 0,
+}
+
+MEMSIZE = re.compile(r'^\s*(\d+)\s*(B|KiB|kB|MiB|MB|GiB|GB)?\s*$')
+MEMSIZE_UNITS = {None: 1, 'B': 1, 'KiB': 1024, 'kB': 1024, 'MiB': 1024 ** 2, 'MB': 1024 ** 2,
+                 'GiB': 1024 ** 3, 'GB': 1024 ** 3}
+
+
+def split_list(value):
+    # Lists are stored comma separated so they compare and journal like other settings
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return [str(v).strip() for v in value if str(v).strip()]
+    return [v.strip() for v in str(value).split(',') if v.strip()]
+
+
+def join_list(values):
+    return ','.join(values) if values else None
+
+
+def parse_memsize(text):
+    match = MEMSIZE.match(text or '')
+    if match is None:
+        return None
+    return int(match.group(1)) * MEMSIZE_UNITS[match.group(2)]
+
+
+def cyclonedds_profile(settings):
+    interfaces = split_list(settings[INTERFACES])
+    wifi_multicast = str(settings[WIFI_MULTICAST]) == 'True'
+    peers = split_list(settings[PEERS])
+    receive_buffer_size = int(settings[SOCKET_RECEIVE_BUFFER_SIZE] or 0)
+    fragment_size = int(settings[FRAGMENT_SIZE] or 0)
+
+    root = ET.Element('CycloneDDS')
+    domain = ET.SubElement(root, 'Domain')
+    general = ET.SubElement(domain, 'General')
+    network_interfaces = ET.SubElement(general, 'Interfaces')
+    for interface in interfaces:
+        multicast = 'false' if interface == WIFI_INTERFACE and not wifi_multicast else 'default'
+        ET.SubElement(network_interfaces, 'NetworkInterface', name=interface, priority='default', multicast=multicast)
+    if not any(i != WIFI_INTERFACE for i in interfaces) and not wifi_multicast:
+        add_text(general, 'AllowMulticast', 'false')
+    add_text(general, 'DontRoute', 'true')
+    if fragment_size:
+        add_text(general, 'FragmentSize', '{0}B'.format(fragment_size))
+
+    if not wifi_multicast:
+        # Without multicast on Wi-Fi, other hosts are only found through the peer list
+        discovery = ET.SubElement(domain, 'Discovery')
+        add_text(discovery, 'ParticipantIndex', 'auto')
+        add_text(discovery, 'MaxAutoParticipantIndex', CYCLONE_MAX_AUTO_PARTICIPANT_INDEX)
+        peer_list = ET.SubElement(discovery, 'Peers')
+        # Nodes on this host need to find each other as well
+        ET.SubElement(peer_list, 'Peer', address='localhost')
+        for peer in peers:
+            ET.SubElement(peer_list, 'Peer', address=peer)
+
+    if receive_buffer_size:
+        internal = ET.SubElement(domain, 'Internal')
+        # Requested rather than required, so a lower net.core.rmem_max does not stop the nodes
+        ET.SubElement(internal, 'SocketReceiveBufferSize', max='{0}B'.format(receive_buffer_size))
+
+    ET.indent(root, space='    ')
+    return ('<?xml version="1.0" encoding="UTF-8" ?>\n' +
+            '<!-- This file was automatically created by the turtlebot4-setup tool and should not be manually modified -->\n' +
+            ET.tostring(root, encoding='unicode') + '\n')
+
+
+def validate_cyclonedds_settings(settings):
+    interfaces = split_list(settings[INTERFACES])
+    if not interfaces:
+        raise ValueError('At least one network interface is required')
+    for interface in interfaces:
+        if not re.match(r'^[\w.:-]+$', interface):
+            raise ValueError('Invalid network interface "{0}"'.format(interface))
+    for peer in split_list(settings[PEERS]):
+        if not re.match(r'^[\w.:\[\]-]+$', peer):
+            raise ValueError('Invalid peer address "{0}"'.format(peer))
+    if int(settings[SOCKET_RECEIVE_BUFFER_SIZE] or 0) < 0:
+        raise ValueError('The socket receive buffer size cannot be negative')
+    fragment_size = int(settings[FRAGMENT_SIZE] or 0)
+    if fragment_size and not CYCLONE_MIN_FRAGMENT_SIZE <= fragment_size <= CYCLONE_MAX_FRAGMENT_SIZE:
+        raise ValueError('The fragment size must be {0}-{1} bytes'.format(CYCLONE_MIN_FRAGMENT_SIZE,
+                                                                          CYCLONE_MAX_FRAGMENT_SIZE))
+
+
+def parse_cyclonedds_profile(xml):
+    settings = dict(CYCLONEDDS_DEFAULTS)
+    try:
+        root = strip_namespace(ET.fromstring(xml))
+    except ET.ParseError:
+        return settings
+
+    interfaces = []
+    for interface in root.iter('NetworkInterface'):
+        name = interface.get('name')
+        if name:
+            interfaces.append(name)
+            if name == WIFI_INTERFACE:
+                settings[WIFI_MULTICAST] = interface.get('multicast', 'default') != 'false'
+    if interfaces:
+        settings[INTERFACES] = join_list(interfaces)
+    if (root.findtext('.//General/AllowMulticast') or '').strip() == 'false':
+        settings[WIFI_MULTICAST] = False
+
+    settings[PEERS] = join_list([peer.get('address') for peer in root.iter('Peer')
+                                 if peer.get('address') and peer.get('address') != 'localhost'])
+
+    receive_buffer = root.find('.//Internal/SocketReceiveBufferSize')
+    if receive_buffer is not None:
+        settings[SOCKET_RECEIVE_BUFFER_SIZE] = parse_memsize(receive_buffer.get('max')) or \
+            parse_memsize(receive_buffer.get('min')) or 0
+    settings[FRAGMENT_SIZE] = parse_memsize(root.findtext('.//General/FragmentSize')) or 0
+    return settings
+
+
+# Kernel settings that cap the DDS socket buffers and IP fragment reassembly
+RMEM_MAX = 'net.core.rmem_max'
+WMEM_MAX = 'net.core.wmem_max'
+IPFRAG_HIGH_THRESH = 'net.ipv4.ipfrag_high_thresh'
+IPFRAG_TIME = 'net.ipv4.ipfrag_time'
+
+KERNEL_DEFAULTS = {
+    RMEM_MAX: 212992,
+    WMEM_MAX: 212992,
+    IPFRAG_HIGH_THRESH: 4194304,
+    IPFRAG_TIME: 30,
+}
+
+
+def kernel_settings(rmw, fastdds_settings, cyclonedds_settings):
+    # Derived from the buffers the active RMW requests. Settings that can stay at the
+    # kernel defaults are None, so the drop-in only contains what DDS needs.
+    if rmw == 'rmw_cyclonedds_cpp':
+        receive_buffer_size = int(cyclonedds_settings[SOCKET_RECEIVE_BUFFER_SIZE] or 0)
+        send_buffer_size = 0
+    else:
+        receive_buffer_size = send_buffer_size = int(fastdds_settings[SOCKET_BUFFER_SIZE] or 0)
+
+    settings = dict.fromkeys(KERNEL_DEFAULTS)
+    if receive_buffer_size > KERNEL_DEFAULTS[RMEM_MAX]:
+        settings[RMEM_MAX] = receive_buffer_size
+        # Large samples arrive as many IP fragments. Leave room to reassemble a full receive
+        # buffer while incomplete datagrams, which are lost anyway, are dropped quickly.
+        settings[IPFRAG_HIGH_THRESH] = max(KERNEL_DEFAULTS[IPFRAG_HIGH_THRESH], 2 * receive_buffer_size)
+        settings[IPFRAG_TIME] = 3
+    if send_buffer_size > KERNEL_DEFAULTS[WMEM_MAX]:
+        settings[WMEM_MAX] = send_buffer_size
+    return settings
+
+
+def sysctl_conf(settings):
+    lines = ['# This file was automatically created by the turtlebot4-setup tool and should not be manually modified\n']
+    for key, value in settings.items():
+        if value is not None:
+            lines.append('{0} = {1}\n'.format(key, value))
+    return ''.join(lines)
+
+
+def parse_sysctl_conf(text):
+    settings = dict.fromkeys(KERNEL_DEFAULTS)
+    for line in text.splitlines():
+        key, sep, value = line.partition('=')
+        key = key.strip()
+        if sep and key in settings and not key.startswith(('#', ';')):
+            try:
+                settings[key] = int(value.strip())
+            except ValueError:
+                pass
+    return settings
@@ -0,0 +1,122 @@
+import copy
+import os
+
+from concurrent.futures import ProcessPoolExecutor
+
+import yaml
+
+from turtlebot4_setup import headless
+from turtlebot4_setup.conf import Conf
+from turtlebot4_setup.transaction import TransactionError
+
+
+# Per-robot shorthand keys and the setting they map to
+SHORTHAND = {
+    'model': ('system', 'MODEL'),
+    'hostname': ('system', 'HOSTNAME'),
+    'namespace': ('bash', 'ROBOT_NAMESPACE'),
+    'domain_id': ('bash', 'ROS_DOMAIN_ID'),
+    'ssid': ('wifi', 'SSID'),
+    'password': ('wifi', 'PASSWORD'),
+}
+
+
+def robot_document(defaults, robot):
+    doc = copy.deepcopy(defaults)
+    for key, value in robot.items():
+        if key in SHORTHAND:
+            section, option = SHORTHAND[key]
+            doc.setdefault(section, {})[option] = value
+        elif key in headless.SECTIONS:
+            doc.setdefault(key, {}).update(value or {})
+    return doc
+
+
+def load_manifest(path):
+    with open(path, 'r') as f:
+        manifest = yaml.load(f, yaml.SafeLoader)
+
+    if not isinstance(manifest, dict):
+        raise headless.ConfigError(['Expected a mapping with defaults and robots'])
+    defaults = manifest.get('defaults') or {}
+    if not isinstance(defaults, dict) or not all(isinstance(v or {}, dict) for v in defaults.values()):
+        raise headless.ConfigError(['defaults must be a mapping of sections'])
+    if not isinstance(manifest.get('robots') or [], list):
+        raise headless.ConfigError(['robots must be a list'])
+
+    robots = []
+    errors = []
+    for i, robot in enumerate(manifest.get('robots') or []):
+        if not isinstance(robot, dict):
+            errors.append('robot {0}: Expected a mapping of settings'.format(i))
+            continue
+        name = robot.get('hostname', 'robot {0}'.format(i))
+        unknown = [k for k in robot if k != 'root' and k not in SHORTHAND and k not in headless.SECTIONS]
+        if unknown:
+            errors.append('{0}: Unknown keys {1}'.format(name, ', '.join(unknown)))
+            continue
+        sections = [k for k in robot if k in headless.SECTIONS and not isinstance(robot[k] or {}, dict)]
+        if sections:
+            errors.append('{0}: Sections must be mappings: {1}'.format(name, ', '.join(sections)))
+            continue
+        if not robot.get('root'):
+            errors.append('{0}: A root directory is required'.format(name))
+            continue
+        try:
+            settings = headless.load_settings(robot_document(defaults, robot))
+        except headless.ConfigError as e:
+            errors.extend('{0}: {1}'.format(name, err) for err in e.errors)
+            continue
+        robots.append((name, robot['root'], settings))
+
+    if errors:
+        raise headless.ConfigError(errors)
+    return manifest.get('jobs'), robots
+
+
+def configure_root(name, root, settings):
+    # Runs in a worker process
+    try:
+        conf = Conf(root=root)
+        headless.apply_settings(conf, settings)
+        headless.check_discovery_ids(conf)
+        written = sorted(g.__name__ for g in conf.dirty)
+        conf.write()
+    except (OSError, TransactionError, headless.ConfigError) as e:
+        return {'name': name, 'root': root, 'result': 'error', 'message': str(e)}
+    except Exception as e:
+        # Such as a malformed file in the root, which should not stop the other robots.
+        # Multi-line messages are joined so they fit in the results table.
+        return {'name': name, 'root': root, 'result': 'error', 'message': '{0}: {1}'.format(type(e).__name__, ' '.join(str(e).split()))}
+    return {'name': name, 'root': root, 'result': 'success', 'written': written}
+
+
+def configure_fleet(robots, jobs=None):
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(configure_root, name, root, settings)
+                   for name, root, settings in robots]
+        # Results are reported in manifest order
+        return [future.result() for future in futures]
+
+
+def run(manifest_path, jobs=None):
+    try:
+        manifest_jobs, robots = load_manifest(manifest_path)
+    except (OSError, yaml.YAMLError) as e:
+        print('Error: {0}'.format(e))
+        return 2
+    except headless.ConfigError as e:
+        for error in e.errors:
+            print('Error: {0}'.format(error))
+        return 2
+
+    jobs = jobs or manifest_jobs or os.cpu_count()
+    results = configure_fleet(robots, jobs)
+    failed = [r for r in results if r['result'] != 'success']
+
+    for r in results:
+        print('{0:<24}{1:<10}{2}'.format(
+            r['name'], r['result'],
+            r.get('message') or ', '.join(r['written']) or 'unchanged'))
+    print('{0} of {1} robots configured'.format(len(results) - len(failed), len(results)))
+    return 1 if failed else 0
@@ -0,0 +1,239 @@
+import json
+import sys
+
+import yaml
+
+from turtlebot4_setup.conf import SystemOptions, WifiOptions, BashOptions, DiscoveryOptions, DiscoveryServers
+from turtlebot4_setup.conf import FastDDSOptions, CycloneDDSOptions, TimeSyncOptions
+from turtlebot4_setup.conf import MODELS, WIFI_MODES, WIFI_BANDS, RMW_IMPLEMENTATIONS
+from turtlebot4_setup.conf import FASTDDS_PRESETS, HISTORY_MEMORY_POLICIES, TIMESYNC_PRESETS, MAX_BUFFER_SIZE
+from turtlebot4_setup.dds_profiles import join_list, split_list
+from turtlebot4_setup.dds_profiles import CYCLONE_MIN_FRAGMENT_SIZE, CYCLONE_MAX_FRAGMENT_SIZE
+from turtlebot4_setup.conf import clamp_buffer_size, clamp_domain_id, clamp_port, clamp_server_id, format_namespace
+
+
+# Settings that can be set from a config file, grouped by section.
+# Derived settings such as ROS_DISCOVERY_SERVER are generated from these.
+SECTIONS = {
+    'system': [SystemOptions.MODEL, SystemOptions.HOSTNAME],
+    'wifi': [WifiOptions.WIFI_MODE, WifiOptions.SSID, WifiOptions.PASSWORD,
+             WifiOptions.BAND, WifiOptions.IP, WifiOptions.DHCP],
+    'bash': [BashOptions.NAMESPACE, BashOptions.DOMAIN_ID, BashOptions.RMW,
+             BashOptions.DIAGNOSTICS, BashOptions.WORKSPACE,
+             BashOptions.CYCLONEDDS_URI, BashOptions.FASTRTPS_URI],
+    'discovery': [DiscoveryOptions.ENABLED, DiscoveryOptions.PORT, DiscoveryOptions.SERVER_ID,
+                  DiscoveryOptions.OFFBOARD_SERVERS],
+    'fastdds': [FastDDSOptions.PRESET, FastDDSOptions.SHARED_MEMORY, FastDDSOptions.SOCKET_BUFFER_SIZE,
+                FastDDSOptions.MAX_MESSAGE_SIZE, FastDDSOptions.HISTORY_MEMORY_POLICY],
+    'cyclonedds': [CycloneDDSOptions.INTERFACES, CycloneDDSOptions.WIFI_MULTICAST, CycloneDDSOptions.PEERS,
+                   CycloneDDSOptions.SOCKET_RECEIVE_BUFFER_SIZE, CycloneDDSOptions.FRAGMENT_SIZE],
+    'timesync': [TimeSyncOptions.PRESET, TimeSyncOptions.SERVERS],
+}
+
+
+class ConfigError(Exception):
+
+    def __init__(self, errors) -> None:
+        super().__init__('\n'.join(errors))
+        self.errors = errors
+
+
+def parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    if str(value).lower() in ['true', 'yes', '1', 'enabled']:
+        return True
+    if str(value).lower() in ['false', 'no', '0', 'disabled']:
+        return False
+    raise ValueError('Expected true or false')
+
+
+def parse_choice(value, choices):
+    if str(value) not in choices:
+        raise ValueError('Expected one of {0}'.format(', '.join(choices)))
+    return str(value)
+
+
+def parse_int(value):
+    # Values are never truncated, so 3.7 or "3.7" is an error rather than 3
+    if isinstance(value, bool) or isinstance(value, float) and not value.is_integer():
+        raise ValueError('Expected a whole number')
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError('Expected a whole number')
+
+
+def parse_clamped(value, clamp, valid_range):
+    # Values the prompts would silently clamp are rejected instead
+    if parse_int(value) != clamp(value):
+        raise ValueError('Expected {0}'.format(valid_range))
+    return int(value)
+
+
+def parse_str(value):
+    if value is None or value == '':
+        return None
+    return str(value)
+
+
+def parse_servers(value):
+    # Either a list of {id, ip, port} mappings or a ROS_DISCOVERY_SERVER string
+    if value is None or value == '':
+        return DiscoveryServers()
+    elif isinstance(value, str):
+        return DiscoveryServers.parse(value)
+    elif not isinstance(value, list):
+        raise ValueError('Expected a list of servers with an id, ip and port')
+
+    servers = {}
+    for server in value:
+        if not isinstance(server, dict) or server.get('id') is None or not server.get('ip'):
+            raise ValueError('Expected a list of servers with an id, ip and port')
+        server_id = parse_clamped(server['id'], clamp_server_id, '0-255 for the server ID')
+        if server_id in servers:
+            raise ValueError('Server ID {0} is used more than once'.format(server_id))
+        servers[server_id] = (str(server['ip']).strip(),
+                              parse_clamped(server.get('port', 11811), clamp_port, '10000-65535 for the port'))
+    return DiscoveryServers(servers)
+
+
+def parse_size(value, minimum, maximum):
+    if not minimum <= parse_int(value) <= maximum:
+        raise ValueError('Expected {0}-{1}'.format(minimum, maximum))
+    return int(value)
+
+
+def validate(option, value):
+    if option is SystemOptions.MODEL:
+        return parse_choice(value, MODELS)
+    elif option is WifiOptions.WIFI_MODE:
+        return parse_choice(value, WIFI_MODES)
+    elif option is WifiOptions.BAND:
+        return parse_choice(value, WIFI_BANDS)
+    elif option in [WifiOptions.DHCP, DiscoveryOptions.ENABLED, FastDDSOptions.SHARED_MEMORY,
+                    CycloneDDSOptions.WIFI_MULTICAST]:
+        return parse_bool(value)
+    elif option is BashOptions.RMW:
+        return parse_choice(value, RMW_IMPLEMENTATIONS)
+    elif option is BashOptions.DOMAIN_ID:
+        return parse_clamped(value, clamp_domain_id, '0-101 or 215-232')
+    elif option is BashOptions.NAMESPACE:
+        return format_namespace(parse_str(value))
+    elif option is BashOptions.DIAGNOSTICS:
+        return '1' if parse_bool(value) else '0'
+    elif option is DiscoveryOptions.PORT:
+        return parse_clamped(value, clamp_port, '10000-65535')
+    elif option is DiscoveryOptions.SERVER_ID:
+        return parse_clamped(value, clamp_server_id, '0-255')
+    elif option is DiscoveryOptions.OFFBOARD_SERVERS:
+        return parse_servers(value)
+    elif option is FastDDSOptions.PRESET:
+        return parse_choice(value, FASTDDS_PRESETS)
+    elif option in [FastDDSOptions.SOCKET_BUFFER_SIZE, CycloneDDSOptions.SOCKET_RECEIVE_BUFFER_SIZE]:
+        return parse_clamped(value, clamp_buffer_size, '0-{0}'.format(MAX_BUFFER_SIZE))
+    elif option is FastDDSOptions.MAX_MESSAGE_SIZE:
+        return parse_size(value, 1024, 65500)
+    elif option is FastDDSOptions.HISTORY_MEMORY_POLICY:
+        return parse_choice(value, HISTORY_MEMORY_POLICIES)
+    elif option is CycloneDDSOptions.INTERFACES:
+        if not split_list(value):
+            raise ValueError('At least one network interface is required')
+        return join_list(split_list(value))
+    elif option is CycloneDDSOptions.PEERS:
+        return join_list(split_list(value))
+    elif option is CycloneDDSOptions.FRAGMENT_SIZE:
+        if parse_int(value) == 0:
+            return 0
+        return parse_size(value, CYCLONE_MIN_FRAGMENT_SIZE, CYCLONE_MAX_FRAGMENT_SIZE)
+    elif option is TimeSyncOptions.PRESET:
+        return parse_choice(value, TIMESYNC_PRESETS)
+    elif option is TimeSyncOptions.SERVERS:
+        servers = split_list(value)
+        if any(len(server.split()) != 1 for server in servers):
+            raise ValueError('Expected a list of host names or IP addresses')
+        return join_list(servers)
+    elif option in [SystemOptions.HOSTNAME, WifiOptions.SSID]:
+        value = parse_str(value)
+        if value is None:
+            raise ValueError('A value is required')
+        return value
+    return parse_str(value)
+
+
+def find_option(section, key):
+    for option in SECTIONS[section]:
+        if key == option.name or key == option.value:
+            return option
+    return None
+
+
+def load_settings(doc):
+    settings = []
+    errors = []
+
+    if not isinstance(doc, dict):
+        raise ConfigError(['Expected a mapping of sections: {0}'.format(', '.join(SECTIONS))])
+
+    for section, values in doc.items():
+        if section not in SECTIONS:
+            errors.append('Unknown section "{0}"'.format(section))
+            continue
+        if not isinstance(values, dict):
+            errors.append('Section "{0}" must be a mapping'.format(section))
+            continue
+        for key, value in values.items():
+            option = find_option(section, key)
+            if option is None:
+                errors.append('{0}: Unknown setting "{1}"'.format(section, key))
+                continue
+            try:
+                settings.append((option, validate(option, value)))
+            except (TypeError, ValueError) as e:
+                errors.append('{0}.{1}: Invalid value "{2}". {3}'.format(section, option.value, value, e))
+
+    if errors:
+        raise ConfigError(errors)
+    # A preset is applied before any of the settings it would otherwise override
+    return sorted(settings, key=lambda s: s[0] is not FastDDSOptions.PRESET)
+
+
+def load_file(path):
+    try:
+        with open(path, 'r') as f:
+            doc = yaml.load(f, yaml.SafeLoader)
+    except (OSError, yaml.YAMLError) as e:
+        raise ConfigError([str(e)])
+    return load_settings(doc)
+
+
+def apply_settings(conf, settings):
+    for option, value in settings:
+        if isinstance(option, FastDDSOptions):
+            conf.set_fastdds(option, value)
+        else:
+            conf.set(option, value)
+
+
+def check_discovery_ids(conf):
+    # The onboard and offboard discovery servers need different IDs. This is checked
+    # against the resulting configuration, including values not in the file.
+    server_id = conf.get(DiscoveryOptions.SERVER_ID)
+    if int(server_id) in conf.get(DiscoveryOptions.OFFBOARD_SERVERS):
+        raise ConfigError(['discovery: SERVER_ID {0} is also used by an offboard server'.format(server_id)])
+
+
+def changes_dict(conf):
+    return {option.value: [conf.journal[option].old, conf.journal[option].new]
+            for option in conf.changes()}
+
+
+def report(result, changes=None, errors=None, message=None, stream=sys.stdout):
+    json.dump({
+        'result': result,
+        'changes': changes or {},
+        'errors': errors or [],
+        'message': message or '',
+    }, stream, default=str)
+    stream.write('\n')
+    stream.flush()
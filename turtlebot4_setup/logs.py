@@ -0,0 +1,207 @@
+import json
+import os
+import re
+import select
+import shutil
+import subprocess
+import sys
+import termios
+import threading
+import time
+import tty
+
+from collections import deque, namedtuple
+
+UNITS = ['turtlebot4.service', 'discovery.service']
+
+# syslog priorities, as used by the journal
+PRIORITIES = ['emerg', 'alert', 'crit', 'err', 'warning', 'notice', 'info', 'debug']
+
+LogLine = namedtuple('LogLine', ['time', 'unit', 'priority', 'message'])
+
+ESC = '\x1b'
+# Terminals send the rest of an escape sequence together with the ESC, so a lone ESC
+# is one that nothing follows within this many seconds
+ESCAPE_TIMEOUT = 0.05
+
+
+def parse_journal_line(line):
+    try:
+        entry = json.loads(line)
+    except ValueError:
+        return None
+
+    message = entry.get('MESSAGE', '')
+    if isinstance(message, list):
+        # Messages that are not valid UTF-8 are exported as a list of bytes
+        message = bytes(message).decode('utf-8', 'replace')
+    elif message is None:
+        message = ''
+
+    try:
+        timestamp = int(entry.get('__REALTIME_TIMESTAMP', 0)) / 1e6
+        priority = int(entry.get('PRIORITY', 6))
+    except ValueError:
+        timestamp, priority = 0.0, 6
+
+    unit = entry.get('_SYSTEMD_UNIT') or entry.get('SYSLOG_IDENTIFIER') or ''
+    return LogLine(timestamp, unit, priority, message)
+
+
+class JournalSource():
+    # Follows the journal of the given units, starting with the last `lines` entries
+
+    def __init__(self, units=UNITS, lines=100) -> None:
+        self.command = ['journalctl', '-f', '-o', 'json', '-n', str(lines)]
+        for unit in units:
+            self.command += ['-u', unit]
+        self.process = None
+
+    def __iter__(self):
+        self.process = subprocess.Popen(self.command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                        universal_newlines=True)
+        return iter(self.process.stdout)
+
+    def close(self):
+        if self.process is not None:
+            self.process.terminate()
+            self.process.wait()
+
+
+class LogFollower():
+
+    def __init__(self, source=None, max_lines=1000) -> None:
+        # Any iterable of journal JSON lines can be followed
+        self.source = source if source is not None else JournalSource(lines=max_lines)
+        # Only the most recent lines are kept
+        self.lines = deque(maxlen=max_lines)
+        self.lock = threading.Lock()
+        self.changed = threading.Event()
+        self.thread = None
+        self.max_priority = len(PRIORITIES) - 1
+        self.pattern = None
+        self.paused = False
+
+    def start(self):
+        self.thread = threading.Thread(target=self.follow, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if hasattr(self.source, 'close'):
+            self.source.close()
+
+    def follow(self):
+        for line in self.source:
+            log_line = parse_journal_line(line)
+            if log_line is None:
+                continue
+            with self.lock:
+                self.lines.append(log_line)
+            self.changed.set()
+
+    def set_priority(self, max_priority):
+        self.max_priority = max_priority
+        self.changed.set()
+
+    def set_pattern(self, pattern):
+        # An empty pattern clears the filter. Invalid patterns raise re.error.
+        self.pattern = re.compile(pattern) if pattern else None
+        self.changed.set()
+
+    def matches(self, log_line):
+        if log_line.priority > self.max_priority:
+            return False
+        return self.pattern is None or self.pattern.search(log_line.message) is not None
+
+    def visible(self, count):
+        with self.lock:
+            lines = list(self.lines)
+        lines = [line for line in lines if self.matches(line)]
+        return lines[-count:] if count > 0 else []
+
+    def format_line(self, log_line, width):
+        text = '{0} {1:<20} {2:<7} {3}'.format(
+            time.strftime('%H:%M:%S', time.localtime(log_line.time)),
+            log_line.unit[:20],
+            PRIORITIES[min(log_line.priority, len(PRIORITIES) - 1)],
+            log_line.message.replace('\n', ' '))[:width]
+        if log_line.priority <= 3:
+            return '\033[31m' + text + '\033[0m'
+        elif log_line.priority == 4:
+            return '\033[33m' + text + '\033[0m'
+        return text
+
+    def render(self, stream=sys.stdout):
+        columns, rows = shutil.get_terminal_size()
+        header = 'Logs: {0}  Priority: {1}  Filter: {2}{3}'.format(
+            ', '.join(UNITS), PRIORITIES[self.max_priority],
+            self.pattern.pattern if self.pattern else 'none',
+            '  [paused]' if self.paused else '')
+        keys = 'Q: back  0-7: priority  /: filter  C: clear filter  Space: pause'
+        lines = [self.format_line(line, columns) for line in self.visible(rows - 3)]
+        stream.write('\033[H\033[2J' + header[:columns] + '\n' + keys[:columns] + '\n' +
+                     '-' * min(columns, len(keys)) + '\n' + '\n'.join(lines))
+        stream.flush()
+
+    def prompt_filter(self, fd, old_term):
+        termios.tcsetattr(fd, termios.TCSADRAIN, old_term)
+        try:
+            self.set_pattern(input('\nFilter (regex, empty to clear): '))
+        except re.error as e:
+            print('Invalid filter: {0}'.format(e))
+            time.sleep(1)
+        except (KeyboardInterrupt, EOFError):
+            pass
+        tty.setcbreak(fd)
+
+    @staticmethod
+    def read_key(fd):
+        key = os.read(fd, 1)
+        if key == ESC.encode():
+            # Arrow and function keys are escape sequences, read whole so they are not taken for ESC
+            while select.select([fd], [], [], ESCAPE_TIMEOUT)[0]:
+                key += os.read(fd, 16)
+        return key.decode(errors='ignore')
+
+    def handle_key(self, key, fd, old_term):
+        if key in ['q', 'Q', ESC]:
+            return False
+        elif key.startswith(ESC):
+            # Escape sequences such as arrow keys are ignored
+            return True
+        elif key.isdigit() and int(key) < len(PRIORITIES):
+            self.set_priority(int(key))
+        elif key == '/':
+            self.prompt_filter(fd, old_term)
+        elif key in ['c', 'C']:
+            self.set_priority(len(PRIORITIES) - 1)
+            self.set_pattern(None)
+        elif key == ' ':
+            self.paused = not self.paused
+        return True
+
+    def show(self, refresh_interval=0.2):
+        if self.thread is None:
+            self.start()
+
+        fd = sys.stdin.fileno()
+        old_term = termios.tcgetattr(fd)
+        tty.setcbreak(fd)
+        try:
+            self.render()
+            while True:
+                ready, _, _ = select.select([fd], [], [], refresh_interval)
+                if ready:
+                    if not self.handle_key(self.read_key(fd), fd, old_term):
+                        break
+                    self.render()
+                elif self.changed.is_set() and not self.paused:
+                    # Redraws are limited to one per refresh interval
+                    self.changed.clear()
+                    self.render()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            termios.tcsetattr(fd, termios.TCSADRAIN, old_term)
+            self.stop()
@@ -1,14 +1,30 @@
+from simple_term_menu_vendor import simple_term_menu
 from simple_term_menu_vendor.simple_term_menu import TerminalMenu
 
 from typing import List, Callable, Union
 
-from pygments import formatters, highlight, lexers
-from pygments.util import ClassNotFound
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
+import itertools
 import os
+import shutil
+import sys
+import threading
 
 import readline
 
+from turtlebot4_setup.transaction import TransactionError
+
+# Updating a menu in place swaps TerminalMenu internals, so it is limited to the
+# simple-term-menu release it was checked against. Other releases rebuild the menu.
+IN_PLACE_UPDATE_VERSION = (1, 6)
+
+# Cursor home and erase the display
+CLEAR = '\033[H\033[J'
+# Cursor down past the menu, erase the rest of the display and return home
+CLEAR_BELOW = '\033[H\033[{0}B\033[J\033[H'
+
 
 class MenuEntry():
 
@@ -34,12 +50,17 @@ class Menu():
     menu_cursor_style = ('fg_yellow', 'bold')
     menu_style = ('bg_black', 'fg_yellow')
     menu = None
+    # Number of menus being shown, so only the outermost one clears the screen on exit
+    depth = 0
 
     def __init__(self, title: Union[str, Callable], menu_entries: List[MenuEntry]) -> None:
         self.title = title
         self.menu_entries = menu_entries
         self.menu_sel = 0
-        self.menu = self.create_term_menu()
+        # The TerminalMenu is only created when the menu is first shown
+        self.menu = None
+        # Lines painted by the TerminalMenu
+        self.height = 0
         self.menu_exit = False
 
     def update_title(self):
@@ -51,14 +72,7 @@ class Menu():
         max_len = max(len(line) for line in self.name.split('\n'))
         self.name += '-' * max_len
 
-    def create_term_menu(self):
-        menu_entries = []
-        for e in self.menu_entries:
-            e.update()
-            menu_entries.append(e.name)
-
-        self.update_title()
-
+    def create_term_menu(self, menu_entries, cursor_index=0):
         return TerminalMenu(
             menu_entries,
             title=self.name,
@@ -66,34 +80,104 @@ class Menu():
             menu_cursor_style=self.menu_cursor_style,
             menu_highlight_style=self.menu_style,
             cycle_cursor=True,
-            clear_screen=True,
-            skip_empty_entries=True)
+            # The screen is cleared just before each paint instead of on entry and exit,
+            # so the previous menu stays up until it is replaced
+            clear_screen=False,
+            clear_menu_on_exit=False,
+            skip_empty_entries=True,
+            cursor_index=cursor_index)
+
+    def can_update_in_place(self, menu_entries, title_lines):
+        # TerminalMenu parses shortcut keys, previews and separators out of its entries on
+        # construction, and sizes its viewport from the entry and title line counts. Only the
+        # labels can be swapped in place, so any change to that layout rebuilds the menu.
+        if getattr(simple_term_menu, '__version_info__', ())[:2] != IN_PLACE_UPDATE_VERSION:
+            return False
+        view = getattr(self.menu, '_view', None)
+        if not (isinstance(getattr(self.menu, '_menu_entries', None), list) and
+                isinstance(getattr(self.menu, '_title_lines', None), tuple) and
+                isinstance(getattr(view, '_menu_entries', None), list) and
+                hasattr(view, 'active_menu_index')):
+            return False
+        old_entries = self.menu._menu_entries
+        return (len(menu_entries) == len(old_entries) and
+                len(title_lines) == len(self.menu._title_lines) and
+                all((new == '') == (old == '') for new, old in zip(menu_entries, old_entries)) and
+                not any('|' in e or e.startswith('[') for e in menu_entries))
+
+    def refresh_term_menu(self):
+        # Returns True if the TerminalMenu was rebuilt rather than updated in place
+        menu_entries = []
+        for e in self.menu_entries:
+            e.update()
+            menu_entries.append(e.name)
 
-    def refresh_term_menu(self, increment=0):
-        self.menu = self.create_term_menu()
-        if self.menu_sel is not None:
-            for i in range(0, self.menu_sel + increment):
-                if self.menu_entries[i].name != '':
-                    self.menu._view.increment_active_index()
+        self.update_title()
+        title_lines = tuple(self.name.split('\n'))
+        self.height = len(title_lines) + max(len(menu_entries), 1)
+
+        cursor_index = 0
+        if self.menu_sel is not None and self.menu_sel < len(menu_entries) and menu_entries[self.menu_sel] != '':
+            cursor_index = self.menu_sel
+
+        if self.menu is None or not self.can_update_in_place(menu_entries, title_lines):
+            self.menu = self.create_term_menu(menu_entries, cursor_index)
+            return True
+
+        # The entry list is shared with the search, the view keeps its own copy
+        self.menu._menu_entries[:] = menu_entries
+        self.menu._view._menu_entries[:] = menu_entries
+        self.menu._title_lines = title_lines
+        if menu_entries:
+            self.menu._view.active_menu_index = cursor_index
+        return False
 
     def reset_term_menu(self):
-        self.menu = self.create_term_menu()
         self.menu_sel = 0
+        self.refresh_term_menu()
 
     def exit(self):
         self.menu_exit = True
 
+    @staticmethod
+    def clear_screen():
+        sys.stdout.write(CLEAR)
+        sys.stdout.flush()
+
+    def clear_below_menu(self):
+        # Every line of the menu is overwritten when it is painted again, so only what an
+        # entry printed below it needs erasing. A menu that fills the terminal is cleared.
+        if self.height >= shutil.get_terminal_size().lines:
+            self.clear_screen()
+            return
+        sys.stdout.write(CLEAR_BELOW.format(self.height))
+        sys.stdout.flush()
+
     def show(self, reset=True):
         self.menu_exit = False
+        # The first paint replaces whatever was on the screen
+        rebuilt = True
         if reset:
             self.reset_term_menu()
-        while not self.menu_exit:
-            self.menu_sel = self.menu.show()
-            if self.menu_sel is None or self.menu_sel >= len(self.menu_entries):
-                break
-            else:
-                self.menu_entries[self.menu_sel].select()
+        else:
             self.refresh_term_menu()
+        Menu.depth += 1
+        try:
+            while not self.menu_exit:
+                if rebuilt:
+                    self.clear_screen()
+                else:
+                    self.clear_below_menu()
+                self.menu_sel = self.menu.show()
+                if self.menu_sel is None or self.menu_sel >= len(self.menu_entries):
+                    break
+                else:
+                    self.menu_entries[self.menu_sel].select()
+                rebuilt = self.refresh_term_menu()
+        finally:
+            Menu.depth -= 1
+            if Menu.depth == 0:
+                self.clear_screen()
 
 
 class OptionsMenu(Menu):
@@ -111,7 +195,6 @@ class OptionsMenu(Menu):
             for i, e in enumerate(menu_entries):
                 if e == str(default_option):
                     self.menu_sel = i
-                    self.refresh_term_menu()
 
     def set_option(self):
         self.option = self.menu_entries[self.menu_sel].name
@@ -122,6 +205,17 @@ class OptionsMenu(Menu):
         return self.option
 
 
+def write_or_report(write) -> bool:
+    # Runs a Conf write, showing why it failed instead of leaving the files half written
+    try:
+        write()
+    except TransactionError as e:
+        OptionsMenu(title='Error: Unable to save settings.\n\n Details:\n' + str(e),
+                    menu_entries=['Okay']).show()
+        return False
+    return True
+
+
 class HelpMenu(Menu):
 
     title = """
@@ -179,28 +273,99 @@ class Prompt():
 
 
 class PreviewMenu():
+    # Number of rendered previews kept
+    cache_size = 32
 
     def __init__(self, directories: List[str]) -> None:
         self.directories = directories
+        self.files = self.list_files()
+        self.cache = OrderedDict()
+        self.pending = {}
+        self.lock = threading.Lock()
+        # Neighbouring files are rendered in the background while the current preview is shown
+        self.executor = ThreadPoolExecutor(max_workers=1)
         self.menu = TerminalMenu(
-                    self.list_files(),
+                    self.files,
                     preview_command=self.highlight_file,
                     preview_size=0.75)
 
     def show(self):
-        self.menu.show()
+        try:
+            self.menu.show()
+        finally:
+            self.executor.shutdown(wait=False, cancel_futures=True)
 
     def list_files(self):
         files = []
         for directory in self.directories:
-            for file in os.listdir(directory):
-                if os.path.isfile(os.path.join(directory, file)):
-                    files.append(os.path.join(directory, file))
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        files.append(entry.path)
         return files
 
+    def cache_key(self, filepath):
+        try:
+            st = os.stat(filepath)
+        except OSError:
+            return None
+        # Only the lines that fit in the terminal are rendered
+        return (filepath, st.st_mtime_ns, st.st_size, shutil.get_terminal_size().lines)
+
     def highlight_file(self, filepath):
-        with open(filepath, "r") as f:
-            file_content = f.read()
+        key = self.cache_key(filepath)
+        if key is None:
+            return ''
+
+        with self.lock:
+            preview = self.cache.get(key)
+            if preview is not None:
+                self.cache.move_to_end(key)
+            future = self.pending.get(key)
+
+        if preview is None:
+            preview = future.result() if future is not None else self.render(key)
+
+        if filepath in self.files:
+            i = self.files.index(filepath)
+            for neighbour in self.files[max(i - 1, 0):i + 2]:
+                self.prefetch(neighbour)
+        return preview
+
+    def prefetch(self, filepath):
+        key = self.cache_key(filepath)
+        with self.lock:
+            if key is None or key in self.cache or key in self.pending:
+                return
+            try:
+                self.pending[key] = self.executor.submit(self.render, key)
+            except RuntimeError:
+                # The menu has been closed
+                pass
+
+    def render(self, key):
+        try:
+            preview = self.highlight(key[0], key[3])
+        except (OSError, ValueError) as e:
+            preview = str(e)
+        finally:
+            # A failed render must not leave its future behind for the next lookup to re-raise
+            with self.lock:
+                self.pending.pop(key, None)
+        with self.lock:
+            self.cache[key] = preview
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return preview
+
+    def highlight(self, filepath, max_lines):
+        from pygments import formatters, highlight, lexers
+        from pygments.util import ClassNotFound
+
+        # Files that are not UTF-8 are shown with replacement characters
+        with open(filepath, "r", errors='replace') as f:
+            file_content = ''.join(itertools.islice(f, max_lines))
         try:
             lexer = lexers.get_lexer_for_filename(filepath, stripnl=False, stripall=False)
         except ClassNotFound:
@@ -0,0 +1,134 @@
+import sys
+import time
+
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from turtlebot4_setup import profiling
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+SKIPPED = 'skipped'
+
+
+class TaskError(Exception):
+    pass
+
+
+class Task():
+
+    def __init__(self, name, function, after, lock=None) -> None:
+        self.name = name
+        self.function = function
+        self.after = list(after)
+        self.lock = lock
+        self.status = PENDING
+        self.result = None
+        self.error = None
+        self.start = None
+        self.end = None
+
+    @property
+    def duration(self):
+        if self.start is None:
+            return None
+        return (self.end if self.end is not None else time.monotonic()) - self.start
+
+
+class Pipeline():
+    # Runs tasks as soon as the tasks they depend on are done. Tasks that depend on a
+    # failed or skipped task are skipped. Tasks with the same lock never run at the same time.
+
+    def __init__(self, max_workers=4, stream=sys.stderr, refresh_interval=0.5) -> None:
+        self.tasks = {}
+        self.max_workers = max_workers
+        self.stream = stream
+        self.refresh_interval = refresh_interval
+        # The running tasks are shown on a status line that is redrawn in place
+        self.live = hasattr(stream, 'isatty') and stream.isatty()
+
+    def add(self, name, function, after=(), lock=None):
+        # Dependencies must be added first, so the graph cannot have cycles
+        for dependency in after:
+            if dependency not in self.tasks:
+                raise ValueError('Unknown task "{0}"'.format(dependency))
+        self.tasks[name] = Task(name, function, after, lock)
+        return name
+
+    def result(self, name):
+        return self.tasks[name].result
+
+    @property
+    def failed(self):
+        return [t for t in self.tasks.values() if t.status == FAILED]
+
+    @property
+    def skipped(self):
+        return [t for t in self.tasks.values() if t.status == SKIPPED]
+
+    def run(self):
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='apply') as executor:
+            futures = {}
+            while True:
+                held = set(t.lock for t in futures.values() if t.lock is not None)
+                # Tasks are in dependency order, so skips propagate in a single pass
+                for task in self.tasks.values():
+                    if task.status != PENDING:
+                        continue
+                    dependencies = [self.tasks[d] for d in task.after]
+                    if any(d.status in [FAILED, SKIPPED] for d in dependencies):
+                        task.status = SKIPPED
+                        self.report(task)
+                    elif all(d.status == DONE for d in dependencies) and task.lock not in held:
+                        if task.lock is not None:
+                            held.add(task.lock)
+                        task.status = RUNNING
+                        task.start = time.monotonic()
+                        self.report(task)
+                        futures[executor.submit(self.execute, task)] = task
+
+                if not futures:
+                    break
+                done, _ = wait(futures, timeout=self.refresh_interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    # Statuses only change here, so dependents are never scheduled before a result is reported
+                    task = futures.pop(future)
+                    task.status = future.result()
+                    self.report(task)
+                self.show_running(futures.values())
+        if self.live:
+            self.stream.write('\r\033[K')
+        return not self.failed
+
+    def execute(self, task):
+        with profiling.span(task.name, 'task'):
+            try:
+                task.result = task.function()
+                return DONE
+            except TaskError as e:
+                task.error = str(e)
+                return FAILED
+            except Exception as e:
+                task.error = '{0}: {1}'.format(type(e).__name__, e)
+                return FAILED
+            finally:
+                task.end = time.monotonic()
+
+    def report(self, task):
+        line = '[{0:^9}] {1}'.format(task.status, task.name)
+        if task.status in [DONE, FAILED]:
+            line += ' ({0:.1f} s)'.format(task.duration)
+        if task.error:
+            line += ': ' + task.error.strip().split('\n')[0]
+        self.write_line(line)
+
+    def show_running(self, tasks):
+        if self.live and tasks:
+            self.stream.write('\r\033[K' + 'Waiting for: ' + ', '.join(
+                '{0} ({1:.0f} s)'.format(t.name, t.duration) for t in tasks))
+            self.stream.flush()
+
+    def write_line(self, line):
+        self.stream.write(('\r\033[K' if self.live else '') + line + '\n')
+        self.stream.flush()
@@ -0,0 +1,158 @@
+import contextlib
+import json
+import os
+import shlex
+import subprocess
+import sys
+import threading
+import time
+
+# The active tracer, if profiling was enabled
+tracer = None
+
+
+class Tracer():
+    # Records timed spans in the Chrome trace event format, which chrome://tracing,
+    # Perfetto and speedscope can open
+
+    def __init__(self, path) -> None:
+        self.path = path
+        self.pid = os.getpid()
+        self.start = time.perf_counter()
+        self.events = []
+        self.threads = set()
+        self.lock = threading.Lock()
+
+    def timestamp(self, t):
+        return (t - self.start) * 1e6
+
+    def add_event(self, event, thread=None):
+        if thread is None:
+            thread = threading.current_thread()
+        with self.lock:
+            if thread.ident not in self.threads:
+                self.threads.add(thread.ident)
+                self.events.append({'name': 'thread_name', 'ph': 'M', 'pid': self.pid, 'tid': thread.ident,
+                                    'args': {'name': thread.name}})
+            self.events.append(dict(event, pid=self.pid, tid=thread.ident))
+
+    @contextlib.contextmanager
+    def span(self, name, category='setup', **args):
+        start = time.perf_counter()
+        try:
+            yield args
+        except BaseException as e:
+            args['error'] = repr(e)
+            raise
+        finally:
+            self.add_span(name, category, start, time.perf_counter(), args)
+
+    def add_span(self, name, category, start, end, args, thread=None):
+        self.add_event({'name': name, 'cat': category, 'ph': 'X', 'ts': self.timestamp(start),
+                        'dur': (end - start) * 1e6, 'args': {k: str(v) for k, v in args.items()}}, thread)
+
+    def spans(self):
+        with self.lock:
+            return [e for e in self.events if e['ph'] == 'X']
+
+    def write(self):
+        with open(self.path, 'w') as f:
+            json.dump({'traceEvents': list(self.events), 'displayTimeUnit': 'ms'}, f)
+
+    def summary(self):
+        # Total time, count and slowest call of each span, slowest first
+        totals = {}
+        for e in self.spans():
+            total = totals.setdefault((e['cat'], e['name']), [0.0, 0, 0.0])
+            total[0] += e['dur']
+            total[1] += 1
+            total[2] = max(total[2], e['dur'])
+        return sorted(((cat, name, total, count, longest) for (cat, name), (total, count, longest) in totals.items()),
+                      key=lambda row: row[2], reverse=True)
+
+    def print_summary(self, stream=sys.stderr, limit=20):
+        rows = self.summary()
+        stream.write('\n{0:<10} {1:<50} {2:>6} {3:>10} {4:>10}\n'.format('Category', 'Span', 'Calls', 'Total s', 'Max s'))
+        stream.write('-' * 90 + '\n')
+        for cat, name, total, count, longest in rows[:limit]:
+            if len(name) > 50:
+                name = name[:47] + '...'
+            stream.write('{0:<10} {1:<50} {2:>6} {3:>10.3f} {4:>10.3f}\n'.format(cat, name, count, total / 1e6, longest / 1e6))
+        if len(rows) > limit:
+            stream.write('... {0} more in the trace\n'.format(len(rows) - limit))
+        stream.flush()
+
+
+def span(name, category='setup', **args):
+    if tracer is None:
+        return contextlib.nullcontext(args)
+    return tracer.span(name, category, **args)
+
+
+def command_name(args):
+    if isinstance(args, (list, tuple)):
+        return ' '.join(shlex.quote(str(a)) for a in args)
+    return str(args)
+
+
+def patch_subprocess():
+    # run, call, check_call, check_output and the log readers all start their commands with
+    # Popen, so each process is timed from Popen until its exit status is first collected.
+    # os.system does not use Popen.
+    init = subprocess.Popen.__init__
+    wait = subprocess.Popen.wait
+    poll = subprocess.Popen.poll
+    system = os.system
+
+    def finish(process):
+        start = process.__dict__.pop('_profiling_start', None)
+        if start is not None and tracer is not None:
+            tracer.add_span(command_name(process.args), 'subprocess', start, time.perf_counter(),
+                            {'returncode': process.returncode}, process._profiling_thread)
+
+    def traced_init(self, args, *popenargs, **kwargs):
+        start = time.perf_counter()
+        try:
+            init(self, args, *popenargs, **kwargs)
+        except BaseException as e:
+            if tracer is not None:
+                tracer.add_span(command_name(args), 'subprocess', start, time.perf_counter(), {'error': repr(e)})
+            raise
+        self._profiling_thread = threading.current_thread()
+        self._profiling_start = start
+
+    def traced_wait(self, *args, **kwargs):
+        returncode = wait(self, *args, **kwargs)
+        finish(self)
+        return returncode
+
+    def traced_poll(self):
+        returncode = poll(self)
+        if returncode is not None:
+            finish(self)
+        return returncode
+
+    def traced_system(command):
+        with span(command, 'subprocess') as span_args:
+            status = system(command)
+            span_args['status'] = status
+            return status
+
+    subprocess.Popen.__init__ = traced_init
+    subprocess.Popen.wait = traced_wait
+    subprocess.Popen.poll = traced_poll
+    os.system = traced_system
+
+
+def enable(path):
+    global tracer
+    if tracer is None:
+        tracer = Tracer(path)
+        patch_subprocess()
+    return tracer
+
+
+def save():
+    # Called before anything that may end the process, such as a reboot
+    if tracer is not None:
+        tracer.write()
@@ -1,12 +1,15 @@
-from turtlebot4_setup.menu import Menu, OptionsMenu, MenuEntry, Prompt
-from turtlebot4_setup.conf import Conf, SystemOptions, BashOptions, DiscoveryOptions
+from turtlebot4_setup.menu import Menu, OptionsMenu, MenuEntry, Prompt, write_or_report
+from turtlebot4_setup.conf import Conf, SystemOptions, BashOptions, DiscoveryOptions, FastDDSOptions, CycloneDDSOptions
+from turtlebot4_setup.conf import RMW_IMPLEMENTATIONS, FASTDDS_PRESETS, HISTORY_MEMORY_POLICIES, CYCLONEDDS_INTERFACES
+from turtlebot4_setup.conf import clamp_buffer_size, clamp_domain_id, clamp_port, clamp_server_id, format_namespace
+from turtlebot4_setup.dds_profiles import join_list, split_list
+from turtlebot4_setup.dds_profiles import CYCLONE_MIN_FRAGMENT_SIZE, CYCLONE_MAX_FRAGMENT_SIZE
+from turtlebot4_setup import profiling
 
 import os
 
 import subprocess, shlex
 
-import robot_upstart
-
 
 class RosSetup():
 
@@ -26,9 +29,11 @@ class RosSetup():
         self.discovery_server_menu = DiscoveryServer(self.conf)
         self.bash_setup_menu = BashSetup(self.conf)
         self.robot_upstart_menu = RobotUpstart(self.conf)
+        self.dds_tuning_menu = DDSTuning(self.conf)
 
         self.entries = [MenuEntry('Bash Setup', self.bash_setup_menu.show),
                         MenuEntry('Discovery Server', function=self.discovery_server_menu.show),
+                        MenuEntry('DDS Tuning', function=self.dds_tuning_menu.show),
                         MenuEntry('Robot Upstart', self.robot_upstart_menu.show)]
 
         self.menu = Menu(self.title, self.entries)
@@ -88,7 +93,7 @@ class BashSetup():
 
     def set_rmw_implementation(self):
         options = OptionsMenu(title=BashOptions.RMW,
-                              menu_entries=['rmw_fastrtps_cpp', 'rmw_cyclonedds_cpp'],
+                              menu_entries=RMW_IMPLEMENTATIONS,
                               default_option=self.conf.get(BashOptions.RMW))
         self.conf.set(BashOptions.RMW, options.show())
 
@@ -99,10 +104,7 @@ class BashSetup():
                    default_response=self.conf.get(BashOptions.DOMAIN_ID),
                    response_type=int,
                    note='ROS Domain ID (0-101) or (215-232)')
-        domain_id = p.show()        
-        domain_id = max(0, min(int(domain_id), 232))
-        if (domain_id > 101 and domain_id < 215):
-            domain_id = 101
+        domain_id = clamp_domain_id(p.show())
         self.conf.set(BashOptions.DOMAIN_ID, domain_id)
 
     def set_cyclonedds_uri(self):
@@ -136,11 +138,7 @@ class BashSetup():
                         self.conf.get(BashOptions.NAMESPACE)),
                    default_response=self.conf.get(BashOptions.NAMESPACE),
                    note='ROS2 namespace')
-        # Add '/' if needed
-        ns = p.show()
-        if ns != None and ns[0] != '/':
-            ns = '/' + ns
-        self.conf.set(BashOptions.NAMESPACE, ns)
+        self.conf.set(BashOptions.NAMESPACE, format_namespace(p.show()))
 
     def set_turtlebot4_diagnostics(self):
         options = OptionsMenu(title=BashOptions.DIAGNOSTICS,
@@ -149,8 +147,8 @@ class BashSetup():
         self.conf.set(BashOptions.DIAGNOSTICS, '1' if options.show() == 'Enabled' else '0')
 
     def save_settings(self):
-        self.conf.write()
-        self.menu.exit()
+        if write_or_report(self.conf.write):
+            self.menu.exit()
 
     def apply_defaults(self):
         self.conf.apply_default(self.conf.bash_conf)
@@ -168,24 +166,32 @@ class DiscoveryServer():
     def __init__(self, configs: Conf) -> None:
         self.conf = configs
 
-        self.entries = [MenuEntry(entry=self.format_entry('Enabled', DiscoveryOptions.ENABLED),
-                                  function=self.set_enabled),
-                        MenuEntry(entry=self.format_entry('Onboard Server - Port', DiscoveryOptions.PORT),
-                                  function=self.set_port),
-                        MenuEntry(entry=self.format_entry('Onboard Server - Server ID', DiscoveryOptions.SERVER_ID),
-                                  function=self.set_server_id),
-                        MenuEntry(entry=self.format_entry('Offboard Server - IP', DiscoveryOptions.OFFBOARD_IP),
-                                  function=self.set_offboard_ip),
-                        MenuEntry(entry=self.format_entry('Offboard Server - Port', DiscoveryOptions.OFFBOARD_PORT),
-                                  function=self.set_offboard_port),
-                        MenuEntry(entry=self.format_entry('Offboard Server - Server ID', DiscoveryOptions.OFFBOARD_ID),
-                                  function=self.set_offboard_server_id),
-                        MenuEntry('', None),
-                        MenuEntry(entry='Apply Defaults', function=self.apply_defaults),
-                        MenuEntry(entry='Save', function=self.save_settings)]
+        self.entries = []
+        self.update_entries()
 
         self.menu = Menu(title=self.title, menu_entries=self.entries)
 
+    def update_entries(self):
+        # Offboard servers get one entry each. The list is updated in place since the menu shares it.
+        self.entries[:] = [MenuEntry(entry=self.format_entry('Enabled', DiscoveryOptions.ENABLED),
+                                     function=self.set_enabled),
+                           MenuEntry(entry=self.format_entry('Onboard Server - Port', DiscoveryOptions.PORT),
+                                     function=self.set_port),
+                           MenuEntry(entry=self.format_entry('Onboard Server - Server ID', DiscoveryOptions.SERVER_ID),
+                                     function=self.set_server_id),
+                           MenuEntry('', None)]
+
+        for server_id, server in self.conf.get(DiscoveryOptions.OFFBOARD_SERVERS).items():
+            name = 'Offboard Server - Server ID {0}'.format(server_id)
+            self.entries.append(MenuEntry(entry='{0}{1}[{2}:{3}]'.format(name, ' ' * (32 - len(name)),
+                                                                        server.ip, server.port),
+                                          function=lambda server_id=server_id: self.edit_offboard_server(server_id)))
+
+        self.entries.extend([MenuEntry(entry='Add Offboard Server', function=self.add_offboard_server),
+                             MenuEntry('', None),
+                             MenuEntry(entry='Apply Defaults', function=self.apply_defaults),
+                             MenuEntry(entry='Save', function=self.save_settings)])
+
     def format_entry(self, name, opt: DiscoveryOptions):
         return lambda: '{0}{1}[{2}]'.format(
             name,
@@ -193,6 +199,7 @@ class DiscoveryServer():
             self.conf.get(opt))
 
     def show(self):
+        self.update_entries()
         self.menu.show()
 
     def set_enabled(self):
@@ -206,58 +213,209 @@ class DiscoveryServer():
                    default_response=self.conf.get(DiscoveryOptions.PORT),
                    response_type=int,
                    note='Onboard Discovery Server Port (10000-65535)')
-        port = p.show()
-        port = max(10000, min(int(port), 65535))
+        port = clamp_port(p.show())
         self.conf.set(DiscoveryOptions.PORT, port)
 
     def set_server_id(self):
         p = Prompt(prompt='Server ID [{0}]: '.format(self.conf.get(DiscoveryOptions.SERVER_ID)),
                    default_response=self.conf.get(DiscoveryOptions.SERVER_ID),
                    response_type=int,
-                   note='Onboard Discovery Server ID (0-255)')
-        server_id = p.show()
-        server_id = max(0, min(int(server_id), 255))
-        if (self.conf.get(DiscoveryOptions.OFFBOARD_IP) and (server_id == int(self.conf.get(DiscoveryOptions.OFFBOARD_ID)))):
+                   note='Onboard Discovery Server ID (0-255) - Cannot be the same as an offboard server')
+        server_id = clamp_server_id(p.show())
+        if server_id in self.conf.get(DiscoveryOptions.OFFBOARD_SERVERS):
             return
         self.conf.set(DiscoveryOptions.SERVER_ID, server_id)
 
-    def set_offboard_ip(self):
-        p = Prompt(prompt='IP [{0}]: '.format(self.conf.get(DiscoveryOptions.OFFBOARD_IP)),
-                   default_response=self.conf.get(DiscoveryOptions.OFFBOARD_IP),
-                   note='Offboard Discovery Server IP (Leave blank to disable)')
+    def add_offboard_server(self):
+        servers = self.conf.get(DiscoveryOptions.OFFBOARD_SERVERS)
+
+        p = Prompt(prompt='IP: ',
+                   default_response='',
+                   note='Offboard Discovery Server IP (Leave blank to cancel)')
         ip_addr = p.show()
-        if ip_addr:
-            ip_addr = ip_addr.strip().strip('\'"')
-        else:
-            ip_addr = ''
-        self.conf.set(DiscoveryOptions.OFFBOARD_IP, ip_addr)
+        if not ip_addr:
+            return
+        ip_addr = ip_addr.strip().strip('\'"')
 
-    def set_offboard_port(self):
-        p = Prompt(prompt='Port [{0}]: '.format(self.conf.get(DiscoveryOptions.OFFBOARD_PORT)),
-                   default_response=self.conf.get(DiscoveryOptions.OFFBOARD_PORT),
+        p = Prompt(prompt='Port [11811]: ',
+                   default_response=11811,
                    response_type=int,
                    note='Offboard Discovery Server Port (10000-65535)')
-        port = p.show()
-        port = max(10000, min(int(port), 65535))
-        self.conf.set(DiscoveryOptions.OFFBOARD_PORT, port)
+        port = clamp_port(p.show())
 
-    def set_offboard_server_id(self):
-        p = Prompt(prompt='Server ID [{0}]: '.format(self.conf.get(DiscoveryOptions.OFFBOARD_ID)),
-                   default_response=self.conf.get(DiscoveryOptions.OFFBOARD_ID),
+        default_id = servers.free_id(used=[int(self.conf.get(DiscoveryOptions.SERVER_ID))])
+        p = Prompt(prompt='Server ID [{0}]: '.format(default_id),
+                   default_response=default_id,
                    response_type=int,
-                   note='Offboard Discovery Server ID (0-255) - Cannot be the same as the onboard server')
-        server_id = p.show()
-        server_id = max(0, min(int(server_id), 255))
-        if (server_id == int(self.conf.get(DiscoveryOptions.SERVER_ID))):
+                   note='Offboard Discovery Server ID (0-255) - Must not already be in use')
+        server_id = clamp_server_id(p.show())
+        if server_id == int(self.conf.get(DiscoveryOptions.SERVER_ID)) or server_id in servers:
             return
-        self.conf.set(DiscoveryOptions.OFFBOARD_ID, server_id)
+
+        self.conf.set(DiscoveryOptions.OFFBOARD_SERVERS, servers.add(server_id, ip_addr, port))
+        self.update_entries()
+
+    def edit_offboard_server(self, server_id):
+        servers = self.conf.get(DiscoveryOptions.OFFBOARD_SERVERS)
+        server = servers[server_id]
+        options = OptionsMenu(title='Offboard Server - Server ID {0} [{1}:{2}]'.format(server_id, server.ip, server.port),
+                              menu_entries=['Remove', 'Cancel'])
+        if options.show() == 'Remove':
+            self.conf.set(DiscoveryOptions.OFFBOARD_SERVERS, servers.remove(server_id))
+            self.update_entries()
 
     def apply_defaults(self):
         self.conf.apply_default(self.conf.discovery_conf)
+        self.update_entries()
 
     def save_settings(self):
-        self.conf.write_discovery()
-        self.menu.exit()
+        if write_or_report(self.conf.write_discovery):
+            self.menu.exit()
+
+
+class DDSTuning():
+    title = """
+  ___  ___  ___   _____          _           
+ |   \\|   \\/ __| |_   _|  _ _ _ (_)_ _  __ _ 
+ | |) | |) \\__ \\   | || || | ' \\| | ' \\/ _` |
+ |___/|___/|___/   |_| \\_,_|_||_|_|_||_\\__, |
+                                       |___/ 
+"""
+
+    def __init__(self, configs: Conf) -> None:
+        self.conf = configs
+
+        self.entries = [MenuEntry(entry=self.format_entry('FastDDS Preset', FastDDSOptions.PRESET),
+                                  function=self.set_preset),
+                        MenuEntry('', None),
+                        MenuEntry(entry=self.format_entry('Shared Memory Transport', FastDDSOptions.SHARED_MEMORY),
+                                  function=self.set_shared_memory),
+                        MenuEntry(entry=self.format_entry('Socket Buffer Size', FastDDSOptions.SOCKET_BUFFER_SIZE),
+                                  function=self.set_socket_buffer_size),
+                        MenuEntry(entry=self.format_entry('Max Message Size', FastDDSOptions.MAX_MESSAGE_SIZE),
+                                  function=self.set_max_message_size),
+                        MenuEntry(entry=self.format_entry('History Memory Policy', FastDDSOptions.HISTORY_MEMORY_POLICY),
+                                  function=self.set_history_memory_policy),
+                        MenuEntry('', None),
+                        MenuEntry(entry=self.format_entry('CycloneDDS Interfaces', CycloneDDSOptions.INTERFACES),
+                                  function=self.set_interfaces),
+                        MenuEntry(entry=self.format_entry('CycloneDDS Wi-Fi Multicast', CycloneDDSOptions.WIFI_MULTICAST),
+                                  function=self.set_wifi_multicast),
+                        MenuEntry(entry=self.format_entry('CycloneDDS Unicast Peers', CycloneDDSOptions.PEERS),
+                                  function=self.set_peers),
+                        MenuEntry(entry=self.format_entry('CycloneDDS Receive Buffer Size',
+                                                          CycloneDDSOptions.SOCKET_RECEIVE_BUFFER_SIZE),
+                                  function=self.set_receive_buffer_size),
+                        MenuEntry(entry=self.format_entry('CycloneDDS Fragment Size', CycloneDDSOptions.FRAGMENT_SIZE),
+                                  function=self.set_fragment_size),
+                        MenuEntry('', None),
+                        MenuEntry(entry='Apply Defaults', function=self.apply_defaults),
+                        MenuEntry(entry='Save', function=self.save_settings)]
+
+        self.menu = Menu(title=self.title, menu_entries=self.entries)
+
+    def format_entry(self, name, opt):
+        if opt in [FastDDSOptions.SOCKET_BUFFER_SIZE, CycloneDDSOptions.SOCKET_RECEIVE_BUFFER_SIZE,
+                   CycloneDDSOptions.FRAGMENT_SIZE]:
+            return lambda: '{0}{1}[{2}]'.format(
+                name,
+                ' ' * (32 - len(name)),
+                'Default' if int(self.conf.get(opt) or 0) == 0 else self.conf.get(opt))
+        return lambda: '{0}{1}[{2}]'.format(
+            name,
+            ' ' * (32 - len(name)),
+            '' if self.conf.get(opt) is None else self.conf.get(opt))
+
+    def show(self):
+        self.menu.show()
+
+    def set_preset(self):
+        options = OptionsMenu(title='FastDDS Preset\n\n' +
+                              'default: FastDDS defaults\n' +
+                              'low_latency: Larger socket buffers for small, frequent messages\n' +
+                              'high_throughput: Large socket buffers for images and point clouds\n' +
+                              'memory_constrained: Small buffers and messages, no shared memory\n',
+                              menu_entries=FASTDDS_PRESETS,
+                              default_option=self.conf.get(FastDDSOptions.PRESET))
+        self.conf.set_fastdds(FastDDSOptions.PRESET, options.show())
+
+    def set_shared_memory(self):
+        options = OptionsMenu(title='Shared Memory Transport',
+                              menu_entries=['True', 'False'],
+                              default_option=self.conf.get(FastDDSOptions.SHARED_MEMORY))
+        self.conf.set_fastdds(FastDDSOptions.SHARED_MEMORY, options.show() == 'True')
+
+    def set_socket_buffer_size(self):
+        p = Prompt(prompt='Socket Buffer Size [{0}]: '.format(self.conf.get(FastDDSOptions.SOCKET_BUFFER_SIZE)),
+                   default_response=self.conf.get(FastDDSOptions.SOCKET_BUFFER_SIZE),
+                   response_type=int,
+                   note='UDP send and receive buffer size in bytes (0 for the OS default).\n' +
+                        'Sizes above net.core.rmem_max and net.core.wmem_max are limited by the kernel.')
+        self.conf.set_fastdds(FastDDSOptions.SOCKET_BUFFER_SIZE, clamp_buffer_size(p.show()))
+
+    def set_max_message_size(self):
+        p = Prompt(prompt='Max Message Size [{0}]: '.format(self.conf.get(FastDDSOptions.MAX_MESSAGE_SIZE)),
+                   default_response=self.conf.get(FastDDSOptions.MAX_MESSAGE_SIZE),
+                   response_type=int,
+                   note='Largest UDP datagram sent by FastDDS in bytes (1024-65500)')
+        self.conf.set_fastdds(FastDDSOptions.MAX_MESSAGE_SIZE, max(1024, min(int(p.show()), 65500)))
+
+    def set_history_memory_policy(self):
+        options = OptionsMenu(title='History Memory Policy',
+                              menu_entries=HISTORY_MEMORY_POLICIES,
+                              default_option=self.conf.get(FastDDSOptions.HISTORY_MEMORY_POLICY))
+        self.conf.set_fastdds(FastDDSOptions.HISTORY_MEMORY_POLICY, options.show())
+
+    def set_interfaces(self):
+        options = OptionsMenu(title='CycloneDDS Interfaces\n\n' +
+                              'wlan0: Wi-Fi\n' +
+                              'usb0: Create 3 USB-C link\n',
+                              menu_entries=CYCLONEDDS_INTERFACES + [','.join(CYCLONEDDS_INTERFACES)],
+                              default_option=self.conf.get(CycloneDDSOptions.INTERFACES))
+        self.conf.set(CycloneDDSOptions.INTERFACES, options.show())
+
+    def set_wifi_multicast(self):
+        options = OptionsMenu(title='CycloneDDS Wi-Fi Multicast\n\n' +
+                              'Without multicast, other hosts are only discovered through the unicast peers.\n',
+                              menu_entries=['True', 'False'],
+                              default_option=self.conf.get(CycloneDDSOptions.WIFI_MULTICAST))
+        self.conf.set(CycloneDDSOptions.WIFI_MULTICAST, options.show() == 'True')
+
+    def set_peers(self):
+        peers = self.conf.get(CycloneDDSOptions.PEERS)
+        p = Prompt(prompt='Unicast Peers [{0}]: '.format('' if peers is None else peers),
+                   default_response=peers,
+                   note='Comma separated addresses or hostnames of the other robots and computers.\n' +
+                        'Only used when Wi-Fi multicast is disabled.')
+        self.conf.set(CycloneDDSOptions.PEERS, join_list(split_list(p.show())))
+
+    def set_receive_buffer_size(self):
+        p = Prompt(prompt='Receive Buffer Size [{0}]: '.format(
+                        self.conf.get(CycloneDDSOptions.SOCKET_RECEIVE_BUFFER_SIZE)),
+                   default_response=self.conf.get(CycloneDDSOptions.SOCKET_RECEIVE_BUFFER_SIZE),
+                   response_type=int,
+                   note='UDP receive buffer size in bytes (0 for the default).\n' +
+                        'Sizes above net.core.rmem_max are limited by the kernel.')
+        self.conf.set(CycloneDDSOptions.SOCKET_RECEIVE_BUFFER_SIZE, clamp_buffer_size(p.show()))
+
+    def set_fragment_size(self):
+        p = Prompt(prompt='Fragment Size [{0}]: '.format(self.conf.get(CycloneDDSOptions.FRAGMENT_SIZE)),
+                   default_response=self.conf.get(CycloneDDSOptions.FRAGMENT_SIZE),
+                   response_type=int,
+                   note='Size of the fragments large samples are split into, in bytes\n' +
+                        '({0}-{1}, or 0 for the default)'.format(CYCLONE_MIN_FRAGMENT_SIZE, CYCLONE_MAX_FRAGMENT_SIZE))
+        fragment_size = int(p.show())
+        if fragment_size != 0:
+            fragment_size = max(CYCLONE_MIN_FRAGMENT_SIZE, min(fragment_size, CYCLONE_MAX_FRAGMENT_SIZE))
+        self.conf.set(CycloneDDSOptions.FRAGMENT_SIZE, fragment_size)
+
+    def apply_defaults(self):
+        self.conf.apply_default(self.conf.fastdds_conf)
+        self.conf.apply_default(self.conf.cyclonedds_conf)
+
+    def save_settings(self):
+        if write_or_report(self.conf.write):
+            self.menu.exit()
 
 
 class RobotUpstart():
@@ -284,7 +442,9 @@ class RobotUpstart():
                                   function=self.uninstall),
                         MenuEntry(entry='',function=None),
                         MenuEntry(entry='Status',
-                                  function=self.view_service_status)]
+                                  function=self.view_service_status),
+                        MenuEntry(entry='Logs',
+                                  function=self.view_logs)]
 
         self.menu = Menu(self.title, self.entries)
 
@@ -297,6 +457,11 @@ class RobotUpstart():
         except KeyboardInterrupt:
             pass
 
+    def view_logs(self):
+        from turtlebot4_setup.logs import LogFollower
+
+        LogFollower().show()
+
     def stop(self):
         subprocess.run(shlex.split('sudo systemctl stop turtlebot4.service'))
 
@@ -309,8 +474,8 @@ class RobotUpstart():
     def daemon_reload(self):
         subprocess.run(shlex.split('sudo systemctl daemon-reload'))
 
-    def install(self):
-        self.uninstall()
+    def turtlebot4_job(self):
+        import robot_upstart
 
         rmw = os.environ['RMW_IMPLEMENTATION']
         if rmw == 'rmw_fastrtps_cpp':
@@ -329,16 +494,49 @@ class RobotUpstart():
         turtlebot4_job.add(package='turtlebot4_bringup',
                            filename='launch/{0}.launch.py'.format(
                             self.conf.get(SystemOptions.MODEL)))
-        turtlebot4_job.install()
+        return turtlebot4_job
 
+    def install(self):
+        import robot_upstart
+        from turtlebot4_setup.upstart import TurtleBot4Extras, plan_install
+
+        # Only jobs whose installed files differ are reinstalled, and running services
+        # are left alone if nothing changed. Returns the services that were changed.
+        changed = set()
+
+        turtlebot4_job = self.turtlebot4_job()
+        files, stale = plan_install(turtlebot4_job)
+        if files or stale:
+            self.stop()
+            with profiling.span('install turtlebot4.service', 'install'):
+                if stale:
+                    # Remove files left by a previous install, such as another model's launch file
+                    turtlebot4_job.uninstall()
+                turtlebot4_job.install()
+            changed.add('turtlebot4.service')
+
+        discovery_job = robot_upstart.Job(workspace_setup=os.environ['ROBOT_SETUP'])
         if self.conf.get(DiscoveryOptions.ENABLED):
-            discovery_job = robot_upstart.Job(workspace_setup=os.environ['ROBOT_SETUP'])
-            discovery_job.install(Provider=TurtleBot4Extras)
-            subprocess.run(shlex.split('sudo systemctl restart discovery.service'))
+            files, _ = plan_install(discovery_job, TurtleBot4Extras)
+            if files:
+                with profiling.span('install discovery.service', 'install'):
+                    discovery_job.install(Provider=TurtleBot4Extras)
+                changed.add('discovery.service')
+        elif os.path.exists('/lib/systemd/system/discovery.service'):
+            subprocess.run(shlex.split('sudo systemctl stop discovery.service'), capture_output=True)
+            discovery_job.uninstall(Provider=TurtleBot4Extras)
+            changed.add('discovery.service')
 
-        self.daemon_reload()
+        if changed:
+            self.daemon_reload()
+            if 'discovery.service' in changed and self.conf.get(DiscoveryOptions.ENABLED):
+                subprocess.run(shlex.split('sudo systemctl restart discovery.service'))
+        return changed
 
     def uninstall(self):
+        import robot_upstart
+        from turtlebot4_setup.upstart import TurtleBot4Extras
+
         self.stop()
 
         # Uninstall Turtlebot4 Service
@@ -355,37 +553,3 @@ class RobotUpstart():
 
         self.daemon_reload()
 
-
-class TurtleBot4Extras(robot_upstart.providers.Generic):
-    def post_install(self):
-        pass
-
-    def generate_install(self):
-        with open('/etc/turtlebot4/discovery.conf') as f:
-            discovery_conf_contents = f.read()
-        with open('/etc/turtlebot4/discovery.sh') as f:
-            discovery_sh_contents = f.read()
-        return {
-            "/lib/systemd/system/discovery.service": {
-                "content": discovery_conf_contents,
-                "mode": 0o644
-            },
-            "/usr/sbin/discovery": {
-                "content": discovery_sh_contents,
-                "mode": 0o755
-            },
-            "/etc/systemd/system/multi-user.target.wants/discovery.service": {
-                "symlink": "/lib/systemd/system/discovery.service"
-            }}
-
-    def generate_uninstall(self):
-        return {
-            "/lib/systemd/system/discovery.service": {
-                "remove": True
-            },
-            "/usr/sbin/discovery": {
-                "remove": True
-            },
-            "/etc/systemd/system/multi-user.target.wants/discovery.service": {
-                "remove": True
-            }}
\ No newline at end of file
@@ -0,0 +1,462 @@
+#!/usr/bin/env python3
+
+# RPI4 SD card flasher. Supports flashing multiple cards simultaneously.
+#
+# The image is read once and every block is written to all cards from the same buffer.
+# Each card is then read back and verified against the image's SHA-256.
+# .img.xz, .img.gz and .img.zst images are decompressed as they are flashed.
+#
+# usage: sudo python3 -m turtlebot4_setup.sd_flash image.img [sda sdb ...] [-y] [--no-verify]
+
+import argparse
+import fcntl
+import gzip
+import hashlib
+import json
+import lzma
+import mmap
+import os
+import queue
+import re
+import stat
+import statistics
+import struct
+import subprocess
+import sys
+import threading
+import time
+
+BLOCK_SIZE = 4 << 20
+POOL_SIZE = 8
+
+# linux/fs.h
+BLKGETSIZE64 = 0x80081272
+BLKZEROOUT = 0x127f
+
+# Cards below this fraction of the median write speed are reported as slow
+SLOW_FRACTION = 0.5
+
+
+class FlashError(Exception):
+    pass
+
+
+class Block():
+
+    def __init__(self, offset, buffer, length, zero, refs) -> None:
+        self.offset = offset
+        self.buffer = buffer
+        self.length = length
+        self.zero = zero
+        self.refs = refs
+
+    def view(self):
+        return memoryview(self.buffer)[:self.length]
+
+
+class BufferPool():
+    # Blocks are shared by all writers and returned to the pool once every writer is done
+
+    def __init__(self, count, size) -> None:
+        self.size = size
+        self.free = queue.Queue()
+        self.lock = threading.Lock()
+        for _ in range(count):
+            # Anonymous maps are page aligned
+            self.free.put(mmap.mmap(-1, size))
+        self.zeros = bytes(size)
+
+    def get(self):
+        return self.free.get()
+
+    def put(self, buffer):
+        self.free.put(buffer)
+
+    def release(self, block):
+        with self.lock:
+            block.refs -= 1
+            done = block.refs == 0
+        if done:
+            self.free.put(block.buffer)
+
+    def is_zero(self, view):
+        # Comparing as bytes uses memcmp, comparing memoryviews goes item by item
+        return view.tobytes() == self.zeros[:len(view)]
+
+
+def read_full(source, view):
+    # Streams can return short reads before the end of the file
+    total = 0
+    while total < len(view):
+        n = source.readinto(view[total:])
+        if not n:
+            break
+        total += n
+    return total
+
+
+def device_path(name):
+    return name if os.path.sep in name else os.path.join('/dev', name)
+
+
+def is_device_path(path):
+    # Anything under /dev must already exist as a block device. Opening a mistyped name there
+    # would create a plain file on devtmpfs and flash the image into memory.
+    return os.path.sep not in path or os.path.realpath(path).startswith('/dev/')
+
+
+def is_device_or_partition(device, path):
+    # /dev/sda matches /dev/sda1 but not /dev/sdaa1, /dev/mmcblk0 matches /dev/mmcblk0p1
+    partition = r'p\d+' if path[-1:].isdigit() else r'\d+'
+    return re.fullmatch(re.escape(path) + '(' + partition + ')?', device) is not None
+
+
+def sysfs_queue_value(st, name):
+    # Partitions share their parent device's queue
+    base = '/sys/dev/block/{0}:{1}'.format(os.major(st.st_rdev), os.minor(st.st_rdev))
+    for path in [os.path.join(base, 'queue', name), os.path.join(base, '..', 'queue', name)]:
+        try:
+            with open(path, 'r') as f:
+                return int(f.read().strip())
+        except (OSError, ValueError):
+            continue
+    return 0
+
+
+def unmount(path):
+    try:
+        with open('/proc/mounts', 'r') as f:
+            mounts = [line.split()[0] for line in f]
+    except OSError:
+        return
+    for device in mounts:
+        if is_device_or_partition(device, path):
+            subprocess.run(['umount', device])
+
+
+class Target():
+
+    def __init__(self, path) -> None:
+        self.path = path
+        self.fd = None
+        self.block_device = False
+        self.zeroout = False
+        self.sparse = False
+        self.queue = queue.Queue()
+        self.written = 0
+        self.write_time = None
+        self.verify_time = None
+        self.verified = None
+        self.error = None
+
+    def open(self, image_size=None):
+        try:
+            st = os.stat(self.path)
+            self.block_device = stat.S_ISBLK(st.st_mode)
+        except FileNotFoundError:
+            st = None
+
+        if is_device_path(self.path) and not self.block_device:
+            raise FlashError('{0} is not a block device'.format(self.path) if st is not None else
+                             '{0} does not exist'.format(self.path))
+
+        if self.block_device:
+            self.fd = os.open(self.path, os.O_WRONLY)
+            size = struct.unpack('Q', fcntl.ioctl(self.fd, BLKGETSIZE64, bytes(8)))[0]
+            if image_size is not None and size < image_size:
+                raise FlashError('Device is smaller than the image ({0} < {1} bytes)'.format(size, image_size))
+            # Zero blocks are only skipped if the device can zero them without the data being sent
+            self.zeroout = sysfs_queue_value(st, 'write_zeroes_max_bytes') > 0
+        else:
+            # Plain files are truncated so that skipped zero blocks read back as zeros
+            self.fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            self.sparse = True
+
+    def write(self, block):
+        if block.zero and self.sparse:
+            pass
+        elif block.zero and self.zeroout:
+            fcntl.ioctl(self.fd, BLKZEROOUT, struct.pack('QQ', block.offset, block.length))
+        else:
+            view = block.view()
+            offset = block.offset
+            while len(view):
+                n = os.pwrite(self.fd, view, offset)
+                view = view[n:]
+                offset += n
+        self.written += block.length
+
+    def finish(self, size):
+        if self.sparse:
+            os.ftruncate(self.fd, size)
+        os.fsync(self.fd)
+        # Drop the cached pages so that verification reads from the card
+        os.posix_fadvise(self.fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        os.close(self.fd)
+        self.fd = None
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def verify(self, size, expected, block_size=BLOCK_SIZE):
+        start = time.monotonic()
+        sha = hashlib.sha256()
+        buffer = mmap.mmap(-1, block_size)
+        view = memoryview(buffer)
+        with open(self.path, 'rb', buffering=0) as f:
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+            remaining = size
+            while remaining > 0:
+                n = read_full(f, view[:min(block_size, remaining)])
+                if n == 0:
+                    break
+                sha.update(view[:n])
+                remaining -= n
+        view.release()
+        buffer.close()
+        self.verify_time = time.monotonic() - start
+        self.verified = remaining == 0 and sha.hexdigest() == expected
+        if not self.verified:
+            raise FlashError('Verification failed, the card does not match the image')
+
+    def throughput(self, size, seconds):
+        return size / max(seconds, 1e-6) / 1e6 if seconds is not None else None
+
+
+def open_zstd(path):
+    try:
+        import zstandard
+    except ImportError:
+        raise FlashError('python3-zstandard is required to flash .zst images')
+    return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+
+
+# Compressed images are decompressed in the reader thread, straight into the block buffers
+DECOMPRESSORS = {
+    '.xz': lzma.open,
+    '.gz': gzip.open,
+    '.zst': open_zstd,
+}
+
+
+def open_image(path):
+    opener = DECOMPRESSORS.get(os.path.splitext(path)[1])
+    if opener is not None:
+        return opener(path)
+    return open(path, 'rb', buffering=0)
+
+
+def image_size(path):
+    # The size of a compressed image is only known once it has been decompressed
+    if os.path.splitext(path)[1] in DECOMPRESSORS:
+        return None
+    return os.stat(path).st_size
+
+
+class Flasher():
+
+    def __init__(self, image, paths, block_size=BLOCK_SIZE, pool_size=POOL_SIZE) -> None:
+        self.image = image
+        self.targets = [Target(p) for p in paths]
+        self.active = []
+        self.block_size = block_size
+        self.pool = BufferPool(pool_size, block_size)
+        self.size = None
+        self.total = image_size(image)
+        if self.total is None:
+            # Fail early if the image does not exist
+            os.stat(image)
+        self.read = 0
+        self.sha256 = None
+        self.start = None
+
+    def produce(self, source):
+        sha = hashlib.sha256()
+        offset = 0
+        try:
+            while True:
+                buffer = self.pool.get()
+                view = memoryview(buffer)
+                n = read_full(source, view)
+                if n == 0:
+                    view.release()
+                    self.pool.put(buffer)
+                    break
+                sha.update(view[:n])
+                block = Block(offset, buffer, n, self.pool.is_zero(view[:n]), len(self.active))
+                view.release()
+                for target in self.active:
+                    target.queue.put(block)
+                offset += n
+                self.read = offset
+            self.size = offset
+            self.sha256 = sha.hexdigest()
+        except Exception as e:
+            # Read and decompression errors fail every card
+            for target in self.active:
+                target.error = 'Error reading image: {0}'.format(e)
+        finally:
+            # Writers always see the end of the image, even if it could not be read
+            for target in self.active:
+                target.queue.put(None)
+
+    def consume(self, target):
+        while True:
+            block = target.queue.get()
+            if block is None:
+                break
+            # A failed card keeps releasing blocks so the other cards are not held up
+            if target.error is None:
+                try:
+                    target.write(block)
+                except OSError as e:
+                    target.error = str(e)
+            self.pool.release(block)
+
+        if target.error is None:
+            try:
+                target.finish(self.size)
+            except OSError as e:
+                target.error = str(e)
+        target.close()
+        target.write_time = time.monotonic() - self.start
+
+    def verify(self, target):
+        try:
+            target.verify(self.size, self.sha256, self.block_size)
+        except (OSError, FlashError) as e:
+            target.error = str(e)
+
+    def run_threads(self, threads, progress):
+        for thread in threads:
+            thread.start()
+        while any(t.is_alive() for t in threads):
+            for thread in threads:
+                thread.join(0.5)
+                if progress is not None:
+                    progress(self)
+
+    def flash(self, verify=True, progress=None):
+        for target in self.targets:
+            try:
+                target.open(self.total)
+            except (OSError, FlashError) as e:
+                target.error = str(e)
+                target.close()
+        # Cards that could not be opened are reported but take no part in the flash
+        self.active = [t for t in self.targets if t.error is None]
+        if not self.active:
+            return False
+
+        self.start = time.monotonic()
+        try:
+            source = open_image(self.image)
+        except (OSError, FlashError) as e:
+            for target in self.active:
+                target.error = str(e)
+                target.close()
+            return False
+
+        with source:
+            threads = [threading.Thread(target=self.produce, args=(source,))]
+            threads += [threading.Thread(target=self.consume, args=(t,)) for t in self.active]
+            self.run_threads(threads, progress)
+
+        if verify:
+            threads = [threading.Thread(target=self.verify, args=(t,))
+                       for t in self.active if t.error is None]
+            self.run_threads(threads, None)
+        return all(t.error is None for t in self.targets)
+
+    def results(self):
+        results = []
+        for t in self.targets:
+            results.append({
+                'device': t.path,
+                'result': 'error' if t.error else 'success',
+                'write_mbps': t.throughput(t.written, t.write_time),
+                'verify_mbps': t.throughput(self.size, t.verify_time),
+                'verified': t.verified,
+                'slow': False,
+                'message': t.error or '',
+            })
+        speeds = [r['write_mbps'] for r in results if r['result'] == 'success']
+        if len(speeds) > 1:
+            median = statistics.median(speeds)
+            for r in results:
+                if r['result'] == 'success' and r['write_mbps'] < median * SLOW_FRACTION:
+                    r['slow'] = True
+        return results
+
+
+def print_progress(flasher):
+    elapsed = max(time.monotonic() - flasher.start, 1e-6)
+    if flasher.total:
+        line = '  '.join('{0} {1:3.0f}%'.format(os.path.basename(t.path), 100.0 * t.written / flasher.total)
+                         for t in flasher.active)
+    else:
+        line = '  '.join('{0} {1:.0f} MB'.format(os.path.basename(t.path), t.written / 1e6)
+                         for t in flasher.active)
+    sys.stdout.write('\r{0}  {1:.1f} MB/s read'.format(line, flasher.read / elapsed / 1e6))
+    sys.stdout.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='RPI4 SD card flash script. Supports flashing multiple cards simultaneously.')
+    parser.add_argument('image', help='Path to the image (.img, .img.xz, .img.gz or .img.zst)')
+    parser.add_argument('devices', nargs='*', help='Device names (i.e. sda sdb sdc) or paths')
+    parser.add_argument('-y', '--yes', action='store_true', help='Do not ask for confirmation')
+    parser.add_argument('--no-verify', action='store_true', help='Skip the read-back verification')
+    parser.add_argument('--block-size', type=int, default=BLOCK_SIZE >> 20, help='Block size in MB')
+    parser.add_argument('--json', help='Write results to this file')
+    args = parser.parse_args()
+
+    print('Image path: {0}'.format(args.image))
+    devices = args.devices
+    if not devices:
+        devices = input('Enter each SD card device name separated with a space (i.e. sda sdb sdc): ').split()
+    paths = [device_path(d) for d in devices]
+    if not paths:
+        print('Error: No devices given')
+        return 2
+
+    if not args.yes:
+        input('The SD card(s) will be unmounted and flashed. Press enter to continue.')
+
+    for path in paths:
+        unmount(path)
+
+    try:
+        flasher = Flasher(args.image, paths, block_size=args.block_size << 20)
+    except OSError as e:
+        print('Error: {0}'.format(e))
+        return 2
+
+    success = flasher.flash(verify=not args.no_verify, progress=print_progress)
+    print()
+    results = flasher.results()
+
+    for r in results:
+        if r['result'] == 'success':
+            details = 'write {0:.1f} MB/s'.format(r['write_mbps'])
+            if r['verify_mbps']:
+                details += ', verify {0:.1f} MB/s'.format(r['verify_mbps'])
+            if r['slow']:
+                details += ', SLOW'
+        else:
+            details = r['message']
+        print('{0:<16}{1:<10}{2}'.format(r['device'], r['result'], details))
+    ok = [r for r in results if r['result'] == 'success']
+    print('{0} of {1} cards flashed'.format(len(ok), len(results)))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'image': args.image, 'sha256': flasher.sha256, 'devices': results}, f, indent=2)
+    return 0 if success else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
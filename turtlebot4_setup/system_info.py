@@ -0,0 +1,60 @@
+import array
+import fcntl
+import socket
+import struct
+
+# Link between the Raspberry Pi and the Create 3
+CREATE3_INTERFACE = 'usb0'
+
+SIOCGIFCONF = 0x8912
+MAX_INTERFACES = 64
+
+
+def ipv4_addresses():
+    # struct ifreq is 40 bytes on 64-bit platforms and 32 bytes on 32-bit platforms
+    ifreq_size = 40 if struct.calcsize('P') == 8 else 32
+    buf = array.array('B', bytes(ifreq_size * MAX_INTERFACES))
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        ifconf = struct.pack('iP', len(buf), buf.buffer_info()[0])
+        length = struct.unpack('iP', fcntl.ioctl(s.fileno(), SIOCGIFCONF, ifconf))[0]
+
+    data = buf.tobytes()
+    addresses = []
+    for i in range(0, length, ifreq_size):
+        name = data[i:i + 16].split(b'\0', 1)[0].decode()
+        # sockaddr_in: family (2), port (2), address (4)
+        addresses.append((name, socket.inet_ntoa(data[i + 20:i + 24])))
+    return addresses
+
+
+def ipv6_addresses():
+    addresses = []
+    try:
+        with open('/proc/net/if_inet6', 'r') as f:
+            for line in f:
+                fields = line.split()
+                # Only report global scope addresses, as 'hostname -I' does
+                if len(fields) < 6 or fields[3] != '00':
+                    continue
+                addr = socket.inet_ntop(socket.AF_INET6, bytes.fromhex(fields[0]))
+                addresses.append((fields[5], addr))
+    except OSError:
+        pass
+    return addresses
+
+
+def interface_addresses():
+    interfaces = {}
+    for name, addr in ipv4_addresses() + ipv6_addresses():
+        if name == 'lo':
+            continue
+        interfaces.setdefault(name, []).append(addr)
+    return interfaces
+
+
+def robot_ip_str():
+    # Addresses on the Create 3 link are internal to the robot and not useful to display
+    return ', '.join('{0} ({1})'.format(addr, name)
+                     for name, addrs in interface_addresses().items()
+                     if name != CREATE3_INTERFACE
+                     for addr in addrs)
@@ -0,0 +1,238 @@
+import socket
+import struct
+import subprocess
+import time
+
+from collections import namedtuple
+
+from turtlebot4_setup.dds_profiles import join_list, split_list
+
+# Setting keys, shared with conf.TimeSyncOptions
+PRESET = 'TIME_SYNC_PRESET'
+SERVERS = 'TIME_SERVERS'
+
+RPI_USB_IP = '192.168.186.3'
+CREATE3_IP = '192.168.186.2'
+
+UBUNTU_POOLS = [
+    ('ntp.ubuntu.com', 4),
+    ('0.ubuntu.pool.ntp.org', 1),
+    ('1.ubuntu.pool.ntp.org', 1),
+    ('2.ubuntu.pool.ntp.org', 2),
+]
+
+# Poll intervals are log2 seconds
+TIMESYNC_PRESETS = {
+    # The stock configuration
+    'default': {
+        'pools': True,
+        'upstream_poll': None,
+        'makestep': '1 3',
+        'local_stratum': 10,
+        'create3_poll': (4, 6),
+    },
+    # Step the clock whenever it is off by more than 100 ms, and poll often so both
+    # clocks settle quickly after boot
+    'fast_convergence': {
+        'pools': True,
+        'upstream_poll': (4, 8),
+        'makestep': '0.1 -1',
+        'local_stratum': 10,
+        'create3_poll': (2, 4),
+    },
+    # No internet access. The Pi serves its own clock, or the local servers if any
+    # are set, so every robot and the Create 3 at least agree with each other.
+    'offline': {
+        'pools': False,
+        'upstream_poll': (4, 6),
+        'makestep': '1 -1',
+        'local_stratum': 8,
+        'create3_poll': (4, 6),
+    },
+}
+
+MARKER = '# turtlebot4-setup time sync preset: '
+
+
+def chrony_conf(preset, servers=None):
+    settings = TIMESYNC_PRESETS[preset]
+    servers = split_list(servers)
+    lines = ['# This file was automatically created by the turtlebot4-setup tool and should not be manually modified',
+             MARKER + preset,
+             '']
+
+    poll = ''
+    if settings['upstream_poll'] is not None:
+        poll = ' minpoll {0} maxpoll {1}'.format(*settings['upstream_poll'])
+    if servers:
+        # Local servers, such as a base station, replace the internet pools
+        lines += ['server {0} iburst{1}'.format(server, poll) for server in servers]
+    elif settings['pools']:
+        lines += ['pool {0} iburst maxsources {1}{2}'.format(pool, sources, poll) for pool, sources in UBUNTU_POOLS]
+    lines += ['',
+              '# Serve time to the Create 3',
+              'allow 192.168.186.0/24',
+              'local stratum {0}'.format(settings['local_stratum']),
+              '',
+              'keyfile /etc/chrony/chrony.keys',
+              'driftfile /var/lib/chrony/chrony.drift',
+              'logdir /var/log/chrony',
+              'maxupdateskew 100.0',
+              'rtcsync',
+              'makestep {0}'.format(settings['makestep']),
+              '']
+    return '\n'.join(lines)
+
+
+def create3_ntp_config(preset):
+    return 'server {0} prefer iburst minpoll {1} maxpoll {2}  # Use RPi4 server'.format(
+        RPI_USB_IP, *TIMESYNC_PRESETS[preset]['create3_poll'])
+
+
+def parse_chrony_conf(text):
+    # Files that were not generated, such as the stock configuration, read as the default preset
+    settings = {PRESET: 'default', SERVERS: None}
+    servers = []
+    for line in text.splitlines():
+        if line.startswith(MARKER) and line[len(MARKER):].strip() in TIMESYNC_PRESETS:
+            settings[PRESET] = line[len(MARKER):].strip()
+        elif line.split()[:1] == ['server'] and len(line.split()) > 1:
+            servers.append(line.split()[1])
+    settings[SERVERS] = join_list(servers)
+    return settings
+
+
+# `chronyc -c` output, as documented in chronyc(1)
+Tracking = namedtuple('Tracking', ['ref_id', 'ref_name', 'stratum', 'ref_time', 'system_offset', 'last_offset',
+                                   'rms_offset', 'frequency', 'residual_frequency', 'skew', 'root_delay',
+                                   'root_dispersion', 'update_interval', 'leap_status'])
+Source = namedtuple('Source', ['mode', 'state', 'name', 'stratum', 'poll', 'reach', 'last_rx', 'offset',
+                               'measured_offset', 'error'])
+Client = namedtuple('Client', ['name', 'ntp_packets', 'ntp_dropped', 'ntp_interval', 'ntp_last'])
+
+SOURCE_STATES = {'*': 'synced', '+': 'combined', '-': 'not combined', '?': 'unreachable',
+                 'x': 'falseticker', '~': 'too variable'}
+
+
+def to_float(value):
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def to_int(value):
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+def parse_tracking(text):
+    for line in text.splitlines():
+        fields = line.strip().split(',')
+        if len(fields) >= len(Tracking._fields):
+            return Tracking(fields[0], fields[1], to_int(fields[2]),
+                            *[to_float(f) for f in fields[3:13]], fields[13])
+    return None
+
+
+def parse_sources(text):
+    sources = []
+    for line in text.splitlines():
+        fields = line.strip().split(',')
+        if len(fields) >= len(Source._fields):
+            sources.append(Source(fields[0], fields[1], fields[2], to_int(fields[3]), to_int(fields[4]),
+                                  int(fields[5], 8) if fields[5].isdigit() else None, to_int(fields[6]),
+                                  to_float(fields[7]), to_float(fields[8]), to_float(fields[9])))
+    return sources
+
+
+def parse_clients(text):
+    clients = []
+    for line in text.splitlines():
+        fields = line.strip().split(',')
+        # Intervals and ages are '-' until known
+        if len(fields) >= 6 and not fields[0].startswith('#'):
+            clients.append(Client(fields[0], to_int(fields[1]), to_int(fields[2]), to_int(fields[3]),
+                                  to_int(fields[5])))
+    return clients
+
+
+def chronyc(*args, sudo=False):
+    command = (['sudo'] if sudo else []) + ['chronyc', '-c', '-n'] + list(args)
+    try:
+        result = subprocess.run(command, capture_output=True, text=True, timeout=5)
+    except (OSError, subprocess.TimeoutExpired):
+        return ''
+    return result.stdout if result.returncode == 0 else ''
+
+
+NTP_EPOCH_OFFSET = 2208988800
+
+
+def sntp_offset(host=CREATE3_IP, port=123, timeout=1.0):
+    # Returns (offset, round trip delay) in seconds of a single NTP query, or None if the
+    # host does not answer. A positive offset means the host is ahead of this clock.
+    packet = bytearray(48)
+    packet[0] = 0x23  # NTPv4, client mode
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.settimeout(timeout)
+        try:
+            t1 = time.time()
+            sock.sendto(packet, (host, port))
+            data, _ = sock.recvfrom(512)
+            t4 = time.time()
+        except OSError:
+            return None
+    if len(data) < 48:
+        return None
+    receive, transmit = [s + f / 2 ** 32 - NTP_EPOCH_OFFSET for s, f in
+                         [struct.unpack('!II', data[32:40]), struct.unpack('!II', data[40:48])]]
+    return ((receive - t1) + (transmit - t4)) / 2, (t4 - t1) - (transmit - receive)
+
+
+def format_seconds(value):
+    if value is None:
+        return 'unknown'
+    if abs(value) < 1e-3:
+        return '{0:+.1f} us'.format(value * 1e6)
+    if abs(value) < 1:
+        return '{0:+.2f} ms'.format(value * 1e3)
+    return '{0:+.3f} s'.format(value)
+
+
+def status_report(tracking_output, sources_output, clients_output, create3_offset=None, now=None):
+    # Built from captured chronyc output so it can be checked without chrony running
+    now = time.time() if now is None else now
+    lines = []
+
+    tracking = parse_tracking(tracking_output)
+    if tracking is None:
+        lines.append('RPi4:     chrony is not running')
+    else:
+        age = now - tracking.ref_time if tracking.ref_time else None
+        lines.append('RPi4:     offset {0}, jitter {1}, stratum {2}, last sync {3}'.format(
+            format_seconds(tracking.system_offset), format_seconds(tracking.rms_offset).lstrip('+'),
+            tracking.stratum, 'never' if not tracking.ref_time else '{0:.0f} s ago'.format(age)))
+        lines.append('          reference {0}, leap status {1}'.format(tracking.ref_name, tracking.leap_status))
+
+    for source in parse_sources(sources_output):
+        lines.append('Source:   {0:<24} {1:<13} offset {2}, error {3}, last sample {4}'.format(
+            source.name, SOURCE_STATES.get(source.state, source.state), format_seconds(source.offset),
+            format_seconds(source.error).lstrip('+'),
+            'never' if source.last_rx is None else '{0} s ago'.format(source.last_rx)))
+
+    create3 = [c for c in parse_clients(clients_output) if c.name == CREATE3_IP]
+    if create3 and create3[0].ntp_last is not None:
+        lines.append('Create 3: last synced {0} s ago, {1} requests'.format(create3[0].ntp_last, create3[0].ntp_packets))
+    else:
+        lines.append('Create 3: has not synced with the RPi4')
+    if create3_offset is not None:
+        lines.append('          offset {0} from the RPi4, round trip {1}'.format(
+            format_seconds(create3_offset[0]), format_seconds(create3_offset[1]).lstrip('+')))
+    return '\n'.join(lines)
+
+
+def read_status():
+    return status_report(chronyc('tracking'), chronyc('sources'), chronyc('clients', sudo=True), sntp_offset())
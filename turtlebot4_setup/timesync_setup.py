@@ -0,0 +1,70 @@
+from turtlebot4_setup.menu import Menu, MenuEntry, OptionsMenu, Prompt, write_or_report
+
+from turtlebot4_setup import timesync
+from turtlebot4_setup.conf import Conf, TimeSyncOptions, TIMESYNC_PRESETS
+from turtlebot4_setup.dds_profiles import join_list, split_list
+
+
+class TimeSyncSetup():
+    title = """
+  _____ _              ___
+ |_   _(_)_ __  ___   / __|_  _ _ _  __
+   | | | | '  \\/ -_)  \\__ \\ || | ' \\/ _|
+   |_| |_|_|_|_\\___|  |___/\\_, |_||_\\__|
+                           |__/
+"""
+
+    def __init__(self, configs: Conf) -> None:
+        self.conf = configs
+
+        self.entries = [MenuEntry(entry=self.format_entry('Preset', TimeSyncOptions.PRESET),
+                                  function=self.set_preset),
+                        MenuEntry(entry=self.format_entry('Local NTP Servers', TimeSyncOptions.SERVERS),
+                                  function=self.set_servers),
+                        MenuEntry('', None),
+                        MenuEntry(entry='Status', function=self.view_status),
+                        MenuEntry('', None),
+                        MenuEntry(entry='Apply Defaults', function=self.apply_defaults),
+                        MenuEntry(entry='Save', function=self.save_settings)]
+
+        self.menu = Menu(title=self.title, menu_entries=self.entries)
+
+    def format_entry(self, name, opt):
+        return lambda: '{0}{1}[{2}]'.format(
+            name,
+            ' ' * (24 - len(name)),
+            '' if self.conf.get(opt) is None else self.conf.get(opt))
+
+    def show(self):
+        self.menu.show()
+
+    def set_preset(self):
+        options = OptionsMenu(title='Time Sync Preset\n\n' +
+                              'default: Ubuntu NTP pools, stock chrony settings\n' +
+                              'fast_convergence: Step the clock at any time and poll often, for quick sync after boot\n' +
+                              'offline: No internet pools, the RPi4 or the local servers are the time source\n',
+                              menu_entries=TIMESYNC_PRESETS,
+                              default_option=self.conf.get(TimeSyncOptions.PRESET))
+        self.conf.set(TimeSyncOptions.PRESET, options.show())
+
+    def set_servers(self):
+        servers = self.conf.get(TimeSyncOptions.SERVERS)
+        p = Prompt(prompt='Local NTP Servers [{0}]: '.format('' if servers is None else servers),
+                   default_response=servers,
+                   note='Comma separated addresses or hostnames, such as a base station.\n' +
+                        'Used instead of the internet pools. Leave empty to use the preset.')
+        self.conf.set(TimeSyncOptions.SERVERS, join_list(split_list(p.show())))
+
+    def view_status(self):
+        while True:
+            options = OptionsMenu(title=self.title + '\n' + timesync.read_status() + '\n',
+                                  menu_entries=['Refresh', 'Back'])
+            if options.show() != 'Refresh':
+                return
+
+    def apply_defaults(self):
+        self.conf.apply_default(self.conf.timesync_conf)
+
+    def save_settings(self):
+        if write_or_report(self.conf.write):
+            self.menu.exit()
@@ -0,0 +1,174 @@
+import inspect
+import json
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from turtlebot4_setup import profiling
+
+
+class TransactionError(Exception):
+    pass
+
+
+def commit_files(entries):
+    # Runs either in-process or inside a single privileged helper, so it may only use the
+    # standard library and must not reference anything else from this module.
+    import os
+    import shutil
+
+    def fsync_dir(path):
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    prepared = []
+    replaced = []
+    try:
+        # Copy every staged file next to its target so that the final rename is atomic
+        for e in entries:
+            new = e['target'] + '.tb4-new'
+            shutil.copyfile(e['staged'], new)
+            prepared.append(new)
+            if os.path.exists(e['target']):
+                st = os.stat(e['target'])
+                os.chmod(new, st.st_mode & 0o7777)
+                if os.geteuid() == 0:
+                    os.chown(new, st.st_uid, st.st_gid)
+            else:
+                os.chmod(new, e['mode'])
+            fd = os.open(new, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+        for e, new in list(zip(entries, prepared)):
+            backup = None
+            if os.path.exists(e['target']):
+                backup = e['target'] + '.tb4-bak'
+                if os.path.exists(backup):
+                    os.remove(backup)
+                os.link(e['target'], backup)
+            replaced.append((e['target'], backup))
+            os.replace(new, e['target'])
+            prepared.remove(new)
+    except BaseException:
+        # Restore every file that was already replaced so the commit is all-or-nothing
+        for target, backup in reversed(replaced):
+            if backup is not None and os.path.samefile(backup, target):
+                # The rename failed, so the backup is still a link to the original, which
+                # rename would leave in place
+                os.remove(backup)
+            elif backup is not None:
+                os.replace(backup, target)
+            elif os.path.exists(target):
+                os.remove(target)
+        for new in prepared:
+            if os.path.exists(new):
+                os.remove(new)
+        raise
+
+    for target, backup in replaced:
+        if backup is not None:
+            os.remove(backup)
+    for d in set(os.path.dirname(target) for target, _ in replaced):
+        fsync_dir(d)
+
+
+class WriteTransaction():
+
+    def __init__(self) -> None:
+        self.staging_dir = None
+        self.staged = {}
+        self.commit_hooks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+        return False
+
+    def stage(self, path, content, mode=0o644):
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+
+        # Unchanged files are left alone
+        try:
+            with open(path, 'rb') as f:
+                if f.read() == content:
+                    self.staged.pop(path, None)
+                    return False
+        except OSError:
+            pass
+
+        if self.staging_dir is None:
+            self.staging_dir = tempfile.mkdtemp(prefix='turtlebot4_setup-')
+
+        staged = os.path.join(self.staging_dir, str(len(self.staged)) + '-' + os.path.basename(path))
+        with open(staged, 'wb') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        self.staged[path] = {'staged': staged, 'target': path, 'mode': mode}
+        return True
+
+    def on_commit(self, hook):
+        self.commit_hooks.append(hook)
+
+    def needs_privilege(self):
+        if os.geteuid() == 0:
+            return False
+        for path in self.staged:
+            if not os.access(os.path.dirname(path), os.W_OK) or \
+               (os.path.exists(path) and not os.access(path, os.W_OK)):
+                return True
+        return False
+
+    def commit(self):
+        try:
+            if self.staged:
+                entries = list(self.staged.values())
+                with profiling.span('commit', 'file', files=' '.join(sorted(self.staged))):
+                    if self.needs_privilege():
+                        self.commit_privileged(entries)
+                    else:
+                        try:
+                            commit_files(entries)
+                        except OSError as e:
+                            raise TransactionError(str(e)) from e
+        finally:
+            self.abort()
+
+        for hook in self.commit_hooks:
+            hook()
+
+    def commit_privileged(self, entries):
+        manifest = os.path.join(self.staging_dir, 'manifest.json')
+        with open(manifest, 'w') as f:
+            json.dump(entries, f)
+
+        # One sudo call for the whole transaction
+        helper = inspect.getsource(commit_files) + \
+            'import json, sys\n' + \
+            'commit_files(json.load(open(sys.argv[1])))\n'
+        result = subprocess.run(
+            shlex.split('sudo ' + sys.executable) + ['-c', helper, manifest],
+            capture_output=True)
+        if result.returncode != 0:
+            raise TransactionError(result.stderr.decode('utf-8', 'replace').strip())
+
+    def abort(self):
+        if self.staging_dir is not None:
+            shutil.rmtree(self.staging_dir, ignore_errors=True)
+        self.staging_dir = None
+        self.staged = {}
@@ -0,0 +1,91 @@
+import hashlib
+import os
+import stat
+
+import robot_upstart
+
+
+class TurtleBot4Extras(robot_upstart.providers.Generic):
+    def post_install(self):
+        pass
+
+    def generate_install(self):
+        with open('/etc/turtlebot4/discovery.conf') as f:
+            discovery_conf_contents = f.read()
+        with open('/etc/turtlebot4/discovery.sh') as f:
+            discovery_sh_contents = f.read()
+        return {
+            "/lib/systemd/system/discovery.service": {
+                "content": discovery_conf_contents,
+                "mode": 0o644
+            },
+            "/usr/sbin/discovery": {
+                "content": discovery_sh_contents,
+                "mode": 0o755
+            },
+            "/etc/systemd/system/multi-user.target.wants/discovery.service": {
+                "symlink": "/lib/systemd/system/discovery.service"
+            }}
+
+    def generate_uninstall(self):
+        return {
+            "/lib/systemd/system/discovery.service": {
+                "remove": True
+            },
+            "/usr/sbin/discovery": {
+                "remove": True
+            },
+            "/etc/systemd/system/multi-user.target.wants/discovery.service": {
+                "remove": True
+            }}
+
+
+def file_hash(content):
+    return hashlib.sha256(content).hexdigest()
+
+
+def installed_file_matches(path, spec):
+    if 'symlink' in spec:
+        return os.path.islink(path) and os.readlink(path) == spec['symlink']
+    elif 'content' in spec:
+        try:
+            st = os.lstat(path)
+            if not stat.S_ISREG(st.st_mode) or stat.S_IMODE(st.st_mode) != spec.get('mode', 0o644):
+                return False
+            with open(path, 'rb') as f:
+                content = f.read()
+        except OSError:
+            return False
+        if os.path.basename(path).startswith('.'):
+            # robot_upstart's bookkeeping, such as .installed_files, lists paths from a set, so
+            # the order changes from one run to the next
+            return set(content.decode('utf-8', 'replace').splitlines()) == set(spec['content'].splitlines())
+        return file_hash(content) == file_hash(spec['content'].encode('utf-8'))
+    elif spec.get('remove'):
+        return not os.path.lexists(path)
+    return False
+
+
+def changed_files(installation_files):
+    return sorted(path for path, spec in installation_files.items()
+                  if not installed_file_matches(path, spec))
+
+
+def stale_files(job, installation_files):
+    # Files left in the job directory by a previous install, such as the launch file of another model
+    job_path = getattr(job, 'job_path', None)
+    if not job_path or not os.path.isdir(job_path):
+        return []
+    # Hidden files are robot_upstart's own bookkeeping
+    with os.scandir(job_path) as entries:
+        return sorted(e.path for e in entries
+                      if e.path not in installation_files and not e.name.startswith('.'))
+
+
+def plan_install(job, Provider=None, root='/'):
+    # Generates the files an install would write without writing them, and compares them
+    # with what is installed
+    if Provider is None:
+        Provider = robot_upstart.providers.detect_provider()
+    installation_files = Provider(root, job).generate_install()
+    return changed_files(installation_files), stale_files(job, installation_files)
@@ -1,8 +1,8 @@
-from turtlebot4_setup.menu import Menu, MenuEntry, OptionsMenu, Prompt, PreviewMenu
+from turtlebot4_setup.menu import Menu, MenuEntry, OptionsMenu, Prompt, PreviewMenu, write_or_report
 
 import subprocess, shlex
 
-from turtlebot4_setup.conf import Conf, WifiOptions
+from turtlebot4_setup.conf import Conf, WifiOptions, WIFI_MODES, WIFI_BANDS
 
 
 class WifiSetup():
@@ -76,13 +76,13 @@ class WifiSetup():
 
     def set_wifi_mode(self):
         options = OptionsMenu(title='Wi-Fi Mode',
-                              menu_entries=['Client', 'Access Point'],
+                              menu_entries=WIFI_MODES,
                               default_option=self.conf.get(WifiOptions.WIFI_MODE))
         self.conf.set(WifiOptions.WIFI_MODE, options.show())
 
     def set_band(self):
         options = OptionsMenu(title='Band',
-                              menu_entries=['5GHz', '2.4GHz', 'Any'],
+                              menu_entries=WIFI_BANDS,
                               default_option=self.conf.get(WifiOptions.BAND))
         self.conf.set(WifiOptions.BAND, options.show())
 
@@ -99,5 +99,5 @@ class WifiSetup():
         self.conf.set(WifiOptions.DHCP, options.show() == 'True')
 
     def save_settings(self):
-        self.conf.write()
-        self.menu.exit()
+        if write_or_report(self.conf.write):
+            self.menu.exit()